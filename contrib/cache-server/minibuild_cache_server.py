@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# Reference implementation of minibuild remote cache protocol, backed by filesystem.
+#
+#   GET  /ac/<key>       manifest of cached action results, 404 if missing
+#   PUT  /ac/<key>       store manifest
+#   GET  /cas/<digest>   content addressed blob, 404 if missing
+#   PUT  /cas/<digest>   store blob
+#   POST /ac/exists      JSON list of keys in body, replies with JSON list of known ones
+#   POST /cas/exists     JSON list of digests in body, replies with JSON list of known ones
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import os.path
+import re
+import sys
+import tempfile
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+_RE_NAME = re.compile(r'^[0-9a-f]{8,128}$')
+_SECTIONS = ['ac', 'cas']
+_CHUNK_SIZE = 1024 * 1024
+
+
+class CacheStore:
+    def __init__(self, root_dir, read_only):
+        self.root_dir = root_dir
+        self.read_only = read_only
+
+    def entry_path(self, section, name):
+        return os.path.join(self.root_dir, section, name[:2], name)
+
+    def exists(self, section, name):
+        return os.path.isfile(self.entry_path(section, name))
+
+    def store(self, section, name, fh_in, length):
+        entry_path = self.entry_path(section, name)
+        entry_dir = os.path.dirname(entry_path)
+        if not os.path.isdir(entry_dir):
+            try:
+                os.makedirs(entry_dir)
+            except OSError:
+                if not os.path.isdir(entry_dir):
+                    raise
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fh_out:
+                while length > 0:
+                    block = fh_in.read(min(length, _CHUNK_SIZE))
+                    if not block:
+                        raise IOError("Unexpected end of request body")
+                    fh_out.write(block)
+                    length -= len(block)
+            if hasattr(os, 'replace'):
+                os.replace(tmp_path, entry_path)
+            else:
+                if sys.platform == 'win32' and os.path.exists(entry_path):
+                    os.remove(entry_path)
+                os.rename(tmp_path, entry_path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def parse_cache_path(self):
+        bits = self.path.strip('/').split('/')
+        if len(bits) != 2 or bits[0] not in _SECTIONS:
+            return None, None
+        return bits[0], bits[1]
+
+    def send_body(self, code, body, content_type='application/octet-stream'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, code):
+        self.send_body(code, b'', 'text/plain')
+
+    def read_body_length(self):
+        return int(self.headers.get('Content-Length', 0))
+
+    def do_GET(self):
+        section, name = self.parse_cache_path()
+        if section is None or not _RE_NAME.match(name):
+            self.send_empty(400)
+            return
+        entry_path = self.server.cache_store.entry_path(section, name)
+        try:
+            with open(entry_path, 'rb') as fh:
+                body = fh.read()
+        except (IOError, OSError):
+            self.send_empty(404)
+            return
+        self.send_body(200, body)
+
+    def do_HEAD(self):
+        section, name = self.parse_cache_path()
+        if section is None or not _RE_NAME.match(name):
+            self.send_response(400)
+        elif self.server.cache_store.exists(section, name):
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_PUT(self):
+        section, name = self.parse_cache_path()
+        length = self.read_body_length()
+        if section is None or not _RE_NAME.match(name):
+            self.rfile.read(length)
+            self.send_empty(400)
+            return
+        if self.server.cache_store.read_only:
+            self.rfile.read(length)
+            self.send_empty(403)
+            return
+        self.server.cache_store.store(section, name, self.rfile, length)
+        self.send_empty(201)
+
+    def do_POST(self):
+        section, name = self.parse_cache_path()
+        body = self.rfile.read(self.read_body_length())
+        if section is None or name != 'exists':
+            self.send_empty(400)
+            return
+        try:
+            names = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self.send_empty(400)
+            return
+        if not isinstance(names, list):
+            self.send_empty(400)
+            return
+        existing = [ x for x in names if _RE_NAME.match(x) and self.server.cache_store.exists(section, x) ]
+        self.send_body(200, json.dumps(existing).encode('utf-8'), 'application/json')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class CacheServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cache_store, verbose):
+        HTTPServer.__init__(self, address, CacheRequestHandler)
+        self.cache_store = cache_store
+        self.verbose = verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reference minibuild remote cache server.')
+    parser.add_argument('--root', required=True, help='directory to keep cache entries in')
+    parser.add_argument('--bind', default='127.0.0.1', help='address to listen on, default=127.0.0.1')
+    parser.add_argument('--port', type=int, default=8780, help='port to listen on, default=8780')
+    parser.add_argument('--read-only', action='store_true', help='reject uploads')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    root_dir = os.path.abspath(args.root)
+    if not os.path.isdir(root_dir):
+        os.makedirs(root_dir)
+    server = CacheServer((args.bind, args.port), CacheStore(root_dir, args.read_only), args.verbose)
+    print("minibuild cache server: serving '{}' at http://{}:{}/".format(root_dir, args.bind, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,10 @@
 from __future__ import print_function
+import json
+import os
+import os.path
 import sys
 import threading
+import time
 if sys.version_info.major < 3:
     import Queue as queue
 else:
@@ -9,10 +13,52 @@ else:
 from .error_utils import *
 from .toolset_base import ToolsetActionOutput
 
+_DEFAULT_ACTION_DURATION = 1.0
+
+
 class ActionEntry:
-    def __init__(self, action, ctx):
+    def __init__(self, action, ctx, triggers, sequence, timing_key, member_timing_keys):
         self.action = action
         self.ctx = ctx
+        self.triggers = triggers
+        self.sequence = sequence
+        self.timing_key = timing_key
+        self.member_timing_keys = member_timing_keys
+        self.dependents = []
+        self.pending = 0
+        self.completed = False
+        self.result = None
+        self.weight = 0.0
+        self.rank = (0.0, 0, sequence)
+        self.dispatched = False
+        self.plan_reason = None
+
+    def eval_context(self):
+        if self.ctx.force:
+            return self.ctx
+        for trigger in self.triggers:
+            if trigger.result is not None and trigger.result.rebuilt:
+                return self.ctx.derive(force=True)
+        return self.ctx
+
+class ActionPlanItem:
+    def __init__(self, title, reason, estimate):
+        self.title = title
+        self.reason = reason
+        self.estimate = estimate
+
+
+class ActionsPlan:
+    def __init__(self, items, total_estimate, critical_estimate, jobs_count):
+        self.items = items
+        self.total_estimate = total_estimate
+        self.critical_estimate = critical_estimate
+        self.jobs_count = jobs_count
+
+    @property
+    def wall_estimate(self):
+        return max(self.total_estimate / self.jobs_count, self.critical_estimate)
+
 
 class ActionResponse:
     def __init__(self, worker_number, messages):
@@ -35,7 +81,12 @@ class ActionsPoolSharedContext:
         self.error_occured = threading.Event()
         self.error_reasons = []
         self.error_reason_guard = threading.RLock()
+        self.graph_guard = threading.Lock()
+        self.durations = {}
         self.rebuilt = False
+        self.slots_cond = threading.Condition()
+        self.free_slots = jobs_count
+        self.heavy_waiting = 0
 
     def reset(self):
         self.error_reasons = []
@@ -43,23 +94,63 @@ class ActionsPoolSharedContext:
         self.error_occured.clear()
 
 
+def acquire_job_slots(ctl, slots):
+    with ctl.slots_cond:
+        if slots > 1:
+            ctl.heavy_waiting += 1
+        while ctl.free_slots < slots or (slots == 1 and ctl.heavy_waiting):
+            ctl.slots_cond.wait()
+        if slots > 1:
+            ctl.heavy_waiting -= 1
+        ctl.free_slots -= slots
+
+
+def release_job_slots(ctl, slots):
+    with ctl.slots_cond:
+        ctl.free_slots += slots
+        ctl.slots_cond.notify_all()
+
+
 def worker_perform(worker_number, item, ctl):
     if ctl.error_occured.is_set():
         return
+    slots = ctl.jobs_count if item.action.heavy else 1
+    acquire_job_slots(ctl, slots)
+    try:
+        worker_perform_acquired(worker_number, item, ctl, slots)
+    finally:
+        release_job_slots(ctl, slots)
+
+
+def worker_perform_acquired(worker_number, item, ctl, slots):
     locked = False
     try:
         output = ToolsetActionOutputInMemory()
-        ret = item.action.safe_execute(item.ctx, output)
+        ctx = item.eval_context()
+        if slots > 1:
+            ctx = ctx.with_job_slots(slots)
+        started = time.time()
+        ret = item.action.safe_execute(ctx, output)
+        elapsed = time.time() - started
+        item.result = ret
         if ret.exit_code is not None:
             ctl.error_reason_guard.acquire()
             locked = True
             ctl.error_reasons += [(ret, ActionResponse(worker_number, messages=output.messages))]
             ctl.error_occured.set()
         else:
-            if ret.rebuilt:
+            if ret.rebuilt or ret.executed:
                 ctl.error_reason_guard.acquire()
                 locked = True
-                ctl.rebuilt = True
+                if ret.rebuilt:
+                    ctl.rebuilt = True
+                if item.timing_key is not None and not ret.cached:
+                    ctl.durations[item.timing_key] = round(elapsed, 3)
+                if ret.timing_shares and not ret.cached:
+                    for target_path, share in ret.timing_shares.items():
+                        timing_key = item.member_timing_keys.get(target_path)
+                        if timing_key is not None:
+                            ctl.durations[timing_key] = round(elapsed * share, 3)
                 ctl.error_reason_guard.release()
                 locked = False
             if output.messages:
@@ -70,6 +161,33 @@ def worker_perform(worker_number, item, ctl):
             ctl.error_reason_guard.release()
 
 
+def explain_main(pending, reasons, errors):
+    output = ToolsetActionOutputInMemory()
+    while not errors:
+        try:
+            item = pending.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            reasons[item.sequence] = item.action.eval_rebuild_reason(output, item.ctx)
+        except Exception:
+            errors.append(sys.exc_info())
+        del output.messages[:]
+
+
+def complete_entry(item, ctl):
+    ready = []
+    with ctl.graph_guard:
+        item.completed = True
+        for dependent in item.dependents:
+            dependent.pending -= 1
+            if dependent.pending == 0 and dependent.dispatched:
+                ready.append(dependent)
+        item.dependents = []
+    for dependent in ready:
+        ctl.input_queue.put((dependent.rank, dependent))
+
+
 def print_action_output(verbose, verbose_fmt, jobs_count, item):
     for msg in item.messages:
         if verbose and jobs_count > 1:
@@ -91,7 +209,7 @@ def print_main(verbose, verbose_fmt, ctl):
 
 def worker_main(worker_number, ctl):
     while True:
-        item = ctl.input_queue.get()
+        _, item = ctl.input_queue.get()
         if item is None:
             ctl.input_queue.task_done()
             break
@@ -104,16 +222,20 @@ def worker_main(worker_number, ctl):
             rsp = ActionResponse(worker_number, messages=[error_text])
             ctl.output_queue.put(rsp)
         finally:
+            complete_entry(item, ctl)
             ctl.input_queue.task_done()
 
 
 class ActionsPool:
-    def __init__(self, jobs_count, verbose):
+    def __init__(self, jobs_count, verbose, durations_file=None):
         self.jobs_count = jobs_count
         self.verbose = verbose
-        self.input_queue = queue.Queue()
+        self.durations_file = durations_file
+        self.input_queue = queue.PriorityQueue()
         self.output_queue = queue.Queue()
         self.ctl = ActionsPoolSharedContext(self.jobs_count, self.input_queue, self.output_queue)
+        self.planned_entries = []
+        self.planned_count = 0
         self.workers = []
         self.printer = None
         if jobs_count < 10:
@@ -121,11 +243,133 @@ class ActionsPool:
         else:
             self.verbose_fmt = '[{:2}] {}'
 
-    def put(self, action, ctx):
-        item = ActionEntry(action, ctx)
-        self.input_queue.put(item)
+    def _eval_timing_key(self, target_path):
+        if self.durations_file is None or target_path is None:
+            return None
+        return os.path.relpath(target_path, os.path.dirname(self.durations_file)).replace('\\', '/')
+
+    def get_duration(self, target_path):
+        timing_key = self._eval_timing_key(target_path)
+        if timing_key is None:
+            return None
+        return self.ctl.durations.get(timing_key)
+
+    def put(self, action, ctx, depends=None, triggers=None):
+        timing_key = self._eval_timing_key(action.target_path)
+        member_timing_keys = {}
+        for member in action.expand_actions():
+            if member is not action and member.target_path is not None:
+                member_timing_keys[member.target_path] = self._eval_timing_key(member.target_path)
+        prerequisites = []
+        if depends:
+            prerequisites += depends
+        if triggers:
+            prerequisites += triggers
+        with self.ctl.graph_guard:
+            item = ActionEntry(action, ctx, triggers if triggers else [], self.planned_count, timing_key, member_timing_keys)
+            self.planned_count += 1
+            for prerequisite in prerequisites:
+                if prerequisite.completed or item in prerequisite.dependents:
+                    continue
+                prerequisite.dependents.append(item)
+                item.pending += 1
+            self.planned_entries.append(item)
+        return item
+
+    def discard_planned(self):
+        with self.ctl.graph_guard:
+            self.planned_entries = []
+
+    def list_planned(self):
+        with self.ctl.graph_guard:
+            return [ (item.action, item.ctx) for item in self.planned_entries ]
+
+    def dispatch(self):
+        with self.ctl.graph_guard:
+            planned_entries = self.planned_entries
+            self.planned_entries = []
+            known_durations = list(self.ctl.durations.values())
+            if known_durations:
+                default_duration = sum(known_durations) / len(known_durations)
+            else:
+                default_duration = _DEFAULT_ACTION_DURATION
+            for item in reversed(planned_entries):
+                duration = 0.0
+                if item.timing_key is not None:
+                    duration = self.ctl.durations.get(item.timing_key, default_duration)
+                blocked_weight = 0.0
+                for dependent in item.dependents:
+                    if dependent.weight > blocked_weight:
+                        blocked_weight = dependent.weight
+                item.weight = duration + blocked_weight
+                item.rank = (-item.weight, -len(item.dependents), item.sequence)
+                item.dispatched = True
+            ready_entries = [ item for item in planned_entries if item.pending == 0 ]
+        for item in ready_entries:
+            self.input_queue.put((item.rank, item))
+
+    def explain(self):
+        self.load_durations()
+        with self.ctl.graph_guard:
+            planned_entries = self.planned_entries
+            self.planned_entries = []
+        reasons = {}
+        errors = []
+        pending = queue.Queue()
+        for item in planned_entries:
+            if not item.ctx.force and not item.action.explain_in_order:
+                pending.put(item)
+        workers = []
+        for idx in range(min(self.jobs_count, pending.qsize())):
+            th = threading.Thread(target=explain_main, name='buildsys-explain-{}'.format(idx + 1), args=(pending, reasons, errors))
+            th.start()
+            workers.append(th)
+        for th in workers:
+            th.join()
+        if errors:
+            etype, value, tb = errors[0]
+            if isinstance(value, BuildSystemException):
+                raise value
+            raise BuildSystemException(traceback_to_string(etype, value, tb))
+
+        known_durations = list(self.ctl.durations.values())
+        default_duration = sum(known_durations) / len(known_durations) if known_durations else _DEFAULT_ACTION_DURATION
+        output = ToolsetActionOutputInMemory()
+        items = []
+        total_estimate = 0.0
+        for item in planned_entries:
+            rebuilt_triggers = [ trigger for trigger in item.triggers if trigger.plan_reason is not None ]
+            if item.ctx.force:
+                item.plan_reason = 'rebuild is forced'
+            elif rebuilt_triggers:
+                trigger = rebuilt_triggers[0]
+                item.plan_reason = "prerequisite is rebuilt: '{}'".format(trigger.action.plan_title) if trigger.action.plan_title else trigger.plan_reason
+            elif item.action.explain_in_order:
+                item.plan_reason = item.action.eval_rebuild_reason(output, item.ctx)
+            else:
+                item.plan_reason = reasons.get(item.sequence)
+            if item.plan_reason is None or not item.action.plan_title:
+                continue
+            estimate = 0.0
+            if item.timing_key is not None:
+                estimate = self.ctl.durations.get(item.timing_key, default_duration)
+            item.weight = estimate
+            total_estimate += estimate
+            items.append(ActionPlanItem(item.action.plan_title, item.plan_reason, estimate))
+
+        critical_estimate = 0.0
+        for item in reversed(planned_entries):
+            blocked_weight = 0.0
+            for dependent in item.dependents:
+                if dependent.weight > blocked_weight:
+                    blocked_weight = dependent.weight
+            item.weight += blocked_weight
+            if item.weight > critical_estimate:
+                critical_estimate = item.weight
+        return ActionsPlan(items, total_estimate, critical_estimate, self.jobs_count)
 
     def join(self):
+        self.dispatch()
         try:
             self.input_queue.join()
         except KeyboardInterrupt:
@@ -148,7 +392,30 @@ class ActionsPool:
         self.ctl.reset()
         return rebuilt
 
+    def load_durations(self):
+        if self.durations_file is None or not os.path.isfile(self.durations_file):
+            return
+        try:
+            with open(self.durations_file, mode='rt') as fh:
+                durations = json.load(fh)
+        except ValueError:
+            return
+        if isinstance(durations, dict):
+            self.ctl.durations.update(durations)
+
+    def save_durations(self):
+        if self.durations_file is None or not self.ctl.durations:
+            return
+        durations_file_tmp = self.durations_file + '.tmp'
+        with open(durations_file_tmp, mode='wt') as fh:
+            json.dump(self.ctl.durations, fh, sort_keys=True, indent=4)
+        if os.path.isfile(self.durations_file):
+            os.remove(self.durations_file)
+        os.rename(durations_file_tmp, self.durations_file)
+
     def init(self):
+        self.discard_planned()
+        self.load_durations()
         printer = threading.Thread(target=print_main, name='buildsys-print', args=(self.verbose, self.verbose_fmt, self.ctl))
         printer.start()
         self.printer = printer
@@ -160,9 +427,12 @@ class ActionsPool:
     def shutdown(self):
         active_workers_count = len(self.workers)
         for idx in range(self.jobs_count):
-            self.input_queue.put(None)
+            self.input_queue.put(((float('inf'), 0, idx), None))
         for idx in range(active_workers_count):
             self.workers[idx].join()
+        self.workers = []
         if self.printer is not None:
             self.output_queue.put(None)
             self.printer.join()
+            self.printer = None
+        self.save_durations()
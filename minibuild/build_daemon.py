@@ -0,0 +1,275 @@
+from __future__ import print_function
+import hashlib
+import json
+import os
+import os.path
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from .constants import BUILD_CONFIG_DEFAULT_DAEMON_SOCKET_FILE
+from .error_utils import BuildSystemException
+from .os_utils import mkdir_safe
+
+
+DAEMON_IDLE_TIMEOUT = 3 * 60 * 60
+DAEMON_SPAWN_TIMEOUT = 15.0
+_DAEMON_PROTOCOL = 'minibuild-daemon-1'
+_DAEMON_SOCKET_PATH_MAX = 100
+_DAEMON_EXIT_CODE_INTERNAL_ERROR = 126
+_PY2 = sys.version_info[0] == 2
+
+
+def _check_unix_sockets():
+    if not hasattr(socket, 'AF_UNIX'):
+        raise BuildSystemException("Build daemon is not supported on this platform, unix domain sockets are not available.")
+
+
+def eval_daemon_socket_path(output_dname):
+    socket_path = os.path.join(output_dname, BUILD_CONFIG_DEFAULT_DAEMON_SOCKET_FILE)
+    if len(socket_path) <= _DAEMON_SOCKET_PATH_MAX:
+        return socket_path
+    socket_id = hashlib.sha1(os.path.normcase(socket_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), 'minibuild-{}-{}.sock'.format(os.getuid(), socket_id))
+
+
+class _DaemonChannel:
+    def __init__(self, sock):
+        self._sock = sock
+        self._fh_in = sock.makefile('rb')
+        self._guard = threading.Lock()
+        self.broken = False
+
+    def send(self, message):
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        with self._guard:
+            if self.broken:
+                return
+            try:
+                self._sock.sendall(data)
+            except socket.error:
+                self.broken = True
+
+    def receive(self):
+        try:
+            line = self._fh_in.readline()
+        except socket.error:
+            return None
+        if not line:
+            return None
+        try:
+            return json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
+
+    def close(self):
+        self._fh_in.close()
+        self._sock.close()
+
+
+class _DaemonOutputStream:
+    encoding = 'utf-8'
+
+    def __init__(self, channel, stream_id):
+        self._channel = channel
+        self._stream_id = stream_id
+
+    def write(self, text):
+        if not text:
+            return
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', 'replace')
+        self._channel.send({self._stream_id: text})
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def _connect_daemon(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+def is_daemon_alive(socket_path):
+    sock = _connect_daemon(socket_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+class BuildDaemonServer:
+    def __init__(self, socket_path, version, perform_request, idle_timeout=DAEMON_IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.version = version
+        self._perform_request = perform_request
+        self._idle_timeout = idle_timeout
+
+    def serve(self):
+        _check_unix_sockets()
+        if is_daemon_alive(self.socket_path):
+            raise BuildSystemException("Build daemon is already running at '{}'.".format(self.socket_path))
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        mkdir_safe(os.path.dirname(self.socket_path))
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        socket_inode = os.stat(self.socket_path).st_ino
+        listener.listen(8)
+        listener.settimeout(self._idle_timeout)
+        print("BUILDSYS: daemon: pid {}, listening at '{}'".format(os.getpid(), self.socket_path))
+        sys.stdout.flush()
+        try:
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    print("BUILDSYS: daemon: idle for {} seconds, exiting".format(self._idle_timeout))
+                    break
+                conn.settimeout(None)
+                channel = _DaemonChannel(conn)
+                try:
+                    keep_serving = self._serve_connection(channel)
+                finally:
+                    channel.close()
+                sys.stdout.flush()
+                if not keep_serving:
+                    break
+        finally:
+            listener.close()
+            try:
+                if os.stat(self.socket_path).st_ino == socket_inode:
+                    os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def _serve_connection(self, channel):
+        request = channel.receive()
+        if request is None or request.get('protocol') != _DAEMON_PROTOCOL:
+            return True
+        if request.get('stop'):
+            print("BUILDSYS: daemon: stop requested")
+            channel.send({'exit': 0})
+            return False
+        if request.get('version') != self.version:
+            print("BUILDSYS: daemon: client version '{}' differs, exiting".format(request.get('version')))
+            channel.send({'restart': True})
+            return False
+        print("BUILDSYS: daemon: CWD: '{}', RUN: {}".format(request['cwd'], ' '.join(request['argv'])))
+        channel.send({'exit': self._perform(channel, request)})
+        return True
+
+    def _perform(self, channel, request):
+        saved_cwd = os.getcwd()
+        saved_environ = dict(os.environ)
+        saved_stdout, saved_stderr = sys.stdout, sys.stderr
+        try:
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.stdout = _DaemonOutputStream(channel, 'out')
+            sys.stderr = _DaemonOutputStream(channel, 'err')
+            return self._perform_request(request['argv'])
+        except Exception:
+            sys.stderr.write(traceback.format_exc())
+            return _DAEMON_EXIT_CODE_INTERNAL_ERROR
+        finally:
+            sys.stdout, sys.stderr = saved_stdout, saved_stderr
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            os.chdir(saved_cwd)
+
+
+def _spawn_daemon(spawn_argv, spawn_env, log_path):
+    mkdir_safe(os.path.dirname(log_path))
+    spawn_kwargs = {}
+    if _PY2:
+        spawn_kwargs['preexec_fn'] = os.setsid
+    else:
+        spawn_kwargs['start_new_session'] = True
+    with open(os.devnull, 'rb') as fh_null:
+        with open(log_path, 'ab') as fh_log:
+            subprocess.Popen(spawn_argv, stdin=fh_null, stdout=fh_log, stderr=subprocess.STDOUT, env=spawn_env, close_fds=True, **spawn_kwargs)
+
+
+def _wait_daemon(socket_path, alive, timeout=DAEMON_SPAWN_TIMEOUT):
+    time_limit = time.time() + timeout
+    while is_daemon_alive(socket_path) != alive:
+        if time.time() > time_limit:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def _write_client_output(stream, text):
+    if _PY2 and not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    stream.write(text)
+    stream.flush()
+
+
+def run_daemon_client(socket_path, version, argv, spawn_argv, spawn_env, log_path):
+    _check_unix_sockets()
+    for _ in range(2):
+        sock = _connect_daemon(socket_path)
+        if sock is None:
+            _spawn_daemon(spawn_argv, spawn_env, log_path)
+            if not _wait_daemon(socket_path, True):
+                raise BuildSystemException("Build daemon is not started in {} seconds, see log file: '{}'.".format(DAEMON_SPAWN_TIMEOUT, log_path))
+            sock = _connect_daemon(socket_path)
+            if sock is None:
+                raise BuildSystemException("Can't connect to build daemon at '{}', see log file: '{}'.".format(socket_path, log_path))
+        channel = _DaemonChannel(sock)
+        restart = False
+        exit_code = None
+        try:
+            channel.send({'protocol': _DAEMON_PROTOCOL, 'version': version, 'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)})
+            while True:
+                message = channel.receive()
+                if message is None:
+                    break
+                if 'out' in message:
+                    _write_client_output(sys.stdout, message['out'])
+                elif 'err' in message:
+                    _write_client_output(sys.stderr, message['err'])
+                elif 'restart' in message:
+                    restart = True
+                    break
+                elif 'exit' in message:
+                    exit_code = message['exit']
+                    break
+        finally:
+            channel.close()
+        if not restart:
+            if exit_code is None:
+                raise BuildSystemException("Connection to build daemon is lost, see log file: '{}'.".format(log_path))
+            return exit_code
+        _wait_daemon(socket_path, False)
+    raise BuildSystemException("Can't start build daemon of matching version, see log file: '{}'.".format(log_path))
+
+
+def stop_daemon(socket_path):
+    _check_unix_sockets()
+    sock = _connect_daemon(socket_path)
+    if sock is None:
+        return False
+    channel = _DaemonChannel(sock)
+    try:
+        channel.send({'protocol': _DAEMON_PROTOCOL, 'stop': True})
+        channel.receive()
+    finally:
+        channel.close()
+    _wait_daemon(socket_path, False)
+    return True
@@ -3,6 +3,7 @@ import re
 import sys
 import threading
 
+from .build_state import eval_data_digest
 from .constants import *
 from .error_utils import BuildSystemException
 from .grammar_subst import preprocess_grammar_value
@@ -148,15 +149,30 @@ class BuildDescription:
     def __init__(self, tokens):
         self._tokens = tokens
         self._buildsys_import_list = None
+        self._consumed_tokens = None
 
     def __getattr__(self, attr):
         if attr in self._tokens:
+            if self._consumed_tokens is not None:
+                self._consumed_tokens.add(attr)
             return self._tokens[attr]
         title = None
         if TAG_GRAMMAR_BUILTIN_SELF_FILE_PARTS and self._tokens[TAG_GRAMMAR_BUILTIN_SELF_FILE_PARTS]:
             title = self._tokens[TAG_GRAMMAR_BUILTIN_SELF_FILE_PARTS][0]
         raise AttributeError("'{}[{}]' object has no attribute '{}'".format(self.__class__.__name__, title, attr))
 
+    def begin_tokens_tracking(self):
+        self._consumed_tokens = set()
+
+    def end_tokens_tracking(self):
+        consumed_tokens = self._consumed_tokens
+        self._consumed_tokens = None
+        consumed_tokens.discard(TAG_GRAMMAR_BUILTIN_SELF_FILE_PARTS)
+        return sorted(consumed_tokens)
+
+    def eval_tokens_digest(self, token_names):
+        return eval_data_digest([ [name, self._tokens[name]] for name in token_names ])
+
 
 class BuildDescriptionLoader:
     def __init__(self, sys_platform, sys_arch):
@@ -173,6 +189,8 @@ class BuildDescriptionLoader:
         self.buildsys_builtins[TAG_BUILDSYS_TARGET_PLATFORM] = value
 
     def set_build_config(self, value):
+        if self.buildsys_builtins.get(TAG_BUILDSYS_CONFIG) != value:
+            self.reset()
         self.buildsys_builtins[TAG_BUILDSYS_CONFIG] = value
 
     def set_toolset_name(self, value):
@@ -186,6 +204,18 @@ class BuildDescriptionLoader:
     def set_import_hook(self, import_hook):
         self.import_hook = import_hook
 
+    def reset(self):
+        with self.lock:
+            self.cache = {}
+
+    def list_loaded_files(self):
+        loaded_files = set()
+        with self.lock:
+            for model_cache in self.cache.values():
+                for desc in model_cache.values():
+                    loaded_files.update(desc._tokens[TAG_GRAMMAR_BUILTIN_SELF_FILE_PARTS])
+        return sorted(loaded_files)
+
     def load_build_description(self, working_dir, model, required_by=None):
         desc = None
         self.lock.acquire()
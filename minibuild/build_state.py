@@ -0,0 +1,494 @@
+import array
+import hashlib
+import json
+import os
+import os.path
+import sqlite3
+import sys
+import threading
+
+from .os_utils import load_py_object
+from .stat_cache import query_file_status, set_file_mtime_ns
+
+
+_PY2 = sys.version_info[0] == 2
+_BUILD_STATE_SCHEMA_VERSION = 6
+_DIGEST_BLOCK_SIZE = 1024 * 1024
+_COMMAND_ENV_VARS = frozenset([
+    'CPATH', 'C_INCLUDE_PATH', 'CPLUS_INCLUDE_PATH', 'OBJC_INCLUDE_PATH',
+    'COMPILER_PATH', 'GCC_EXEC_PREFIX', 'LIBRARY_PATH', 'SOURCE_DATE_EPOCH',
+    'SDKROOT', 'MACOSX_DEPLOYMENT_TARGET',
+    'INCLUDE', 'LIB', 'LIBPATH', 'CL', '_CL_',
+])
+
+
+def _pack_ids(ids):
+    packed = array.array('i', ids)
+    if _PY2:
+        return buffer(packed.tostring())
+    return packed.tobytes()
+
+
+def _unpack_ids(blob):
+    unpacked = array.array('i')
+    if _PY2:
+        unpacked.fromstring(str(blob))
+    else:
+        unpacked.frombytes(blob)
+    return unpacked.tolist()
+
+
+def _pack_digest(digest):
+    if digest is None:
+        return None
+    if _PY2:
+        return buffer(digest)
+    return digest
+
+
+def _unpack_digest(blob):
+    if blob is None:
+        return None
+    if _PY2:
+        return str(blob)
+    return bytes(blob)
+
+
+def _new_digest():
+    if hasattr(hashlib, 'blake2b'):
+        return hashlib.blake2b(digest_size=20)
+    return hashlib.sha1()
+
+
+def _encode_text(text):
+    if _PY2 and isinstance(text, str):
+        return text
+    return text.encode('utf-8')
+
+
+def eval_command_digest(argv, env):
+    if env is None:
+        env = os.environ
+    digest = _new_digest()
+    for arg in argv:
+        digest.update(_encode_text(arg))
+        digest.update(b'\0')
+    for var_name in sorted(env.keys()):
+        if var_name.upper() in _COMMAND_ENV_VARS:
+            digest.update(b'\n')
+            digest.update(_encode_text(var_name))
+            digest.update(b'=')
+            digest.update(_encode_text(env[var_name]))
+    return digest.digest()
+
+
+def eval_data_digest(data):
+    digest = _new_digest()
+    digest.update(_encode_text(json.dumps(data, sort_keys=True, default=repr)))
+    return digest.digest()
+
+
+def eval_file_digest(path):
+    digest = _new_digest()
+    with open(path, mode='rb') as fh:
+        while True:
+            block = fh.read(_DIGEST_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.digest()
+
+
+class BuildStateTarget:
+    def __init__(self, depends, mtime_ns, size, inputs_digest=None, command_digest=None):
+        self.depends = depends
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.inputs_digest = inputs_digest
+        self.command_digest = command_digest
+
+
+class BuildStateFile:
+    def __init__(self, mtime_ns, size, inode, digest):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.inode = inode
+        self.digest = digest
+
+
+class BuildStateModule:
+    def __init__(self, fingerprint, inputs, depends, artifacts):
+        self.fingerprint = fingerprint
+        self.inputs = inputs
+        self.depends = depends
+        self.artifacts = artifacts
+
+
+class BuildStateDependents:
+    def __init__(self, targets, modules, artifacts):
+        self.targets = targets
+        self.modules = modules
+        self.artifacts = artifacts
+
+
+class BuildState:
+    def __init__(self, state_file, project_root):
+        self._state_file = state_file
+        self._state_dir = os.path.dirname(state_file)
+        self._project_root = project_root
+        self._guard = threading.Lock()
+        self._path_ids = {}
+        self._targets = {}
+        self._dirty_targets = set()
+        self._files = {}
+        self._dirty_files = set()
+        self._modules = {}
+        self._dirty_modules = set()
+        self._sources = {}
+        self._dirty_sources = set()
+        self._loaded_status = None
+
+    def _eval_state_file_status(self):
+        file_status = query_file_status(self._state_file)
+        if file_status is None:
+            return None
+        return (file_status.mtime_ns, file_status.size, file_status.inode)
+
+    def _target_key(self, target_path):
+        return os.path.relpath(target_path, self._state_dir).replace('\\', '/')
+
+    def _target_path(self, target_key):
+        return os.path.normpath(os.path.join(self._state_dir, target_key))
+
+    def _resolve_path_ids(self, connection, paths):
+        path_ids = {}
+        for path in paths:
+            path_id = self._path_ids.get(path)
+            if path_id is None:
+                connection.execute('INSERT OR IGNORE INTO paths (path) VALUES (?)', (path,))
+                path_id = connection.execute('SELECT id FROM paths WHERE path = ?', (path,)).fetchone()[0]
+            path_ids[path] = path_id
+        return path_ids
+
+    def _connect(self):
+        connection = sqlite3.connect(self._state_file, timeout=60)
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != _BUILD_STATE_SCHEMA_VERSION:
+            connection.execute('DROP TABLE IF EXISTS paths')
+            connection.execute('DROP TABLE IF EXISTS targets')
+            connection.execute('DROP TABLE IF EXISTS files')
+            connection.execute('DROP TABLE IF EXISTS modules')
+            connection.execute('DROP TABLE IF EXISTS reverse_depends')
+            connection.execute('DROP TABLE IF EXISTS sources')
+            connection.execute('CREATE TABLE paths (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE)')
+            connection.execute('CREATE TABLE targets (path_id INTEGER PRIMARY KEY, depends BLOB, mtime_ns INTEGER, size INTEGER, inputs_digest BLOB, command_digest BLOB)')
+            connection.execute('CREATE TABLE files (path_id INTEGER PRIMARY KEY, mtime_ns INTEGER, size INTEGER, inode INTEGER, digest BLOB)')
+            connection.execute('CREATE TABLE modules (path_id INTEGER PRIMARY KEY, fingerprint BLOB, inputs BLOB, depends BLOB, artifacts TEXT)')
+            connection.execute('CREATE TABLE reverse_depends (path_id INTEGER NOT NULL, dependent_id INTEGER NOT NULL, PRIMARY KEY (path_id, dependent_id))')
+            connection.execute('CREATE INDEX reverse_depends_dependent ON reverse_depends (dependent_id)')
+            connection.execute('CREATE TABLE sources (path_id INTEGER PRIMARY KEY, module_id INTEGER NOT NULL)')
+            connection.execute('PRAGMA user_version = {}'.format(_BUILD_STATE_SCHEMA_VERSION))
+            connection.commit()
+        return connection
+
+    def load(self):
+        state_file_status = self._eval_state_file_status()
+        if state_file_status is not None and state_file_status == self._loaded_status:
+            return
+        self._loaded_status = None
+        self._path_ids = {}
+        self._targets = {}
+        self._dirty_targets = set()
+        self._files = {}
+        self._dirty_files = set()
+        self._modules = {}
+        self._dirty_modules = set()
+        self._sources = {}
+        self._dirty_sources = set()
+        if not os.path.isfile(self._state_file):
+            return
+        try:
+            connection = self._connect()
+            try:
+                paths = {}
+                for path_id, path in connection.execute('SELECT id, path FROM paths'):
+                    paths[path_id] = path
+                    self._path_ids[path] = path_id
+                for path_id, depends, mtime_ns, size, inputs_digest, command_digest in connection.execute('SELECT path_id, depends, mtime_ns, size, inputs_digest, command_digest FROM targets'):
+                    depends_list = [ paths[dep_id] for dep_id in _unpack_ids(depends) ]
+                    self._targets[paths[path_id]] = BuildStateTarget(depends_list, mtime_ns, size, _unpack_digest(inputs_digest), _unpack_digest(command_digest))
+                for path_id, mtime_ns, size, inode, digest in connection.execute('SELECT path_id, mtime_ns, size, inode, digest FROM files'):
+                    self._files[paths[path_id]] = BuildStateFile(mtime_ns, size, inode, _unpack_digest(digest))
+                for path_id, fingerprint, inputs, depends, artifacts in connection.execute('SELECT path_id, fingerprint, inputs, depends, artifacts FROM modules'):
+                    inputs_list = [ paths[input_id] for input_id in _unpack_ids(inputs) ]
+                    depends_list = [ paths[dep_id] for dep_id in _unpack_ids(depends) ]
+                    self._modules[paths[path_id]] = BuildStateModule(_unpack_digest(fingerprint), inputs_list, depends_list, json.loads(artifacts))
+                for path_id, module_id in connection.execute('SELECT path_id, module_id FROM sources'):
+                    self._sources[paths[path_id]] = paths[module_id]
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            self._path_ids = {}
+            self._targets = {}
+            self._files = {}
+            self._modules = {}
+            self._sources = {}
+            os.remove(self._state_file)
+        self._loaded_status = self._eval_state_file_status()
+
+    def save(self):
+        with self._guard:
+            if not self._dirty_targets and not self._dirty_files and not self._dirty_modules and not self._dirty_sources:
+                return
+            target_rows = []
+            dependent_keys = []
+            reverse_rows = []
+            for target_key in sorted(self._dirty_targets):
+                target = self._targets[target_key]
+                target_rows.append((target_key, target.depends, target.mtime_ns, target.size, _pack_digest(target.inputs_digest), _pack_digest(target.command_digest)))
+                dependent_keys.append(target_key)
+                dep_keys = set([ self._target_key(os.path.join(self._project_root, dep)) for dep in target.depends ])
+                reverse_rows.extend([ (dep_key, target_key) for dep_key in sorted(dep_keys) ])
+            file_rows = []
+            for file_key in sorted(self._dirty_files):
+                file_info = self._files[file_key]
+                file_rows.append((file_key, file_info.mtime_ns, file_info.size, file_info.inode, _pack_digest(file_info.digest)))
+            module_rows = []
+            for module_key in sorted(self._dirty_modules):
+                module = self._modules[module_key]
+                module_rows.append((module_key, _pack_digest(module.fingerprint), module.inputs, module.depends, json.dumps(module.artifacts)))
+                dependent_keys.append(module_key)
+                reverse_rows.extend([ (input_key, module_key) for input_key in sorted(set(module.inputs) | set(module.depends)) ])
+            source_rows = [ (source_key, self._sources[source_key]) for source_key in sorted(self._dirty_sources) ]
+            used_paths = set(dependent_keys) | set([ row[0] for row in file_rows ]) | set([ path for row in reverse_rows for path in row ])
+            for row in target_rows:
+                used_paths.update(row[1])
+            for row in module_rows:
+                used_paths.update(row[2])
+                used_paths.update(row[3])
+            for row in source_rows:
+                used_paths.update(row)
+            connection = self._connect()
+            try:
+                connection.isolation_level = None
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    state_file_unchanged = self._loaded_status is not None and self._eval_state_file_status() == self._loaded_status
+                    if not state_file_unchanged:
+                        self._path_ids = {}
+                    path_ids = self._resolve_path_ids(connection, sorted(used_paths))
+                    connection.executemany('INSERT OR REPLACE INTO targets (path_id, depends, mtime_ns, size, inputs_digest, command_digest) VALUES (?, ?, ?, ?, ?, ?)',
+                        [ (path_ids[key], _pack_ids([ path_ids[dep] for dep in depends ]), mtime_ns, size, inputs_digest, command_digest) for key, depends, mtime_ns, size, inputs_digest, command_digest in target_rows ])
+                    connection.executemany('INSERT OR REPLACE INTO files (path_id, mtime_ns, size, inode, digest) VALUES (?, ?, ?, ?, ?)',
+                        [ (path_ids[row[0]],) + row[1:] for row in file_rows ])
+                    connection.executemany('INSERT OR REPLACE INTO modules (path_id, fingerprint, inputs, depends, artifacts) VALUES (?, ?, ?, ?, ?)',
+                        [ (path_ids[key], fingerprint, _pack_ids([ path_ids[input_key] for input_key in inputs ]), _pack_ids([ path_ids[dep_key] for dep_key in depends ]), artifacts) for key, fingerprint, inputs, depends, artifacts in module_rows ])
+                    connection.executemany('INSERT OR REPLACE INTO sources (path_id, module_id) VALUES (?, ?)',
+                        [ (path_ids[source_key], path_ids[module_key]) for source_key, module_key in source_rows ])
+                    connection.executemany('DELETE FROM reverse_depends WHERE dependent_id = ?', [ (path_ids[key],) for key in dependent_keys ])
+                    connection.executemany('INSERT OR IGNORE INTO reverse_depends (path_id, dependent_id) VALUES (?, ?)',
+                        [ (path_ids[path_key], path_ids[dependent_key]) for path_key, dependent_key in reverse_rows ])
+                    connection.execute('COMMIT')
+                except:
+                    connection.execute('ROLLBACK')
+                    self._path_ids = {}
+                    raise
+            finally:
+                connection.close()
+            self._path_ids.update(path_ids)
+            self._loaded_status = self._eval_state_file_status() if state_file_unchanged else None
+            self._dirty_targets = set()
+            self._dirty_files = set()
+            self._dirty_modules = set()
+            self._dirty_sources = set()
+
+    def query_dependents(self, paths):
+        targets = set()
+        modules = set()
+        artifacts = set()
+        if not os.path.isfile(self._state_file):
+            return BuildStateDependents([], [], [])
+        connection = self._connect()
+        try:
+            pending = []
+            for path in paths:
+                row = connection.execute('SELECT id FROM paths WHERE path = ?', (self._target_key(path),)).fetchone()
+                if row is not None:
+                    pending.append(row[0])
+            visited = set(pending)
+            while pending:
+                path_id = pending.pop()
+                for dependent_id, dependent_path, artifacts_text in connection.execute(
+                        'SELECT reverse_depends.dependent_id, paths.path, modules.artifacts FROM reverse_depends'
+                        ' JOIN paths ON paths.id = reverse_depends.dependent_id'
+                        ' LEFT JOIN modules ON modules.path_id = reverse_depends.dependent_id'
+                        ' WHERE reverse_depends.path_id = ?', (path_id,)).fetchall():
+                    if dependent_id in visited:
+                        continue
+                    visited.add(dependent_id)
+                    pending.append(dependent_id)
+                    if artifacts_text is None:
+                        targets.add(self._target_path(dependent_path))
+                    else:
+                        modules.add(dependent_path)
+                        for _, art_key, _ in json.loads(artifacts_text):
+                            artifacts.add(self._target_path(art_key))
+                            row = connection.execute('SELECT id FROM paths WHERE path = ?', (art_key,)).fetchone()
+                            if row is not None and row[0] not in visited:
+                                visited.add(row[0])
+                                pending.append(row[0])
+        finally:
+            connection.close()
+        return BuildStateDependents(sorted(targets), sorted(modules), sorted(artifacts))
+
+    def _get_target(self, target_path):
+        target_key = self._target_key(target_path)
+        with self._guard:
+            target = self._targets.get(target_key)
+        if target is None:
+            return None
+        target_status = query_file_status(target_path)
+        if target_status is None or target_status.mtime_ns != target.mtime_ns or target_status.size != target.size:
+            return None
+        return target
+
+    def get_target_depends(self, target_path, legacy_depends_file=None):
+        target_key = self._target_key(target_path)
+        with self._guard:
+            known_target = target_key in self._targets
+        if not known_target:
+            if legacy_depends_file is not None and os.path.isfile(legacy_depends_file):
+                return load_py_object(legacy_depends_file)
+            return None
+        target = self._get_target(target_path)
+        if target is None:
+            return None
+        return target.depends
+
+    def get_target_inputs_digest(self, target_path):
+        target = self._get_target(target_path)
+        if target is None:
+            return None
+        return target.inputs_digest
+
+    def get_target_command_digest(self, target_path):
+        target = self._get_target(target_path)
+        if target is None:
+            return None
+        return target.command_digest
+
+    def set_target_depends(self, target_path, depends, command_digest=None):
+        target_key = self._target_key(target_path)
+        target_status = query_file_status(target_path)
+        if target_status is None:
+            return
+        with self._guard:
+            self._targets[target_key] = BuildStateTarget(list(depends), target_status.mtime_ns, target_status.size, command_digest=command_digest)
+            self._dirty_targets.add(target_key)
+
+    def set_target_inputs_digest(self, target_path, inputs_digest):
+        target_key = self._target_key(target_path)
+        target_status = query_file_status(target_path)
+        if target_status is None:
+            return
+        with self._guard:
+            target = self._targets.get(target_key)
+            if target is None:
+                target = BuildStateTarget([], None, None)
+            self._targets[target_key] = BuildStateTarget(target.depends, target_status.mtime_ns, target_status.size, inputs_digest, target.command_digest)
+            self._dirty_targets.add(target_key)
+
+    def forget_target(self, target_path):
+        target_key = self._target_key(target_path)
+        with self._guard:
+            if target_key in self._targets:
+                self._targets[target_key] = BuildStateTarget([], None, None)
+                self._dirty_targets.add(target_key)
+
+    def get_file_digest(self, path, file_status):
+        file_key = self._target_key(path)
+        with self._guard:
+            file_info = self._files.get(file_key)
+        if file_info is not None and (file_info.size, file_info.mtime_ns, file_info.inode) == (file_status.size, file_status.mtime_ns, file_status.inode):
+            return file_info.digest
+        digest = eval_file_digest(path)
+        with self._guard:
+            self._files[file_key] = BuildStateFile(file_status.mtime_ns, file_status.size, file_status.inode, digest)
+            self._dirty_files.add(file_key)
+        return digest
+
+    def restat_output(self, path, keep_timestamp):
+        file_key = self._target_key(path)
+        with self._guard:
+            previous = self._files.get(file_key)
+        digest = eval_file_digest(path)
+        unchanged = previous is not None and previous.digest == digest
+        if unchanged and keep_timestamp:
+            set_file_mtime_ns(path, previous.mtime_ns)
+        file_status = query_file_status(path)
+        with self._guard:
+            self._files[file_key] = BuildStateFile(file_status.mtime_ns, file_status.size, file_status.inode, digest)
+            self._dirty_files.add(file_key)
+        return not unchanged
+
+    def eval_inputs_digest(self, stat_cache, prerequisites):
+        inputs_digest = _new_digest()
+        for path in prerequisites:
+            file_status = stat_cache.status(path)
+            if file_status is None or not file_status.is_file:
+                return None
+            file_key = self._target_key(path)
+            if not _PY2:
+                file_key = file_key.encode('utf-8')
+            inputs_digest.update(file_key)
+            inputs_digest.update(b'\0')
+            inputs_digest.update(self.get_file_digest(path, file_status))
+        return inputs_digest.digest()
+
+    def eval_module_fingerprint(self, stat_cache, salt, inputs, depends_fingerprints):
+        inputs_digest = self.eval_inputs_digest(stat_cache, inputs)
+        if inputs_digest is None:
+            return None
+        fingerprint = _new_digest()
+        fingerprint.update(salt)
+        fingerprint.update(inputs_digest)
+        for dep_fingerprint in depends_fingerprints:
+            fingerprint.update(dep_fingerprint)
+        return fingerprint.digest()
+
+    def get_module(self, module_key):
+        with self._guard:
+            module = self._modules.get(module_key)
+        if module is None:
+            return None
+        artifacts = [ (object_type, self._target_path(art_key), attributes) for object_type, art_key, attributes in module.artifacts ]
+        return BuildStateModule(module.fingerprint, [ self._target_path(input_key) for input_key in module.inputs ], list(module.depends), artifacts)
+
+    def forget_module(self, module_key):
+        with self._guard:
+            if module_key in self._modules:
+                self._modules[module_key] = BuildStateModule(None, [], [], [])
+                self._dirty_modules.add(module_key)
+
+    def set_module(self, module_key, fingerprint, inputs, depends, artifacts):
+        inputs_keys = [ self._target_key(input_path) for input_path in inputs ]
+        artifacts_keys = [ [object_type, self._target_key(art_path), attributes] for object_type, art_path, attributes in artifacts ]
+        with self._guard:
+            self._modules[module_key] = BuildStateModule(fingerprint, inputs_keys, list(depends), artifacts_keys)
+            self._dirty_modules.add(module_key)
+
+    def get_source_module(self, source_path):
+        with self._guard:
+            module_key = self._sources.get(self._target_key(source_path))
+        if module_key is None:
+            return None
+        return self._target_path(module_key)
+
+    def set_source_modules(self, module_dir, source_paths):
+        module_key = self._target_key(module_dir)
+        with self._guard:
+            for source_path in source_paths:
+                source_key = self._target_key(source_path)
+                if self._sources.get(source_key) != module_key:
+                    self._sources[source_key] = module_key
+                    self._dirty_sources.add(source_key)
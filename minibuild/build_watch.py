@@ -0,0 +1,221 @@
+from __future__ import print_function
+import ctypes
+import ctypes.util
+import errno
+import os
+import os.path
+import select
+import struct
+import sys
+
+from .error_utils import BuildSystemException, BuildSystemSysExit, buildsys_error_to_string
+
+
+WATCH_DEBOUNCE_DEFAULT = 0.2
+
+_IN_MODIFY      = 0x00000002
+_IN_ATTRIB      = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM  = 0x00000040
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_DELETE      = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF   = 0x00000800
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_IGNORED     = 0x00008000
+_IN_ONLYDIR     = 0x01000000
+_IN_NONBLOCK    = 0o4000
+_IN_CLOEXEC     = 0o2000000
+
+_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher:
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise BuildSystemException("Watch mode requires Linux inotify, it is not available on platform '{}'.".format(sys.platform))
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name if libc_name else 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise BuildSystemException("Can't initialize inotify: {}".format(os.strerror(ctypes.get_errno())))
+        self._watched_dirs = {}
+        self._watch_descriptors = {}
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def watch_dirs(self, dirnames):
+        dirnames = set(dirnames)
+        for dname in sorted(set(self._watched_dirs) - dirnames):
+            self._libc.inotify_rm_watch(self._fd, self._watched_dirs.pop(dname))
+        for dname in sorted(dirnames - set(self._watched_dirs)):
+            wd = self._libc.inotify_add_watch(self._fd, dname.encode(sys.getfilesystemencoding()), _WATCH_MASK)
+            if wd < 0:
+                if ctypes.get_errno() in [errno.ENOENT, errno.ENOTDIR]:
+                    continue
+                raise BuildSystemException("Can't watch directory '{}': {}".format(dname, os.strerror(ctypes.get_errno())))
+            self._watched_dirs[dname] = wd
+            self._watch_descriptors[wd] = dname
+        return len(self._watched_dirs)
+
+    def wait(self, timeout=None):
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except select.error as exc:
+            if exc.args[0] == errno.EINTR:
+                return False
+            raise
+        return True if readable else False
+
+    def read_changes(self):
+        changed_paths = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except OSError as exc:
+                if exc.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b'\0')
+                offset += name_len
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                dname = self._watch_descriptors.get(wd)
+                if dname is None:
+                    continue
+                if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                    if mask & _IN_IGNORED:
+                        self._watch_descriptors.pop(wd, None)
+                        if self._watched_dirs.get(dname) == wd:
+                            self._watched_dirs.pop(dname)
+                    changed_paths.add(dname)
+                    continue
+                if name:
+                    changed_paths.add(os.path.join(dname, name.decode(sys.getfilesystemencoding())))
+        return changed_paths, overflow
+
+
+class BuildWatchIndex:
+    def __init__(self, project_root_prefix, project_output_prefix):
+        self._root_prefix = project_root_prefix
+        self._output_prefix = project_output_prefix
+        self.targets = {}
+        self.modules = {}
+        self.makefiles = set()
+
+    def _accept(self, path):
+        norm_path = os.path.normcase(path)
+        return norm_path.startswith(self._root_prefix) and not norm_path.startswith(self._output_prefix)
+
+    def add_prerequisite(self, path, target_path):
+        path = os.path.normpath(path)
+        if self._accept(path):
+            self.targets.setdefault(path, set()).add(target_path)
+
+    def add_module_input(self, path, module_key):
+        path = os.path.normpath(path)
+        if self._accept(path):
+            self.modules.setdefault(path, set()).add(module_key)
+
+    def add_makefile(self, path):
+        path = os.path.normpath(path)
+        if self._accept(path):
+            self.makefiles.add(path)
+
+    def update(self, other):
+        for path, target_paths in other.targets.items():
+            self.targets.setdefault(path, set()).update(target_paths)
+        for path, module_keys in other.modules.items():
+            self.modules.setdefault(path, set()).update(module_keys)
+        self.makefiles.update(other.makefiles)
+
+    def list_files(self):
+        return set(self.targets) | set(self.modules) | self.makefiles
+
+    def list_dirs(self):
+        dirnames = set()
+        for path in self.list_files():
+            dirnames.add(os.path.dirname(path))
+        return dirnames
+
+    def filter_changes(self, changed_paths):
+        known_files = self.list_files()
+        known_dirs = self.list_dirs()
+        result = set()
+        for path in changed_paths:
+            if path in known_files:
+                result.add(path)
+            elif path in known_dirs:
+                result.update([ x for x in known_files if os.path.dirname(x) == path ])
+        return sorted(result)
+
+
+def run_watch_loop(create_workflow, extra_makefiles, debounce, verbose):
+    watcher = InotifyWatcher()
+    try:
+        logic, build_args = create_workflow()
+        logic.enable_watch()
+        watch_index = None
+        while True:
+            if logic is not None:
+                build_failed = True
+                try:
+                    logic.run(**build_args)
+                    build_failed = False
+                except BuildSystemSysExit:
+                    pass
+                except BuildSystemException as exc:
+                    print(buildsys_error_to_string(exc))
+                if build_failed and watch_index is not None:
+                    logic.watch_index.update(watch_index)
+                watch_index = logic.watch_index
+                for makefile in extra_makefiles:
+                    watch_index.add_makefile(makefile)
+            dirs_count = watcher.watch_dirs(watch_index.list_dirs())
+            print("BUILDSYS: watching {} files in {} directories for changes ...".format(len(watch_index.list_files()), dirs_count))
+            sys.stdout.flush()
+            changed_paths = _wait_changes(watcher, watch_index, debounce)
+            if logic is None or changed_paths is None or watch_index.makefiles.intersection(changed_paths):
+                if verbose:
+                    print("BUILDSYS: makefiles changed or events overflow, reload all")
+                try:
+                    logic, build_args = create_workflow()
+                    logic.enable_watch()
+                except BuildSystemException as exc:
+                    print(buildsys_error_to_string(exc))
+                    logic = None
+                continue
+            for path in changed_paths:
+                print("BUILDSYS: changed: {}".format(path))
+            logic.invalidate_watched_paths(changed_paths)
+    except KeyboardInterrupt:
+        print("BUILDSYS: watch stopped")
+    finally:
+        watcher.close()
+
+
+def _wait_changes(watcher, watch_index, debounce):
+    changed_paths = set()
+    while True:
+        timeout = debounce if changed_paths else None
+        if watcher.wait(timeout):
+            paths, overflow = watcher.read_changes()
+            if overflow:
+                return None
+            changed_paths.update(watch_index.filter_changes(paths))
+        elif changed_paths:
+            return sorted(changed_paths)
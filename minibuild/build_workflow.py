@@ -1,5 +1,8 @@
 from __future__ import print_function
 
+import binascii
+import contextlib
+import gzip
 import json
 import os
 import shlex
@@ -8,19 +11,38 @@ import stat
 import subprocess
 import sys
 import tarfile
+import time
 import zipfile
 
 from .actions_pool import ActionsPool
 from .build_art import BuildArtifact
+from .build_state import BuildState, eval_command_digest, eval_data_digest
+from .build_watch import BuildWatchIndex
 from .constants import *
 from .depends_check import *
 from .error_utils import BuildSystemException, BuildSystemSysExit
-from .os_utils import cleanup_dir, mkdir_safe, normalize_path_optional, load_py_object, touch_file
+from .os_utils import cleanup_dir, mkdir_safe, normalize_path_optional, touch_file
+from .pragma_tokens import makefile_is_project_landmark
 from .spec_file import parse_spec_file
+from .stat_cache import MTIME_TOLERANCE_DEFAULT_NS, StatCache, query_file_status
 from .string_utils import is_string_instance
-from .toolset_base import ToolsetActionContext
-
-
+from .toolset_base import ToolsetActionBase, ToolsetActionContext, ToolsetActionResult
+from .__version__ import __version__
+
+
+_ZIP_TIMESTAMP_MIN = 315532800 # 1980-01-01, earliest date zip format can store
+_MODULE_FINGERPRINT_FORMAT = 'minibuild-module-fingerprint-1'
+_MODULE_FINGERPRINT_TYPES = [
+  TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC,
+  TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED,
+  TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE,
+  TAG_GRAMMAR_VALUE_MODULE_TYPE_COMPOSITE,
+  TAG_GRAMMAR_VALUE_MODULE_TYPE_ZIP_FILE,
+]
+_UNITY_BATCH_SIZE_DEFAULT = 16
+_BATCH_COMPILE_SMALL_DURATION = 0.5
+_BATCH_COMPILE_UNKNOWN_DURATION = 0.1
+_BATCH_COMPILE_DURATION_LIMIT = 1.0
 _BUILD_TYPE_MAPPING = {
   '.cpp': BUILD_TYPE_CPP,
   '.c': BUILD_TYPE_C,
@@ -30,6 +52,18 @@ _BUILD_TYPE_MAPPING = {
 }
 
 
+def eval_relative_path(path, start):
+    try:
+        path = os.path.relpath(path, start)
+    except ValueError:
+        pass
+    return path.replace('\\', '/')
+
+
+def is_unity_batch_boundary(source_digest, batch_size):
+    return int(binascii.hexlify(source_digest[:4]), 16) % batch_size == 0
+
+
 def resolve_build_list(description, current_model):
     platform_alias = current_model.platform_alias
 
@@ -123,6 +157,22 @@ class BuildCache:
             return self._state[used_model_name].get(description.self_dirname)
         return None
 
+class ModuleFingerprintPlan:
+    def __init__(self, module_key, salt):
+        self.module_key = module_key
+        self.salt = salt
+        self.inputs = []
+        self.actions = []
+        self.depends = []
+        self.complete = True
+
+    def add_module_depends(self, module_key):
+        if module_key is None:
+            self.complete = False
+        else:
+            self.depends.append(module_key)
+
+
 class ActiveExtState:
     def __init__(self):
         self._state = {}
@@ -147,27 +197,28 @@ class ActiveExtState:
         return self._state.get(used_model_name, {}).get(description.self_dirname, 0)
 
 
-def zip_module_rebuild_required(zip_obj_dir, zippath, catalog, description, verbose):
+def eval_zip_module_rebuild_reason(stat_cache, zip_obj_dir, zippath, catalog, description, verbose):
     post_build_stamp_file = None
     if description.post_build:
         post_build_stamp_file = os.path.join(zip_obj_dir, POST_BUILD_OBJ_STAMP_FILE)
-    if not os.path.exists(zippath):
-        return True
+    zip_status = stat_cache.status(zippath)
+    if zip_status is None:
+        return "output is missing: '{}'".format(zippath)
     if post_build_stamp_file is not None:
-        if not os.path.exists(post_build_stamp_file):
-            return True
-    zip_mtime = os.path.getmtime(zippath)
+        if stat_cache.status(post_build_stamp_file) is None:
+            return "post-build stamp is missing: '{}'".format(post_build_stamp_file)
+    zip_mtime = zip_status.mtime_ns
     for desc_file_part in description.self_file_parts:
-        desc_part_mtime = os.path.getmtime(desc_file_part)
-        if prerequisite_newer_then_target(zip_mtime, desc_part_mtime, zippath, desc_part_mtime, verbose):
-            return True
+        desc_part_mtime = stat_cache.mtime_ns(desc_file_part)
+        if prerequisite_newer_then_target(zip_mtime, desc_part_mtime, zippath, desc_file_part, verbose, stat_cache.tolerance_ns):
+            return "prerequisite is newer: '{}'".format(desc_file_part)
     for fpath, _ in catalog:
-        if not os.path.isfile(fpath):
-            return True
-        mt = os.path.getmtime(fpath)
-        if prerequisite_newer_then_target(zip_mtime, mt, zippath, fpath, verbose):
-            return True
-    return False
+        fpath_status = stat_cache.status(fpath)
+        if fpath_status is None or not fpath_status.is_file:
+            return "prerequisite is missing: '{}'".format(fpath)
+        if prerequisite_newer_then_target(zip_mtime, fpath_status.mtime_ns, zippath, fpath, verbose, stat_cache.tolerance_ns):
+            return "prerequisite is newer: '{}'".format(fpath)
+    return None
 
 
 def download_link(url, target_file):
@@ -191,14 +242,11 @@ def download_link(url, target_file):
         file_object.write(payload)
 
 
-def download_files(sysinfo, description, force_download, verbose):
+def eval_download_catalog(sysinfo, description):
     if not description.download_list:
         raise BuildSystemException("Mandatory token '{}' is missed or empty list, required in '{}'.".format(TAG_GRAMMAR_KEY_DOWNLOAD_LIST, description.self_file_parts[0]))
 
     download_obj_dir = os.path.join(sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
-    mkdir_safe(download_obj_dir)
-    have_new_downloads = False
-
     catalog = []
     result = []
     idx = 0
@@ -211,27 +259,34 @@ def download_files(sysinfo, description, force_download, verbose):
         target_file_path = os.path.join(download_obj_dir, target_fname)
         catalog.append([download_url, target_file_path])
         result.append(BuildArtifact(BUILD_RET_TYPE_RESOURCE, target_file_path, BUILD_RET_ATTR_DEFAULT))
+    return download_obj_dir, catalog, result
+
+
+def download_files(output, stat_cache, sysinfo, description, force_download, verbose):
+    download_obj_dir, catalog, result = eval_download_catalog(sysinfo, description)
+    mkdir_safe(download_obj_dir)
+    have_new_downloads = False
 
     for catalog_entry in catalog:
         download_url = catalog_entry[0]
         target_fname = catalog_entry[1]
         do_download = force_download
         if not do_download:
-            target_ready, _ = is_target_up_to_date(target_fname, None, description.self_file_parts, verbose)
+            target_ready, _ = is_target_up_to_date(stat_cache, target_fname, None, description.self_file_parts, verbose)
             if not target_ready:
                 do_download = True
         if do_download:
-            if os.path.isfile(target_fname):
+            if stat_cache.isfile(target_fname):
                 os.remove(target_fname)
             target_fname_tmp = target_fname + '.part'
-            print("BUILDSYS: downloading '{}' ...".format(download_url))
+            output.report_message("BUILDSYS: downloading '{}' ...".format(download_url))
             download_link(download_url, target_fname_tmp)
             os.rename(target_fname_tmp, target_fname)
             have_new_downloads = True
         else:
-            print("BUILDSYS: up-to-date: '{}', URL: '{}'".format(description.module_name, download_url))
+            output.report_message("BUILDSYS: up-to-date: '{}', URL: '{}'".format(description.module_name, download_url))
 
-    return (have_new_downloads, result)
+    return ToolsetActionResult(rebuilt=have_new_downloads, artifacts=result)
 
 
 def make_posix_permissions(is_exe):
@@ -241,6 +296,50 @@ def make_posix_permissions(is_exe):
     return permissions
 
 
+def eval_reproducible_timestamp():
+    source_date_epoch = os.environ.get('SOURCE_DATE_EPOCH', '0')
+    try:
+        return int(source_date_epoch)
+    except ValueError:
+        raise BuildSystemException("Got malformed value of SOURCE_DATE_EPOCH: '{}'.".format(source_date_epoch))
+
+
+@contextlib.contextmanager
+def open_tgz_archive(archive_path, timestamp):
+    if timestamp is None:
+        with tarfile.open(archive_path, mode='w:gz') as z:
+            yield z
+        return
+    with open(archive_path, mode='wb') as fh:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=fh, mtime=timestamp) as gz:
+            with tarfile.open(fileobj=gz, mode='w', format=tarfile.GNU_FORMAT) as z:
+                yield z
+
+
+def add_tar_member(z, path, arcname, is_exe, timestamp):
+    with open(path, mode='rb') as fobj:
+        info = os.fstat(fobj.fileno())
+        ti = tarfile.TarInfo()
+        ti.type = tarfile.REGTYPE
+        ti.name = arcname
+        ti.mode = make_posix_permissions(is_exe)
+        ti.size = info.st_size
+        ti.mtime = info.st_mtime if timestamp is None else timestamp
+        z.addfile(ti, fobj)
+
+
+def add_zip_member(z, path, arcname, is_exe, timestamp):
+    if timestamp is None:
+        z.write(path, arcname)
+        return
+    zi = zipfile.ZipInfo(arcname, date_time=time.gmtime(max(timestamp, _ZIP_TIMESTAMP_MIN))[:6])
+    zi.compress_type = zipfile.ZIP_DEFLATED
+    zi.create_system = 3
+    zi.external_attr = (stat.S_IFREG | make_posix_permissions(is_exe)) << 16
+    with open(path, mode='rb') as fobj:
+        z.writestr(zi, fobj.read())
+
+
 class ExtAction:
     def __init__(self, ext_type, ext_name, module_name, verbose, argv):
         self._ext_type = ext_type
@@ -249,64 +348,360 @@ class ExtAction:
         self._verbose = verbose
         self._argv = argv
 
-    def __call__(self):
-        print("BUILDSYS: run {} action '{}' for module '{}'".format(self._ext_type, self._ext_name, self._module_name))
+    def __call__(self, output):
+        output.report_message("BUILDSYS: run {} action '{}' for module '{}'".format(self._ext_type, self._ext_name, self._module_name))
         if self._verbose:
-            print("BUILDSYS: EXEC: {}".format(self._argv))
-        p = subprocess.Popen(self._argv)
-        p.communicate()
+            output.report_message("BUILDSYS: EXEC: {}".format(self._argv))
+        p = subprocess.Popen(self._argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        stdout_data, _ = p.communicate()
+        stdout_data = stdout_data.rstrip('\r\n')
+        if stdout_data:
+            output.report_message(stdout_data)
         if p.returncode != 0:
             raise BuildSystemException("Failed to run {} action '{}' for module '{}'".format(
                 self._ext_type, self._ext_name, self._module_name), exit_code=p.returncode)
 
 
+class WorkflowStepAction(ToolsetActionBase):
+    explain_in_order = True
+
+    def __init__(self, step, *args):
+        self._step = step
+        self._args = args
+        self._explain_step = None
+        self._plan_title = None
+
+    @property
+    def plan_title(self):
+        return self._plan_title
+
+    def with_explain(self, explain_step, plan_title=None):
+        self._explain_step = explain_step
+        self._plan_title = plan_title
+        return self
+
+    def execute(self, output, ctx):
+        return self._step(output, ctx, *self._args)
+
+    def eval_rebuild_reason(self, output, ctx):
+        if self._explain_step is None:
+            return None
+        return self._explain_step(output, ctx, *self._args)
+
+
 class BuildExtensionEntry:
     def __init__(self, dir_loaded_from, description):
         self.dir_loaded_from = dir_loaded_from
         self.description = description
 
 
+class BuildExtensionsRegistry:
+    def __init__(self):
+        self.mapping = {}
+        self.imported = {}
+
+
 class BuildWorkflow:
-    def __init__(self, sysinfo, toolset_models_mapping, native_model_remap, grammar_substitutions, verbose, trace, parallelism, faccess, faccess_prefixes):
+    def __init__(self, sysinfo, toolset_models_mapping, native_model_remap, grammar_substitutions, verbose, trace, parallelism, faccess, faccess_prefixes, mtime_tolerance_ns=MTIME_TOLERANCE_DEFAULT_NS, content_check=False, object_cache=None,
+            extensions=None, build_state=None, unity=False, batch_compile=0):
         self._sysinfo = sysinfo
         self._toolset_models_mapping = toolset_models_mapping
         self._native_model_remap = native_model_remap
-        self._extensions_mapping = {}
-        self._imported_extensions = {}
+        self._extensions = extensions if extensions is not None else BuildExtensionsRegistry()
         self._grammar_substitutions = grammar_substitutions
         self._build_cache = BuildCache()
+        self._module_fingerprints = {}
+        self._module_fingerprint_salts = {}
         self._ext_protector = ActiveExtState()
         self._verbose = verbose
         self._trace = trace
         self._faccess = faccess
         self._faccess_prefixes = faccess_prefixes
-        self._actions_pool = ActionsPool(jobs_count=parallelism, verbose=verbose)
+        self._content_check = content_check
+        self._unity = unity
+        self._batch_compile = batch_compile
+        self._object_cache = object_cache
+        self._reproducible = True if sysinfo.get(TAG_CFG_REPRODUCIBLE) else False
+        durations_file = os.path.join(sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT], BUILD_CONFIG_DEFAULT_DURATIONS_FILE)
+        self._actions_pool = ActionsPool(jobs_count=parallelism, verbose=verbose, durations_file=durations_file)
+        if build_state is None:
+            build_state = BuildState(os.path.join(sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT], BUILD_CONFIG_DEFAULT_BUILD_STATE_FILE), sysinfo[TAG_CFG_DIR_PROJECT_ROOT])
+        self._build_state = build_state
+        self._stat_cache = StatCache(tolerance_ns=mtime_tolerance_ns, volatile_prefix=sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX])
+        self._watch = False
+        self.watch_index = None
 
     def import_extension(self, loader, dname_import, required_by):
         dname_import_id = os.path.normcase(dname_import)
-        if dname_import_id in self._extensions_mapping:
-            return self._imported_extensions[self._extensions_mapping[dname_import_id]].description
+        if dname_import_id in self._extensions.mapping:
+            return self._extensions.imported[self._extensions.mapping[dname_import_id]].description
         ext_description = loader.load_build_extension(dname_import, required_by)
-        if ext_description.ext_name in self._imported_extensions:
-            prev_dname_import = self._imported_extensions[ext_description.ext_name].dir_loaded_from
+        if ext_description.ext_name in self._extensions.imported:
+            prev_dname_import = self._extensions.imported[ext_description.ext_name].dir_loaded_from
             raise BuildSystemException("Can't import build extension '{}' from '{}', extension with same name is already imported from '{}'.".format(ext_description.ext_name, dname_import, prev_dname_import))
-        self._extensions_mapping[dname_import_id] = ext_description.ext_name
-        self._imported_extensions[ext_description.ext_name] = BuildExtensionEntry(dname_import, ext_description)
+        self._extensions.mapping[dname_import_id] = ext_description.ext_name
+        self._extensions.imported[ext_description.ext_name] = BuildExtensionEntry(dname_import, ext_description)
         return ext_description
 
-    def run(self, build_directory, used_model_name, build_config, public, public_format, public_layout, rebuild_level):
+    def run(self, build_directory, used_model_name, build_config, public, public_format, public_layout, rebuild_level, affected_by=None, affected_report=False,
+            plan=False, plan_file=None):
         toolset, loader = self._toolset_models_mapping[used_model_name]
         current_model = toolset.supported_models[used_model_name]
         description = loader.load_build_description(build_directory, current_model)
+        self._build_state.load()
+        if affected_by is not None:
+            affected = self.eval_affected_modules(description, used_model_name, build_config, affected_by)
+            for module_desc, is_affected in sorted(affected.values(), key=lambda x: x[0].self_dirname):
+                if is_affected or self._verbose:
+                    print("BUILDSYS: {}: '{}', {},{}".format('affected' if is_affected else 'not affected', module_desc.module_name, module_desc.module_type, used_model_name))
+            if affected_report:
+                return
+            if not affected[os.path.normcase(description.self_dirname)][1]:
+                print("BUILDSYS: nothing to build, '{}' is not affected by {} changed files".format(description.module_name, len(affected_by)))
+                return
+        if self.watch_index is None:
+            self._stat_cache.reset()
+        self._build_cache = BuildCache()
+        self._module_fingerprints = {}
+        self._module_fingerprint_salts = {}
+        if plan:
+            self._actions_pool.discard_planned()
+            self._plan_build(description, used_model_name, build_config, rebuild_level)
+            self._report_actions_plan(self._actions_pool.explain(), used_model_name, build_config, plan_file)
+            return
+        planned_actions = []
         try:
             self._actions_pool.init()
-            build_result = self._perform_build(description, used_model_name, build_config, rebuild_level)
+            build_entry = self._plan_build(description, used_model_name, build_config, rebuild_level)
+            if self._watch:
+                planned_actions = self._actions_pool.list_planned()
+            if self._object_cache is not None:
+                self._prefetch_object_cache()
+            self._actions_pool.join()
         finally:
             self._actions_pool.shutdown()
+            if self._watch:
+                self.watch_index = self._eval_watch_index(planned_actions)
+                self._stat_cache.retain(self.watch_index.list_files())
+            self._build_state.save()
+            if self._object_cache is not None:
+                for cache_storage, cache_stats in self._object_cache.finish():
+                    if cache_stats.hits or cache_stats.misses:
+                        print("BUILDSYS: {}: {} hits, {} misses, {} evictions".format(cache_storage.title, cache_stats.hits, cache_stats.misses, cache_stats.evictions))
+                    if cache_storage.error_text is not None:
+                        print("BUILDSYS: {}: disabled after error, built locally: {}".format(cache_storage.title, cache_storage.error_text))
+        build_result = (build_entry.result.rebuilt, build_entry.result.artifacts)
 
         if public:
             self._publish_module_artifacts(build_result, description, used_model_name, build_config, public_format, public_layout, rebuild_level)
 
+    def compile_source(self, source_path, used_model_name, build_config, rebuild_level):
+        toolset, loader = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+        source_path = os.path.normpath(source_path)
+        self._build_state.load()
+        if self.watch_index is None:
+            self._stat_cache.reset()
+        description, build_type, obj_name = self._find_source_module(loader, current_model, source_path)
+        if self._verbose:
+            print("BUILDSYS: compile: '{}' in module '{}', {},{}".format(source_path, description.module_name, used_model_name, build_config))
+        mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, current_model.model_name, build_config)
+        mkdir_safe(mod_obj_dir)
+        action = self._create_source_action(toolset, description, current_model, build_config, mod_obj_dir, build_type, source_path, obj_name)
+        actions = [action]
+        pch_action = self._create_pch_action(toolset, description, current_model, build_config, mod_obj_dir, resolve_build_list(description, current_model))
+        if pch_action is not None and build_type == pch_action.source_type:
+            action.use_precompiled_header(pch_action)
+            actions.insert(0, pch_action)
+        force = rebuild_level > 0
+        try:
+            for step_action in actions:
+                ret = step_action.safe_execute(self._create_action_context(force))
+                if ret.exit_code is not None:
+                    break
+                if ret.rebuilt:
+                    force = True
+        finally:
+            self._build_state.save()
+            if self._object_cache is not None:
+                self._object_cache.finish()
+        if ret.exit_code is not None:
+            print(ret.error_text)
+            raise BuildSystemSysExit(ret.exit_code)
+
+    def _find_source_module(self, loader, current_model, source_path):
+        indexed_dir = self._build_state.get_source_module(source_path)
+        if indexed_dir is not None:
+            found = self._match_source_in_module(loader, current_model, indexed_dir, source_path)
+            if found is not None:
+                return found
+        project_root = os.path.normcase(self._sysinfo[TAG_CFG_DIR_PROJECT_ROOT])
+        dname = os.path.dirname(source_path)
+        while True:
+            if dname != indexed_dir and os.path.isfile(os.path.join(dname, BUILD_MODULE_DESCRIPTION_FILE)):
+                found = self._match_source_in_module(loader, current_model, dname, source_path)
+                if found is not None:
+                    return found
+            parent_dname = os.path.dirname(dname)
+            if os.path.normcase(dname) == project_root or parent_dname == dname:
+                break
+            dname = parent_dname
+        raise BuildSystemException("Can't find module with source file '{}' in build list.".format(source_path))
+
+    def _match_source_in_module(self, loader, current_model, module_dir, source_path):
+        makefile = os.path.join(module_dir, BUILD_MODULE_DESCRIPTION_FILE)
+        if not os.path.isfile(makefile) or makefile_is_project_landmark(makefile)[0]:
+            return None
+        description = loader.load_build_description(module_dir, current_model)
+        if description.module_type not in [TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC, TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED, TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE]:
+            return None
+        parsed_build_list = resolve_build_list(description, current_model)
+        source_id = os.path.normcase(source_path)
+        for build_type, build_source, obj_name in parsed_build_list:
+            if os.path.normcase(os.path.normpath(build_source)) == source_id:
+                self._build_state.set_source_modules(description.self_dirname, [ x[1] for x in parsed_build_list ])
+                return description, build_type, obj_name
+        return None
+
+    def eval_affected_modules(self, description, used_model_name, build_config, changed_paths):
+        changed = set([ os.path.normcase(os.path.normpath(path)) for path in changed_paths ])
+        recorded = set(self._build_state.query_dependents(changed_paths).modules)
+        affected = {}
+        self._eval_module_affected(description, used_model_name, build_config, changed, recorded, affected)
+        return affected
+
+    def _eval_module_affected(self, description, used_model_name, build_config, changed, recorded, affected):
+        module_id = os.path.normcase(description.self_dirname)
+        if module_id in affected:
+            return affected[module_id][1]
+        affected[module_id] = (description, False)
+        toolset, loader = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+
+        sub_descriptions = []
+        inputs = list(description.self_file_parts)
+        prefixes = []
+        if description.explicit_depends:
+            eval_explicit_depends_in_description(loader, description, current_model, sub_descriptions)
+        if description.spec_file:
+            spec_fname_input = normalize_path_optional(description.spec_file, description.self_dirname)
+            inputs.append(spec_fname_input)
+            inputs.extend([ source for source, _ in parse_spec_file(spec_fname_input, self._grammar_substitutions, current_model) ])
+
+        if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_COMPOSITE:
+            for desc_ref, target_properties in self._parse_composite_spec(description):
+                path_ref = normalize_path_optional(desc_ref, description.self_dirname)
+                if not target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_FILE):
+                    sub_descriptions.append(loader.load_build_description(path_ref, current_model))
+                    continue
+                inputs.append(path_ref)
+                if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_SPEC_FILE):
+                    inputs.extend([ source for source, _ in parse_spec_file(path_ref, self._grammar_substitutions, current_model) ])
+
+        elif description.module_type in [TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC, TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED, TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE]:
+            if description.module_type != TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC:
+                eval_libs_in_description(loader, description, current_model, sub_descriptions, sub_descriptions)
+            prefixes.append(description.self_dirname)
+            for _, source_path, _ in resolve_build_list(description, current_model):
+                inputs.append(source_path)
+                prefixes.append(os.path.dirname(source_path))
+            project_root = self._sysinfo[TAG_CFG_DIR_PROJECT_ROOT]
+            prefixes.extend(eval_include_dirs_in_description(description, project_root, BUILD_TYPE_C))
+            prefixes.extend(eval_include_dirs_in_description(description, project_root, BUILD_TYPE_ASM))
+
+        module_key = self._eval_module_key(description, used_model_name, build_config)
+        is_affected = module_key in recorded
+        if description.pre_build or description.pre_build_noarch or description.post_build or description.spec_post_build:
+            is_affected = True
+        if not is_affected:
+            is_affected = any([ os.path.normcase(os.path.normpath(path)) in changed for path in inputs ])
+        module = self._build_state.get_module(module_key) if module_key is not None else None
+        if not is_affected and prefixes and (module is None or module.fingerprint is None):
+            prefixes = set([ os.path.normcase(os.path.normpath(prefix)) + os.sep for prefix in prefixes ])
+            is_affected = any([ path.startswith(prefix) for path in changed for prefix in prefixes ])
+
+        for sub_description in sub_descriptions:
+            if self._eval_module_affected(sub_description, used_model_name, build_config, changed, recorded, affected):
+                is_affected = True
+        affected[module_id] = (description, is_affected)
+        return is_affected
+
+    def _report_actions_plan(self, actions_plan, used_model_name, build_config, plan_file):
+        for item in actions_plan.items:
+            print("BUILDSYS: plan: {}".format(item.title))
+            print("    reason: {}, estimate: {:.2f}s".format(item.reason, item.estimate))
+        if actions_plan.items:
+            print("BUILDSYS: plan: {} actions to run, estimated {:.1f}s of work, about {:.1f}s with {} jobs".format(
+                len(actions_plan.items), actions_plan.total_estimate, actions_plan.wall_estimate, actions_plan.jobs_count))
+        else:
+            print("BUILDSYS: plan: nothing to rebuild")
+        if plan_file is None:
+            return
+        plan_data = {
+            'model': used_model_name,
+            'config': build_config,
+            'jobs': actions_plan.jobs_count,
+            'actions': [ {'title': item.title, 'reason': item.reason, 'estimate': round(item.estimate, 3)} for item in actions_plan.items ],
+            'estimate': {
+                'total': round(actions_plan.total_estimate, 3),
+                'critical_path': round(actions_plan.critical_estimate, 3),
+                'wall': round(actions_plan.wall_estimate, 3),
+            },
+        }
+        with open(plan_file, mode='wt') as fh:
+            json.dump(plan_data, fh, sort_keys=True, indent=4)
+
+    def enable_watch(self):
+        self._watch = True
+
+    def _eval_watch_index(self, planned_actions):
+        watch_index = BuildWatchIndex(self._sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX], self._sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX])
+        for planned_action, ctx in planned_actions:
+            for action in planned_action.expand_actions():
+                target_path = action.target_path
+                if target_path is None:
+                    continue
+                prerequisites = action.eval_prerequisites(ctx)
+                if prerequisites is None:
+                    continue
+                for prerequisite in prerequisites:
+                    watch_index.add_prerequisite(prerequisite, target_path)
+        for module_key in self._module_fingerprints:
+            module = self._build_state.get_module(module_key)
+            if module is None:
+                continue
+            for input_path in module.inputs:
+                watch_index.add_module_input(input_path, module_key)
+        for _, loader in self._toolset_models_mapping.values():
+            for makefile in loader.list_loaded_files():
+                watch_index.add_makefile(makefile)
+        return watch_index
+
+    def invalidate_watched_paths(self, changed_paths):
+        for path in changed_paths:
+            path_status = query_file_status(path)
+            for target_path in self.watch_index.targets.get(path, []):
+                target_status = query_file_status(target_path)
+                if target_status is None:
+                    continue
+                if path_status is None or target_status.mtime_ns + self._stat_cache.tolerance_ns >= path_status.mtime_ns:
+                    if self._verbose:
+                        print("BUILDSYS: changed while building, requeue: {}".format(target_path))
+                    self._build_state.forget_target(target_path)
+            for module_key in self.watch_index.modules.get(path, []):
+                self._build_state.forget_module(module_key)
+        self._stat_cache.invalidate(changed_paths)
+        self._build_state.save()
+
+    def _prefetch_object_cache(self):
+        cache_keys = []
+        for planned_action, ctx in self._actions_pool.list_planned():
+            for action in planned_action.expand_actions():
+                cache_key = action.eval_cache_key(ctx)
+                if cache_key is not None:
+                    cache_keys.append(cache_key)
+        self._object_cache.prefetch(cache_keys)
+
     def _publish_module_artifacts(self, build_result, description, used_model_name, build_config, public_format, public_layout, rebuild_level):
         being_built, artifacts = build_result[0], build_result[1]
         obj_dir_prefix = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, used_model_name, build_config) + os.sep
@@ -342,7 +737,7 @@ class BuildWorkflow:
         if not do_publish:
             do_publish = being_built
         if not do_publish:
-            up_to_date, _ = is_target_up_to_date(publication, None, artifacts, self._verbose)
+            up_to_date, _ = is_target_up_to_date(self._stat_cache, publication, None, artifacts, self._verbose)
             if not up_to_date:
                 do_publish = True
         if not do_publish:
@@ -350,31 +745,27 @@ class BuildWorkflow:
             return
 
         mkdir_safe(public_dir)
+        timestamp = None
+        if self._reproducible:
+            timestamp = eval_reproducible_timestamp()
+            catalog.sort(key=lambda node: node[1])
         if publish_in_tgz_format:
-            with tarfile.open(publication, mode='w:gz') as z:
+            with open_tgz_archive(publication, timestamp) as z:
                 for node in catalog:
                     art, arcname = node[0], node[1]
                     print(arcname)
                     is_exe = True if art.attributes & BUILD_RET_ATTR_FLAG_EXECUTABLE else False
-                    permissions = make_posix_permissions(is_exe)
-                    with open(art.path, mode='rb') as fobj:
-                        info = os.fstat(fobj.fileno())
-                        ti = tarfile.TarInfo()
-                        ti.type = tarfile.REGTYPE
-                        ti.name = arcname
-                        ti.mode = permissions
-                        ti.size = info.st_size
-                        ti.mtime = info.st_mtime
-                        z.addfile(ti, fobj)
+                    add_tar_member(z, art.path, arcname, is_exe, timestamp)
         else:
             with zipfile.ZipFile(publication, "w", zipfile.ZIP_DEFLATED) as z:
                 for node in catalog:
                     art, arcname = node[0], node[1]
                     print(arcname)
-                    z.write(art.path, arcname)
+                    is_exe = True if art.attributes & BUILD_RET_ATTR_FLAG_EXECUTABLE else False
+                    add_zip_member(z, art.path, arcname, is_exe, timestamp)
         print("BUILDSYS: '{}' published as {}".format(description.module_name, publication))
 
-    def _follow_faccess_for_file(self, source):
+    def _follow_faccess_for_file(self, output, source):
         faccess_stamps = []
         norm_src_path = os.path.normcase(source)
         faccess_in_interest = False
@@ -391,466 +782,826 @@ class BuildWorkflow:
         faccess_stamps += [ (norm_src_relpath.replace('\\', '/'), faccess_stamp_file) ]
         for faccess_relpath, faccess_stamp_file in faccess_stamps:
             if self._verbose:
-                print("BUILDSYS: FACCESS: {}".format(faccess_relpath))
+                output.report_message("BUILDSYS: FACCESS: {}".format(faccess_relpath))
             mkdir_safe(os.path.dirname(faccess_stamp_file))
             touch_file(faccess_stamp_file)
 
-    def _follow_faccess_in_spec_file(self, catalog):
+    def _follow_faccess_in_spec_file(self, output, catalog):
         for source, _ in catalog:
-            self._follow_faccess_for_file(source)
+            self._follow_faccess_for_file(output, source)
 
-    def _build_zip_module(self, description, current_model, force):
+    def _eval_zip_module_layout(self, description, current_model):
         if not description.spec_file:
             raise BuildSystemException("Mandatory token '{}' is missed, required in '{}'.".format(TAG_GRAMMAR_KEY_SPEC_FILE, description.self_file_parts[0]))
         if not description.zip_file:
             raise BuildSystemException("Mandatory token '{}' is missed, required in '{}'.".format(TAG_GRAMMAR_KEY_ZIP_FILE, description.self_file_parts[0]))
-
         zip_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
-        mkdir_safe(zip_obj_dir)
-
         spec_fname = normalize_path_optional(description.spec_file, description.self_dirname)
         catalog = parse_spec_file(spec_fname, self._grammar_substitutions, current_model)
-
         zippath = os.path.join(zip_obj_dir, description.zip_file)
-        if force:
+        return zip_obj_dir, zippath, catalog
+
+    def _explain_zip_module(self, output, ctx, description, current_model):
+        zip_obj_dir, zippath, catalog = self._eval_zip_module_layout(description, current_model)
+        return eval_zip_module_rebuild_reason(ctx.stat_cache, zip_obj_dir, zippath, catalog, description, False)
+
+    def _build_zip_module(self, output, ctx, description, current_model):
+        zip_obj_dir, zippath, catalog = self._eval_zip_module_layout(description, current_model)
+        mkdir_safe(zip_obj_dir)
+
+        if ctx.force:
             need_rebuild = True
         else:
-            need_rebuild = zip_module_rebuild_required(zip_obj_dir, zippath, catalog, description, self._verbose)
+            need_rebuild = eval_zip_module_rebuild_reason(ctx.stat_cache, zip_obj_dir, zippath, catalog, description, self._verbose) is not None
         zipspec_catalog = []
         if need_rebuild:
-            print("BUILDSYS: Zipping '{}' ...".format(description.module_name))
+            output.report_message("BUILDSYS: Zipping '{}' ...".format(description.module_name))
             if os.path.exists(zippath):
                 os.remove(zippath)
+            timestamp = None
+            zip_catalog = catalog
+            if self._reproducible:
+                timestamp = eval_reproducible_timestamp()
+                zip_catalog = sorted(catalog, key=lambda node: node[1])
             with zipfile.ZipFile(zippath, "w", zipfile.ZIP_DEFLATED) as z:
-                for source, arcname in catalog:
-                    z.write(source, arcname)
+                for source, arcname in zip_catalog:
+                    add_zip_member(z, source, arcname, os.access(source, os.X_OK), timestamp)
                     zipspec_catalog.append([source, arcname])
             if self._faccess:
-                self._follow_faccess_in_spec_file(catalog)
+                self._follow_faccess_in_spec_file(output, catalog)
         else:
-            print("BUILDSYS: up-to-date: '{}', ZIP: {}".format(description.module_name, zippath))
+            output.report_message("BUILDSYS: up-to-date: '{}', ZIP: {}".format(description.module_name, zippath))
 
-        return (need_rebuild, [BuildArtifact(BUILD_RET_TYPE_ZIP, zippath, BUILD_RET_ATTR_DEFAULT)])
+        return ToolsetActionResult(rebuilt=need_rebuild, artifacts=[BuildArtifact(BUILD_RET_TYPE_ZIP, zippath, BUILD_RET_ATTR_DEFAULT)])
 
-    def _perform_build(self, description, used_model_name, build_config, rebuild_level):
+    def _create_action_context(self, force):
+        return ToolsetActionContext(force=force, verbose=self._verbose, trace=self._trace, build_state=self._build_state, stat_cache=self._stat_cache, content_check=self._content_check, object_cache=self._object_cache, reproducible=self._reproducible)
+
+    def _plan_build(self, description, used_model_name, build_config, rebuild_level):
         toolset, loader = self._toolset_models_mapping[used_model_name]
         current_model = toolset.supported_models[used_model_name]
 
-        mod_build_result = None
-        if rebuild_level <= 0:
-            cached_prebuilt_result = self._build_cache.get_cached_build_result(description, used_model_name)
-            if cached_prebuilt_result is not None:
-                print("BUILDSYS: up-to-date(cached): '{}', {}".format(description.module_name, description.module_type))
-                return (False, cached_prebuilt_result)
+        cached_entry = self._build_cache.get_cached_build_result(description, used_model_name)
+        if cached_entry is not None:
+            return cached_entry
+
+        fingerprint_plan = None
+        module_key = self._eval_module_key(description, used_model_name, build_config)
+        if module_key is not None and rebuild_level >= 0:
+            salt = self._eval_module_fingerprint_salt(used_model_name, build_config)
+            if rebuild_level == 0 and self._verify_module_fingerprint(module_key, salt) is not None:
+                reuse_action = WorkflowStepAction(self._reuse_module_build, description, used_model_name, self._build_state.get_module(module_key).artifacts)
+                reuse_entry = self._actions_pool.put(reuse_action, self._create_action_context(False))
+                self._build_cache.cache_build_result(description, used_model_name, reuse_entry)
+                return reuse_entry
+            fingerprint_plan = ModuleFingerprintPlan(module_key, salt)
+            fingerprint_plan.inputs.extend(description.self_file_parts)
 
         print("BUILDSYS: start build '{}', {},{} ...".format(description.module_name, description.module_type, used_model_name))
 
+        stage_entries = []
         if description.explicit_depends and rebuild_level >= 0:
             xpl_depends_desc = []
             eval_explicit_depends_in_description(loader, description, current_model, xpl_depends_desc)
+            xpl_rebuild_level = 2 if rebuild_level == 2 else 0
             for xpl_dep_desc in xpl_depends_desc:
-                xpl_dep_cached_result = self._build_cache.get_cached_build_result(xpl_dep_desc, used_model_name)
-                if xpl_dep_cached_result is not None:
-                    continue
-                xpl_rebuild_level = 2 if rebuild_level == 2 else 0
-                self._perform_build(xpl_dep_desc, used_model_name, build_config, xpl_rebuild_level)
+                stage_entries.append(self._plan_build(xpl_dep_desc, used_model_name, build_config, xpl_rebuild_level))
+                if fingerprint_plan is not None:
+                    fingerprint_plan.add_module_depends(self._eval_module_key(xpl_dep_desc, used_model_name, build_config))
 
         if description.pre_build_noarch:
-            self._perform_pre_build(description, used_model_name, build_config, rebuild_level, noarch=True)
+            pre_build_entry = self._plan_pre_build(description, used_model_name, build_config, rebuild_level, True, stage_entries)
+            if pre_build_entry is not None:
+                stage_entries.append(pre_build_entry)
 
         if description.pre_build:
-            self._perform_pre_build(description, used_model_name, build_config, rebuild_level, noarch=False)
+            pre_build_entry = self._plan_pre_build(description, used_model_name, build_config, rebuild_level, False, stage_entries)
+            if pre_build_entry is not None:
+                stage_entries.append(pre_build_entry)
 
         if description.spec_file:
-            noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
-            mkdir_safe(noarch_obj_mod_dir)
-            spec_fname_output = os.path.join(noarch_obj_mod_dir, 'spec-output.json')
-            spec_fname_stamp = os.path.join(noarch_obj_mod_dir, 'spec-output.stamp')
-            spec_fname_input = normalize_path_optional(description.spec_file, description.self_dirname)
-            up_to_date = None
-            if rebuild_level <= 0:
-                up_to_date, _ = is_target_up_to_date(spec_fname_stamp, [spec_fname_input], description.self_file_parts, self._verbose)
-                if up_to_date and not os.path.isfile(spec_fname_output):
-                    up_to_date = False
-                if up_to_date:
-                    with open(spec_fname_output) as fh:
-                        files_in_spec = [ x[0] for x in json.load(fh)[TAG_GRAMMAR_KEY_SPEC_FILE] ]
-                    up_to_date, _ = is_target_up_to_date(spec_fname_stamp, files_in_spec, None, self._verbose)
-            if rebuild_level <= 0 and up_to_date:
-                print("BUILDSYS: up-to-date: spec-file for module '{}'".format(description.module_name))
-            else:
-                print("BUILDSYS: processing spec-file for module '{}'".format(description.module_name))
-                mod_spec_catalog = parse_spec_file(spec_fname_input, self._grammar_substitutions, current_model)
-                with open(spec_fname_output, 'wt') as spec_fh:
-                    spec_data = {}
-                    spec_data[TAG_GRAMMAR_KEY_SPEC_FILE] = []
-                    for source, arcname in mod_spec_catalog:
-                        spec_data[TAG_GRAMMAR_KEY_SPEC_FILE].append([source, arcname])
-                    for entail_attr in TAG_GRAMMAR_SPEC_FILE_ENTAILS:
-                        entail_value = getattr(description, entail_attr)
-                        if entail_value is not None:
-                            spec_data[entail_attr] = entail_value
-                    if description.spec_file_entails:
-                        for entail_attr in description.spec_file_entails:
-                            entail_value = description.spec_file_entails[entail_attr]
-                            spec_data[entail_attr] = entail_value
-                    json.dump(spec_data, spec_fh, sort_keys=True, indent=4, ensure_ascii=False)
-                if description.spec_post_build:
-                    self._perform_spec_post_build(description, used_model_name, build_config, rebuild_level)
-                touch_file(spec_fname_stamp)
-                if self._faccess:
-                    self._follow_faccess_in_spec_file(mod_spec_catalog)
-
+            stage_entries.append(self._plan_spec_file(description, used_model_name, build_config, rebuild_level, stage_entries, fingerprint_plan))
 
         if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_ZIP_FILE:
-            mod_build_result = self._build_zip_module(description, current_model, rebuild_level > 0)
+            mod_action = WorkflowStepAction(self._build_zip_module, description, current_model).with_explain(
+                self._explain_zip_module, "zip of '{}'".format(description.module_name))
+            mod_entry = self._actions_pool.put(mod_action, self._create_action_context(rebuild_level > 0), depends=stage_entries)
 
         elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_DOWNLOAD:
-            force_download = rebuild_level > 0
-            noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
-            if description.pre_build or description.pre_build_noarch:
-                mod_download_pre_build_stamp_file = os.path.join(noarch_obj_mod_dir, PRE_BUILD_OBJ_STAMP_FILE)
-                if not os.path.isfile(mod_download_pre_build_stamp_file):
-                    force_download = True
-            if description.post_build:
-                mod_download_post_build_stamp_file = os.path.join(noarch_obj_mod_dir, POST_BUILD_OBJ_STAMP_FILE)
-                if not os.path.isfile(mod_download_post_build_stamp_file):
-                    force_download = True
-            mod_build_result = download_files(self._sysinfo, description, force_download, self._verbose)
+            mod_action = WorkflowStepAction(self._build_download_module, description).with_explain(
+                self._explain_download_module, "download of '{}'".format(description.module_name))
+            mod_entry = self._actions_pool.put(mod_action, self._create_action_context(rebuild_level > 0), depends=stage_entries)
 
         elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_COMPOSITE:
-            mod_composite_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, current_model.model_name, build_config)
-            mod_composite_dir_noarch = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
-            mkdir_safe(mod_composite_dir)
-            if not isinstance(description.composite_spec, list):
-                raise BuildSystemException("Spec of composite not a list, provided in: '{}'.".format(description.self_file_parts[0]))
-            composite_entries = []
-            for spec_entry in description.composite_spec:
-                if isinstance(spec_entry, str):
-                    composite_entries.append((spec_entry, {}))
-                elif isinstance(spec_entry, list):
-                    if len(spec_entry) < 2:
-                        composite_entries.append((spec_entry[0], {}))
-                    else:
-                        if not isinstance(spec_entry[1], dict):
-                            raise BuildSystemException("Entry properties in composite spec is not a dict, provided in: '{}'.".format(description.self_file_parts[0]))
-                        target_properties = {}
-                        for prop_name in spec_entry[1].keys():
-                            prop_value = spec_entry[1][prop_name]
-                            if prop_name in TAG_GRAMMAR_COMPOSITE_ITEM_STR_PROPERTIES:
-                                if not isinstance(prop_value, str):
-                                    raise BuildSystemException("Got malformed (not a str) property '{}' in composite spec, provided in: '{}'.".format(prop_name, description.self_file_parts[0]))
-                            target_properties[prop_name] = prop_value
-                        composite_entries.append((spec_entry[0], target_properties))
-                else:
-                    raise BuildSystemException("Entry in composite spec is not a str or list, provided in: '{}'.".format(description.self_file_parts[0]))
-
-            composite_need_rebuild = False
-            composite_subdirs_required = []
-            composite_copy_files_info = []
-            composite_output_files = []
-            for desc_ref, target_properties in composite_entries:
-                if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_FILE):
-                    file_ref = normalize_path_optional(desc_ref, description.self_dirname)
-                    if not os.path.isfile(file_ref):
-                        raise BuildSystemException("File '{}' not found, required in '{}'".format(file_ref, description.self_file_parts[0]))
-                    if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_SPEC_FILE):
-                        composite_injection = parse_spec_file(file_ref, self._grammar_substitutions, current_model)
-                        being_built, artifacts = False, []
-                        for composite_injection_entry_path, composite_injection_arcname in composite_injection:
-                            artifacts.append((BuildArtifact(BUILD_RET_TYPE_RESOURCE, composite_injection_entry_path, BUILD_RET_ATTR_DEFAULT), composite_injection_arcname))
-                    else:
-                        file_ref_is_executable = True if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_EXECUTABLE) else False
-                        file_ref_attr = BUILD_RET_ATTR_DEFAULT
-                        if file_ref_is_executable:
-                            file_ref_attr = file_ref_attr | BUILD_RET_ATTR_FLAG_EXECUTABLE
-                        being_built, artifacts = False, [(BuildArtifact(BUILD_RET_TYPE_RESOURCE, file_ref, file_ref_attr), None)]
+            mod_entry = self._plan_composite_module(description, used_model_name, build_config, rebuild_level, stage_entries, fingerprint_plan)
+
+        else:
+            mod_entry = self._plan_binary_module(description, used_model_name, build_config, rebuild_level, stage_entries, fingerprint_plan)
+
+        post_build_depends = [mod_entry]
+        post_build_actions = []
+        if description.post_build:
+            for ext_name in description.post_build:
+                post_build_actions.append(self._create_ext_action(TAG_GRAMMAR_VALUE_EXT_TYPE_POST_BUILD, ext_name,
+                    description, used_model_name, build_config, rebuild_level, post_build_depends))
+
+        finish_action = WorkflowStepAction(self._finish_module_build, description, used_model_name, build_config, mod_entry, post_build_actions, fingerprint_plan).with_explain(
+            self._explain_module_build, "{} of '{}'".format(TAG_GRAMMAR_VALUE_EXT_TYPE_POST_BUILD, description.module_name) if description.post_build else None)
+        finish_entry = self._actions_pool.put(finish_action, self._create_action_context(False), depends=post_build_depends)
+        self._build_cache.cache_build_result(description, used_model_name, finish_entry)
+        return finish_entry
+
+    def _explain_module_build(self, output, ctx, description, used_model_name, build_config, mod_entry, post_build_actions, fingerprint_plan):
+        if mod_entry.plan_reason is None:
+            return None
+        return "module is rebuilt: '{}'".format(description.module_name)
+
+    def _finish_module_build(self, output, ctx, description, used_model_name, build_config, mod_entry, post_build_actions, fingerprint_plan):
+        if mod_entry.result.rebuilt and description.post_build:
+            self._perform_post_build(output, description, used_model_name, build_config, post_build_actions)
+        if fingerprint_plan is not None:
+            self._record_module_fingerprint(ctx, fingerprint_plan, mod_entry.result.artifacts)
+        output.report_message("BUILDSYS: finish build '{}', {},{}".format(description.module_name, description.module_type, used_model_name))
+        return mod_entry.result
+
+    def _eval_module_key(self, description, used_model_name, build_config):
+        if self._faccess or description.module_type not in _MODULE_FINGERPRINT_TYPES:
+            return None
+        if description.pre_build or description.pre_build_noarch or description.post_build or description.spec_post_build:
+            return None
+        module_dir = os.path.relpath(description.self_dirname, self._sysinfo[TAG_CFG_DIR_PROJECT_ROOT])
+        return '{}:{}:{}'.format(used_model_name, build_config, module_dir.replace('\\', '/'))
+
+    def _eval_module_fingerprint_salt(self, used_model_name, build_config):
+        salt = self._module_fingerprint_salts.get((used_model_name, build_config))
+        if salt is not None:
+            return salt
+        toolset, _ = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+        config_digest = None
+        config_file = self._sysinfo.get(TAG_CFG_PROJECT_CONFIG_FILE)
+        if config_file is not None:
+            config_status = self._stat_cache.status(config_file)
+            if config_status is not None and config_status.is_file:
+                config_digest = binascii.hexlify(self._build_state.get_file_digest(config_file, config_status)).decode('ascii')
+        env_digest = binascii.hexlify(eval_command_digest([], None)).decode('ascii')
+        salt = eval_data_digest([_MODULE_FINGERPRINT_FORMAT, __version__, used_model_name, current_model.toolset_version, build_config,
+            sorted(self._sysinfo.items()), config_digest, env_digest, self._unity])
+        self._module_fingerprint_salts[(used_model_name, build_config)] = salt
+        return salt
+
+    def _verify_module_fingerprint(self, module_key, salt):
+        if module_key in self._module_fingerprints:
+            return self._module_fingerprints[module_key]
+        self._module_fingerprints[module_key] = None
+        module = self._build_state.get_module(module_key)
+        if module is None:
+            return None
+        depends_fingerprints = []
+        for dep_key in module.depends:
+            dep_fingerprint = self._verify_module_fingerprint(dep_key, salt)
+            if dep_fingerprint is None:
+                return None
+            depends_fingerprints.append(dep_fingerprint)
+        fingerprint = self._build_state.eval_module_fingerprint(self._stat_cache, salt, module.inputs, depends_fingerprints)
+        if fingerprint is None or fingerprint != module.fingerprint:
+            return None
+        self._module_fingerprints[module_key] = fingerprint
+        return fingerprint
+
+    def _record_module_fingerprint(self, ctx, fingerprint_plan, artifacts):
+        if not fingerprint_plan.complete:
+            return
+        depends_fingerprints = []
+        for dep_key in fingerprint_plan.depends:
+            dep_fingerprint = self._module_fingerprints.get(dep_key)
+            if dep_fingerprint is None:
+                return
+            depends_fingerprints.append(dep_fingerprint)
+        inputs = list(fingerprint_plan.inputs)
+        for action in fingerprint_plan.actions:
+            prerequisites = action.eval_prerequisites(ctx)
+            if prerequisites is None:
+                return
+            inputs.extend(prerequisites)
+            if action.target_path is not None:
+                inputs.append(action.target_path)
+        if artifacts:
+            inputs.extend([ art.path for art in artifacts ])
+        else:
+            artifacts = []
+        inputs = sorted(set([ os.path.normpath(input_path) for input_path in inputs ]))
+        fingerprint = self._build_state.eval_module_fingerprint(ctx.stat_cache, fingerprint_plan.salt, inputs, depends_fingerprints)
+        if fingerprint is None:
+            return
+        self._build_state.set_module(fingerprint_plan.module_key, fingerprint, inputs, fingerprint_plan.depends,
+            [ (art.object_type, art.path, art.attributes) for art in artifacts ])
+        self._module_fingerprints[fingerprint_plan.module_key] = fingerprint
+
+    def _reuse_module_build(self, output, ctx, description, used_model_name, artifacts):
+        output.report_message("BUILDSYS: up-to-date: '{}', {},{}, fingerprint unchanged".format(description.module_name, description.module_type, used_model_name))
+        return ToolsetActionResult(rebuilt=False, artifacts=[ BuildArtifact(object_type, path, attributes) for object_type, path, attributes in artifacts ])
+
+    def _plan_spec_file(self, description, used_model_name, build_config, rebuild_level, depends, fingerprint_plan=None):
+        toolset, _ = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+        if fingerprint_plan is not None:
+            noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
+            spec_fname_input = normalize_path_optional(description.spec_file, description.self_dirname)
+            fingerprint_plan.inputs.append(spec_fname_input)
+            fingerprint_plan.inputs.append(os.path.join(noarch_obj_mod_dir, 'spec-output.json'))
+            fingerprint_plan.inputs.append(os.path.join(noarch_obj_mod_dir, 'spec-output.stamp'))
+            fingerprint_plan.inputs.extend([ source for source, _ in parse_spec_file(spec_fname_input, self._grammar_substitutions, current_model) ])
+        spec_depends = list(depends)
+        spec_post_build_actions = []
+        if description.spec_post_build:
+            for ext_name in description.spec_post_build:
+                spec_post_build_actions.append(self._create_ext_action(TAG_GRAMMAR_VALUE_EXT_TYPE_SPEC_POST_BUILD, ext_name,
+                    description, used_model_name, build_config, rebuild_level, spec_depends))
+        spec_action = WorkflowStepAction(self._process_spec_file, description, current_model, spec_post_build_actions).with_explain(
+            self._explain_spec_file, "spec-file of '{}'".format(description.module_name))
+        return self._actions_pool.put(spec_action, self._create_action_context(rebuild_level > 0), depends=spec_depends)
+
+    def _explain_spec_file(self, output, ctx, description, current_model, spec_post_build_actions):
+        noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
+        spec_fname_output = os.path.join(noarch_obj_mod_dir, 'spec-output.json')
+        spec_fname_stamp = os.path.join(noarch_obj_mod_dir, 'spec-output.stamp')
+        spec_fname_input = normalize_path_optional(description.spec_file, description.self_dirname)
+        reason = explain_target_rebuild(ctx.stat_cache, spec_fname_stamp, [spec_fname_input], description.self_file_parts, ctx.verbose)
+        if reason is not None:
+            return reason
+        if not ctx.stat_cache.isfile(spec_fname_output):
+            return "output is missing: '{}'".format(spec_fname_output)
+        with open(spec_fname_output) as fh:
+            files_in_spec = [ x[0] for x in json.load(fh)[TAG_GRAMMAR_KEY_SPEC_FILE] ]
+        return explain_target_rebuild(ctx.stat_cache, spec_fname_stamp, files_in_spec, None, ctx.verbose)
+
+    def _process_spec_file(self, output, ctx, description, current_model, spec_post_build_actions):
+        noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
+        mkdir_safe(noarch_obj_mod_dir)
+        spec_fname_output = os.path.join(noarch_obj_mod_dir, 'spec-output.json')
+        spec_fname_stamp = os.path.join(noarch_obj_mod_dir, 'spec-output.stamp')
+        spec_fname_input = normalize_path_optional(description.spec_file, description.self_dirname)
+        if not ctx.force and self._explain_spec_file(output, ctx, description, current_model, spec_post_build_actions) is None:
+            output.report_message("BUILDSYS: up-to-date: spec-file for module '{}'".format(description.module_name))
+            return ToolsetActionResult(rebuilt=False, artifacts=None)
+
+        output.report_message("BUILDSYS: processing spec-file for module '{}'".format(description.module_name))
+        mod_spec_catalog = parse_spec_file(spec_fname_input, self._grammar_substitutions, current_model)
+        with open(spec_fname_output, 'wt') as spec_fh:
+            spec_data = {}
+            spec_data[TAG_GRAMMAR_KEY_SPEC_FILE] = []
+            for source, arcname in mod_spec_catalog:
+                spec_data[TAG_GRAMMAR_KEY_SPEC_FILE].append([source, arcname])
+            for entail_attr in TAG_GRAMMAR_SPEC_FILE_ENTAILS:
+                entail_value = getattr(description, entail_attr)
+                if entail_value is not None:
+                    spec_data[entail_attr] = entail_value
+            if description.spec_file_entails:
+                for entail_attr in description.spec_file_entails:
+                    entail_value = description.spec_file_entails[entail_attr]
+                    spec_data[entail_attr] = entail_value
+            json.dump(spec_data, spec_fh, sort_keys=True, indent=4, ensure_ascii=False)
+        for ext_action in spec_post_build_actions:
+            ext_action(output)
+        touch_file(spec_fname_stamp)
+        if self._faccess:
+            self._follow_faccess_in_spec_file(output, mod_spec_catalog)
+        return ToolsetActionResult(rebuilt=True, artifacts=None)
+
+    def _eval_download_stamps_reason(self, description):
+        noarch_obj_mod_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
+        if description.pre_build or description.pre_build_noarch:
+            mod_download_pre_build_stamp_file = os.path.join(noarch_obj_mod_dir, PRE_BUILD_OBJ_STAMP_FILE)
+            if not os.path.isfile(mod_download_pre_build_stamp_file):
+                return "pre-build stamp is missing: '{}'".format(mod_download_pre_build_stamp_file)
+        if description.post_build:
+            mod_download_post_build_stamp_file = os.path.join(noarch_obj_mod_dir, POST_BUILD_OBJ_STAMP_FILE)
+            if not os.path.isfile(mod_download_post_build_stamp_file):
+                return "post-build stamp is missing: '{}'".format(mod_download_post_build_stamp_file)
+        return None
+
+    def _explain_download_module(self, output, ctx, description):
+        reason = self._eval_download_stamps_reason(description)
+        if reason is not None:
+            return reason
+        _, catalog, _ = eval_download_catalog(self._sysinfo, description)
+        for _, target_fname in catalog:
+            reason = explain_target_rebuild(ctx.stat_cache, target_fname, None, description.self_file_parts, ctx.verbose)
+            if reason is not None:
+                return reason
+        return None
+
+    def _build_download_module(self, output, ctx, description):
+        force_download = ctx.force or self._eval_download_stamps_reason(description) is not None
+        return download_files(output, ctx.stat_cache, self._sysinfo, description, force_download, self._verbose)
+
+    def _parse_composite_spec(self, description):
+        if not isinstance(description.composite_spec, list):
+            raise BuildSystemException("Spec of composite not a list, provided in: '{}'.".format(description.self_file_parts[0]))
+        composite_entries = []
+        for spec_entry in description.composite_spec:
+            if isinstance(spec_entry, str):
+                composite_entries.append((spec_entry, {}))
+            elif isinstance(spec_entry, list):
+                if len(spec_entry) < 2:
+                    composite_entries.append((spec_entry[0], {}))
                 else:
-                    desc_dir = normalize_path_optional(desc_ref, description.self_dirname)
-                    if not os.path.exists(desc_dir):
-                        raise BuildSystemException("Directory '{}' not found, required in '{}'".format(desc_dir, description.self_file_parts[0]))
-                    if not os.path.isdir(desc_dir):
-                        raise BuildSystemException("Not a directory '{}', required to be a directory in '{}'".format(desc_dir, description.self_file_parts[0]))
-                    sub_description = loader.load_build_description(desc_dir, current_model)
-                    if sub_description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_COMPOSITE:
-                        raise BuildSystemException("Build of recursive composites is not supported, provided in '{}'".format(description.self_file_parts[0]))
-                    artifacts = []
-                    being_built, _artifacts = self._perform_build(sub_description, used_model_name, build_config, rebuild_level)
-                    for art in _artifacts:
-                        artifacts.append((art, None))
-
-                if being_built:
-                    composite_need_rebuild = True
-                for artifact_entry in artifacts:
-                    art_type = artifact_entry[0].object_type
-                    art_build_path = artifact_entry[0].path
-                    art_build_attr = artifact_entry[0].attributes
-                    art_alternative_name = artifact_entry[1]
-                    art_alternative_subdir = None
-                    art_primary = True
-                    if art_type in (BUILD_RET_TYPE_LIB, BUILD_RET_TYPE_PDB):
-                        art_primary = False
-                    if art_type == BUILD_RET_TYPE_LIB:
-                        continue
-                    if art_type == BUILD_RET_TYPE_PDB:
-                        if build_config != BUILD_CONFIG_DEBUG:
-                            continue
-                    art_target_dir = mod_composite_dir
-                    if art_alternative_name is None:
-                        art_target_fname = os.path.basename(art_build_path)
-                    elif '/' in art_alternative_name:
-                        art_alternative_bits = art_alternative_name.split('/')
-                        art_target_fname = art_alternative_bits[-1]
-                        art_alternative_subdir = '/'.join(art_alternative_bits[0:-1])
-                    else:
-                        art_target_fname = art_alternative_name
-                    if TAG_GRAMMAR_COMPOSITE_ITEM_SUBDIR in target_properties:
-                        target_subdir = target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_SUBDIR]
-                        art_target_dir = os.path.normpath(os.path.join(art_target_dir, target_subdir))
-                        if art_alternative_subdir is not None:
-                            art_target_dir = os.path.normpath(os.path.join(art_target_dir, art_alternative_subdir))
-                        if art_target_dir not in composite_subdirs_required:
-                            composite_subdirs_required.append(art_target_dir)
-                    if art_primary:
-                        if TAG_GRAMMAR_COMPOSITE_ITEM_REPLACE_EXT in target_properties:
-                            art_target_fname = os.path.splitext(art_target_fname)[0]
-                            art_target_fname = art_target_fname + target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_REPLACE_EXT]
-                        if TAG_GRAMMAR_COMPOSITE_ITEM_STRIP_FNANE_PREFIX in target_properties:
-                            art_prefix_to_strip = target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_STRIP_FNANE_PREFIX]
-                            if art_target_fname.startswith(art_prefix_to_strip):
-                                art_target_fname = art_target_fname[len(art_prefix_to_strip):]
-                    art_target_path = os.path.join(art_target_dir, art_target_fname)
-                    composite_copy_files_info.append((art_build_path, art_target_path, art_build_attr))
-                    composite_output_files.append(BuildArtifact(art_type, art_target_path, art_build_attr))
-
-            if description.pre_build_noarch:
-                mod_composite_pre_build_noarch_stamp_file = os.path.join(mod_composite_dir_noarch, PRE_BUILD_OBJ_STAMP_FILE)
-                if not os.path.exists(mod_composite_pre_build_noarch_stamp_file):
-                    composite_need_rebuild = True
-
-            if description.pre_build:
-                mod_composite_pre_build_stamp_file = os.path.join(mod_composite_dir, PRE_BUILD_OBJ_STAMP_FILE)
-                if not os.path.exists(mod_composite_pre_build_stamp_file):
-                    composite_need_rebuild = True
-
-            if description.post_build:
-                mod_composite_post_build_stamp_file = os.path.join(mod_composite_dir, POST_BUILD_OBJ_STAMP_FILE)
-                if not os.path.exists(mod_composite_post_build_stamp_file):
-                    composite_need_rebuild = True
-
-            if not composite_need_rebuild:
-                for art_build_path, art_target_path, art_build_attr in composite_copy_files_info:
-                    if not os.path.isfile(art_target_path):
-                        composite_need_rebuild = True
-                        break
-                    mt_src = os.path.getmtime(art_build_path)
-                    mt_dst = os.path.getmtime(art_target_path)
-                    if prerequisite_newer_then_target(mt_dst, mt_src, art_target_path, art_build_path, self._verbose):
-                        composite_need_rebuild = True
-                        break
+                    if not isinstance(spec_entry[1], dict):
+                        raise BuildSystemException("Entry properties in composite spec is not a dict, provided in: '{}'.".format(description.self_file_parts[0]))
+                    target_properties = {}
+                    for prop_name in spec_entry[1].keys():
+                        prop_value = spec_entry[1][prop_name]
+                        if prop_name in TAG_GRAMMAR_COMPOSITE_ITEM_STR_PROPERTIES:
+                            if not isinstance(prop_value, str):
+                                raise BuildSystemException("Got malformed (not a str) property '{}' in composite spec, provided in: '{}'.".format(prop_name, description.self_file_parts[0]))
+                        target_properties[prop_name] = prop_value
+                    composite_entries.append((spec_entry[0], target_properties))
+            else:
+                raise BuildSystemException("Entry in composite spec is not a str or list, provided in: '{}'.".format(description.self_file_parts[0]))
+        return composite_entries
 
-            if composite_need_rebuild:
-                cleanup_dir(mod_composite_dir)
-                for composite_subdir in composite_subdirs_required:
-                    mkdir_safe(composite_subdir)
-                for art_build_path, art_target_path, art_build_attr in composite_copy_files_info:
-                    print("BUILDSYS: copy file: '{}' >>> '{}'".format(art_build_path, art_target_path))
-                    art_is_exe = True if art_build_attr & BUILD_RET_ATTR_FLAG_EXECUTABLE else False
-                    art_permissions = make_posix_permissions(art_is_exe)
-                    shutil.copyfile(art_build_path, art_target_path)
-                    shutil.copystat(art_build_path, art_target_path)
-                    if sys.platform != 'win32':
-                        print("BUILDSYS: chmod: '{:04o}' >>> '{}'".format(art_permissions, art_target_path))
-                        os.chmod(art_target_path, art_permissions)
-                    if self._faccess:
-                        self._follow_faccess_for_file(art_build_path)
+    def _plan_composite_module(self, description, used_model_name, build_config, rebuild_level, depends, fingerprint_plan=None):
+        toolset, loader = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+        composite_entries = self._parse_composite_spec(description)
+
+        composite_components = []
+        composite_triggers = []
+        for desc_ref, target_properties in composite_entries:
+            if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_FILE):
+                file_ref = normalize_path_optional(desc_ref, description.self_dirname)
+                if not os.path.isfile(file_ref):
+                    raise BuildSystemException("File '{}' not found, required in '{}'".format(file_ref, description.self_file_parts[0]))
+                if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_SPEC_FILE):
+                    composite_injection = parse_spec_file(file_ref, self._grammar_substitutions, current_model)
+                    artifacts = []
+                    for composite_injection_entry_path, composite_injection_arcname in composite_injection:
+                        artifacts.append((BuildArtifact(BUILD_RET_TYPE_RESOURCE, composite_injection_entry_path, BUILD_RET_ATTR_DEFAULT), composite_injection_arcname))
+                    if fingerprint_plan is not None:
+                        fingerprint_plan.inputs.append(file_ref)
+                else:
+                    file_ref_is_executable = True if target_properties.get(TAG_GRAMMAR_COMPOSITE_ITEM_IS_EXECUTABLE) else False
+                    file_ref_attr = BUILD_RET_ATTR_DEFAULT
+                    if file_ref_is_executable:
+                        file_ref_attr = file_ref_attr | BUILD_RET_ATTR_FLAG_EXECUTABLE
+                    artifacts = [(BuildArtifact(BUILD_RET_TYPE_RESOURCE, file_ref, file_ref_attr), None)]
+                composite_components.append((target_properties, None, artifacts, None))
+                if fingerprint_plan is not None:
+                    fingerprint_plan.inputs.extend([ art.path for art, _ in artifacts ])
             else:
-                print("BUILDSYS: up-to-date: '{}', COMPOSITE".format(description.module_name))
+                desc_dir = normalize_path_optional(desc_ref, description.self_dirname)
+                if not os.path.exists(desc_dir):
+                    raise BuildSystemException("Directory '{}' not found, required in '{}'".format(desc_dir, description.self_file_parts[0]))
+                if not os.path.isdir(desc_dir):
+                    raise BuildSystemException("Not a directory '{}', required to be a directory in '{}'".format(desc_dir, description.self_file_parts[0]))
+                sub_description = loader.load_build_description(desc_dir, current_model)
+                if sub_description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_COMPOSITE:
+                    raise BuildSystemException("Build of recursive composites is not supported, provided in '{}'".format(description.self_file_parts[0]))
+                sub_entry = self._plan_build(sub_description, used_model_name, build_config, rebuild_level)
+                composite_triggers.append(sub_entry)
+                if fingerprint_plan is not None:
+                    fingerprint_plan.add_module_depends(self._eval_module_key(sub_description, used_model_name, build_config))
+                composite_components.append((target_properties, sub_entry, None, sub_description))
+
+        mod_action = WorkflowStepAction(self._build_composite_module, description, current_model, build_config, composite_components).with_explain(
+            self._explain_composite_module, "composite of '{}'".format(description.module_name))
+        return self._actions_pool.put(mod_action, self._create_action_context(False), depends=depends, triggers=composite_triggers)
+
+    def _eval_composite_layout(self, description, current_model, build_config, components):
+        mod_composite_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, current_model.model_name, build_config)
+        composite_subdirs_required = []
+        composite_copy_files_info = []
+        composite_output_files = []
+        for target_properties, artifacts in components:
+            for artifact_entry in artifacts:
+                art_type = artifact_entry[0].object_type
+                art_build_path = artifact_entry[0].path
+                art_build_attr = artifact_entry[0].attributes
+                art_alternative_name = artifact_entry[1]
+                art_alternative_subdir = None
+                art_primary = True
+                if art_type in (BUILD_RET_TYPE_LIB, BUILD_RET_TYPE_PDB, BUILD_RET_TYPE_DWP):
+                    art_primary = False
+                if art_type == BUILD_RET_TYPE_LIB:
+                    continue
+                if art_type in (BUILD_RET_TYPE_PDB, BUILD_RET_TYPE_DWP):
+                    if build_config != BUILD_CONFIG_DEBUG:
+                        continue
+                art_target_dir = mod_composite_dir
+                if art_alternative_name is None:
+                    art_target_fname = os.path.basename(art_build_path)
+                elif '/' in art_alternative_name:
+                    art_alternative_bits = art_alternative_name.split('/')
+                    art_target_fname = art_alternative_bits[-1]
+                    art_alternative_subdir = '/'.join(art_alternative_bits[0:-1])
+                else:
+                    art_target_fname = art_alternative_name
+                if TAG_GRAMMAR_COMPOSITE_ITEM_SUBDIR in target_properties:
+                    target_subdir = target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_SUBDIR]
+                    art_target_dir = os.path.normpath(os.path.join(art_target_dir, target_subdir))
+                    if art_alternative_subdir is not None:
+                        art_target_dir = os.path.normpath(os.path.join(art_target_dir, art_alternative_subdir))
+                    if art_target_dir not in composite_subdirs_required:
+                        composite_subdirs_required.append(art_target_dir)
+                if art_primary:
+                    if TAG_GRAMMAR_COMPOSITE_ITEM_REPLACE_EXT in target_properties:
+                        art_target_fname = os.path.splitext(art_target_fname)[0]
+                        art_target_fname = art_target_fname + target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_REPLACE_EXT]
+                    if TAG_GRAMMAR_COMPOSITE_ITEM_STRIP_FNANE_PREFIX in target_properties:
+                        art_prefix_to_strip = target_properties[TAG_GRAMMAR_COMPOSITE_ITEM_STRIP_FNANE_PREFIX]
+                        if art_target_fname.startswith(art_prefix_to_strip):
+                            art_target_fname = art_target_fname[len(art_prefix_to_strip):]
+                art_target_path = os.path.join(art_target_dir, art_target_fname)
+                composite_copy_files_info.append((art_build_path, art_target_path, art_build_attr))
+                composite_output_files.append(BuildArtifact(art_type, art_target_path, art_build_attr))
+        return mod_composite_dir, composite_subdirs_required, composite_copy_files_info, composite_output_files
+
+    def _eval_composite_rebuild_reason(self, ctx, description, mod_composite_dir, composite_copy_files_info):
+        mod_composite_dir_noarch = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
+        if description.pre_build_noarch:
+            mod_composite_pre_build_noarch_stamp_file = os.path.join(mod_composite_dir_noarch, PRE_BUILD_OBJ_STAMP_FILE)
+            if not os.path.exists(mod_composite_pre_build_noarch_stamp_file):
+                return "pre-build stamp is missing: '{}'".format(mod_composite_pre_build_noarch_stamp_file)
 
-            mod_build_result = (composite_need_rebuild, composite_output_files)
+        if description.pre_build:
+            mod_composite_pre_build_stamp_file = os.path.join(mod_composite_dir, PRE_BUILD_OBJ_STAMP_FILE)
+            if not os.path.exists(mod_composite_pre_build_stamp_file):
+                return "pre-build stamp is missing: '{}'".format(mod_composite_pre_build_stamp_file)
+
+        if description.post_build:
+            mod_composite_post_build_stamp_file = os.path.join(mod_composite_dir, POST_BUILD_OBJ_STAMP_FILE)
+            if not os.path.exists(mod_composite_post_build_stamp_file):
+                return "post-build stamp is missing: '{}'".format(mod_composite_post_build_stamp_file)
+
+        for art_build_path, art_target_path, art_build_attr in composite_copy_files_info:
+            if not ctx.stat_cache.isfile(art_target_path):
+                return "output is missing: '{}'".format(art_target_path)
+            mt_src = ctx.stat_cache.mtime_ns(art_build_path)
+            mt_dst = ctx.stat_cache.mtime_ns(art_target_path)
+            if prerequisite_newer_then_target(mt_dst, mt_src, art_target_path, art_build_path, ctx.verbose, ctx.stat_cache.tolerance_ns):
+                return "prerequisite is newer: '{}'".format(art_build_path)
+        return None
 
+    def _explain_composite_module(self, output, ctx, description, current_model, build_config, composite_components):
+        components = []
+        for target_properties, sub_entry, artifacts, sub_description in composite_components:
+            if sub_entry is not None:
+                sub_module_key = self._eval_module_key(sub_description, current_model.model_name, build_config)
+                sub_module = self._build_state.get_module(sub_module_key) if sub_module_key is not None else None
+                if sub_module is None or sub_module.fingerprint is None:
+                    return "artifacts of component are not recorded: '{}'".format(sub_description.module_name)
+                artifacts = [ (BuildArtifact(object_type, path, attributes), None) for object_type, path, attributes in sub_module.artifacts ]
+            components.append((target_properties, artifacts))
+        mod_composite_dir, _, composite_copy_files_info, _ = self._eval_composite_layout(description, current_model, build_config, components)
+        return self._eval_composite_rebuild_reason(ctx, description, mod_composite_dir, composite_copy_files_info)
+
+    def _build_composite_module(self, output, ctx, description, current_model, build_config, composite_components):
+        components = []
+        for target_properties, sub_entry, artifacts, _ in composite_components:
+            if sub_entry is not None:
+                artifacts = [ (art, None) for art in sub_entry.result.artifacts ]
+            components.append((target_properties, artifacts))
+        mod_composite_dir, composite_subdirs_required, composite_copy_files_info, composite_output_files = self._eval_composite_layout(
+            description, current_model, build_config, components)
+        mkdir_safe(mod_composite_dir)
+
+        composite_need_rebuild = ctx.force
+        if not composite_need_rebuild:
+            composite_need_rebuild = self._eval_composite_rebuild_reason(ctx, description, mod_composite_dir, composite_copy_files_info) is not None
+
+        if composite_need_rebuild:
+            cleanup_dir(mod_composite_dir)
+            for composite_subdir in composite_subdirs_required:
+                mkdir_safe(composite_subdir)
+            for art_build_path, art_target_path, art_build_attr in composite_copy_files_info:
+                output.report_message("BUILDSYS: copy file: '{}' >>> '{}'".format(art_build_path, art_target_path))
+                art_is_exe = True if art_build_attr & BUILD_RET_ATTR_FLAG_EXECUTABLE else False
+                art_permissions = make_posix_permissions(art_is_exe)
+                shutil.copyfile(art_build_path, art_target_path)
+                shutil.copystat(art_build_path, art_target_path)
+                if sys.platform != 'win32':
+                    output.report_message("BUILDSYS: chmod: '{:04o}' >>> '{}'".format(art_permissions, art_target_path))
+                    os.chmod(art_target_path, art_permissions)
+                if self._faccess:
+                    self._follow_faccess_for_file(output, art_build_path)
         else:
-            mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, current_model.model_name, build_config)
-            mkdir_safe(mod_obj_dir)
-
-            is_exe_or_dll = False
-            exe_or_dll_deps_changed = False
-            if (description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE) or (description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED):
-                is_exe_or_dll = True
-
-            if is_exe_or_dll and rebuild_level >= 0:
-                static_libs_deps = []
-                shared_libs_deps = []
-                eval_libs_in_description(loader, description, current_model, static_libs_deps, shared_libs_deps)
-                submod_rebuild_level = 2 if rebuild_level == 2 else 0
-
-                for libstatic_desc in static_libs_deps:
-                    libstatic_cached_result = self._build_cache.get_cached_build_result(libstatic_desc, used_model_name)
-                    if libstatic_cached_result is not None:
-                        continue
-                    exe_or_dll_build_dep = self._perform_build(libstatic_desc, used_model_name, build_config, submod_rebuild_level)
-                    if exe_or_dll_build_dep[0]:
-                        exe_or_dll_deps_changed = True
+            output.report_message("BUILDSYS: up-to-date: '{}', COMPOSITE".format(description.module_name))
 
-                for libshared_desc in shared_libs_deps:
-                    libshared_cached_result = self._build_cache.get_cached_build_result(libshared_desc, used_model_name)
-                    if libshared_cached_result is not None:
-                        continue
-                    exe_or_dll_build_dep = self._perform_build(libshared_desc, used_model_name, build_config, submod_rebuild_level)
-                    if exe_or_dll_build_dep[0]:
-                        exe_or_dll_deps_changed = True
-
-            actions = []
-            obj_names = []
-            parsed_build_list = resolve_build_list(description, current_model)
-            if len(parsed_build_list) == 0 and description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC:
-                raise BuildSystemException("Empty build list provided in: '{}'.".format(description.self_file_parts[0]))
-
-            for build_type, source_path, obj_name in parsed_build_list:
-                action = None
-                obj_names.append(obj_name)
-                if build_type == BUILD_TYPE_CPP:
-                    action = toolset.create_cpp_build_action(description=description, cpp_source=source_path,
-                        obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
-                elif build_type == BUILD_TYPE_C:
-                    action = toolset.create_c_build_action(description=description, c_source=source_path,
-                        obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
-                elif build_type == BUILD_TYPE_ASM:
-                    action = toolset.create_asm_build_action(description=description, asm_source=source_path,
-                        obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
-                if action is None:
-                    raise BuildSystemException("Can't create build action for: '{}'.".format(source_path))
-                actions.append(action)
-
-            force_mod_rebuild = rebuild_level > 0
-            force_src_rebuild = rebuild_level > 0
-
-            src_ctx = ToolsetActionContext(force=force_src_rebuild, verbose=self._verbose, trace=self._trace)
-            for action in actions:
-                self._actions_pool.put(action, src_ctx)
-            src_rebuilt = self._actions_pool.join()
-            if src_rebuilt:
-                force_mod_rebuild = True
-
-            if not force_mod_rebuild:
-                if is_exe_or_dll:
-                    force_mod_rebuild = exe_or_dll_deps_changed
-
-            model_lib_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_LIB], current_model.model_name, build_config)
-            model_sharedlib_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_SHARED], current_model.model_name, build_config)
-            model_exe_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_EXE], current_model.model_name, build_config)
-            mod_action = None
-
-            if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC:
-                mkdir_safe(model_lib_dir)
-                mod_action = toolset.create_lib_static_link_action(description=description,
-                    lib_directory=model_lib_dir,
-                    obj_directory=mod_obj_dir,
-                    obj_names=obj_names, build_model=current_model, build_config=build_config)
-
-            elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED:
-                mkdir_safe(model_sharedlib_dir)
-                mod_action = toolset.create_lib_shared_link_action(description=description,
-                    sharedlib_directory=model_sharedlib_dir,
-                    lib_directory=model_lib_dir,
-                    obj_directory=mod_obj_dir,
-                    obj_names=obj_names, build_model=current_model, build_config=build_config)
-
-            elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE:
-                mkdir_safe(model_exe_dir)
-                mod_action = toolset.create_exe_link_action(description=description,
-                    sharedlib_directory=model_sharedlib_dir,
-                    exe_directory=model_exe_dir,
-                    lib_directory=model_lib_dir,
-                    obj_directory=mod_obj_dir,
-                    obj_names=obj_names, build_model=current_model, build_config=build_config)
-
-            if mod_action is None:
-                raise BuildSystemException("Can't create build action for module of type: '{}', provided in: '{}'.".format(description.module_type, description.self_file_parts[0]))
-
-            mod_ctx = ToolsetActionContext(force=force_mod_rebuild, verbose=self._verbose, trace=self._trace)
-            mod_action_result = mod_action.safe_execute(mod_ctx)
-            if mod_action_result.exit_code is not None:
-                print(mod_action_result.error_text)
-                raise BuildSystemSysExit(mod_action_result.exit_code)
-
-            mod_build_result = (mod_action_result.rebuilt, mod_action_result.artifacts)
+        return ToolsetActionResult(rebuilt=composite_need_rebuild, artifacts=composite_output_files)
 
-            if self._faccess:
-                faccess_stamps = []
-                faccess_mod_header_refs = set()
-                for build_type, source_path, obj_name in parsed_build_list:
-                    norm_src_path = os.path.normcase(source_path)
-                    faccess_in_interest = False
-                    for faccess_prefix in self._faccess_prefixes:
-                        if norm_src_path.startswith(self._sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX]):
-                            break
-                        if norm_src_path.startswith(faccess_prefix):
-                            faccess_in_interest = True
-                            break
-                    if not faccess_in_interest:
-                        continue
-                    norm_src_path = source_path[len(self._sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]):]
-                    faccess_stamp_file = os.path.join(self._sysinfo[TAG_CFG_DIR_FACCESS], norm_src_path)
-                    faccess_stamps += [ (norm_src_path.replace('\\', '/'), faccess_stamp_file) ]
-                    facccess_dep_file = os.path.join(mod_obj_dir, obj_name + self._sysinfo[TAG_CFG_DEP_SUFFIX])
-                    headers_refs = load_py_object(facccess_dep_file)
-                    for header_ref in headers_refs:
-                        header_ref_norm = os.path.normcase(os.path.normpath(header_ref))
-                        if header_ref_norm in faccess_mod_header_refs:
-                            continue
-                        faccess_mod_header_refs.add(header_ref_norm)
-                        faccess_header_in_interest = False
-                        for faccess_prefix in self._faccess_prefixes:
-                            norm_header_path = self._sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX] + header_ref_norm
-                            if norm_header_path.startswith(self._sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX]):
-                                break
-                            if norm_header_path.startswith(faccess_prefix):
-                                faccess_header_in_interest = True
-                                break
-                        if not faccess_header_in_interest:
-                            continue
-                        header_relpath = os.path.normpath(header_ref)
-                        faccess_stamp_file = os.path.join(self._sysinfo[TAG_CFG_DIR_FACCESS], header_relpath)
-                        faccess_stamps += [ (header_relpath.replace('\\', '/'), faccess_stamp_file) ]
-                if current_model.platform_name == TAG_PLATFORM_WINDOWS:
-                    if description.module_type in [TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE, TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED]:
-                        faccess_rc_file = verify_winrc_file(description)
-                        if faccess_rc_file:
-                            self._follow_faccess_for_file(faccess_rc_file)
-                if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED:
-                    faccess_def_file = verify_exports_def_file(description)
-                    if faccess_def_file:
-                        self._follow_faccess_for_file(faccess_def_file)
-                for faccess_relpath, faccess_stamp_file in faccess_stamps:
-                    if self._verbose:
-                        print("BUILDSYS: FACCESS: {}".format(faccess_relpath))
-                    mkdir_safe(os.path.dirname(faccess_stamp_file))
-                    touch_file(faccess_stamp_file)
+    def _plan_binary_module(self, description, used_model_name, build_config, rebuild_level, depends, fingerprint_plan=None):
+        toolset, loader = self._toolset_models_mapping[used_model_name]
+        current_model = toolset.supported_models[used_model_name]
+        mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, current_model.model_name, build_config)
+        mkdir_safe(mod_obj_dir)
 
-        if mod_build_result[0]:
-            if description.post_build:
-                self._perform_post_build(description, used_model_name, build_config, rebuild_level)
+        is_exe_or_dll = False
+        if (description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE) or (description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED):
+            is_exe_or_dll = True
+
+        libs_entries = []
+        if is_exe_or_dll and rebuild_level >= 0:
+            static_libs_deps = []
+            shared_libs_deps = []
+            eval_libs_in_description(loader, description, current_model, static_libs_deps, shared_libs_deps)
+            submod_rebuild_level = 2 if rebuild_level == 2 else 0
+            for libstatic_desc in static_libs_deps:
+                libs_entries.append(self._plan_build(libstatic_desc, used_model_name, build_config, submod_rebuild_level))
+            for libshared_desc in shared_libs_deps:
+                libs_entries.append(self._plan_build(libshared_desc, used_model_name, build_config, submod_rebuild_level))
+            if fingerprint_plan is not None:
+                for lib_desc in static_libs_deps + shared_libs_deps:
+                    fingerprint_plan.add_module_depends(self._eval_module_key(lib_desc, used_model_name, build_config))
+
+        actions = []
+        obj_names = []
+        description.begin_tokens_tracking()
+        parsed_build_list = resolve_build_list(description, current_model)
+        build_list_tokens = description.end_tokens_tracking()
+        if len(parsed_build_list) == 0 and description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC:
+            raise BuildSystemException("Empty build list provided in: '{}'.".format(description.self_file_parts[0]))
+
+        compile_list, faccess_list, unity_sources = self._eval_unity_build_list(description, mod_obj_dir, parsed_build_list)
+        pch_action = self._create_pch_action(toolset, description, current_model, build_config, mod_obj_dir, parsed_build_list)
+        pch_users = []
+        unity_users = {}
+        typed_actions = []
+        for build_type, source_path, obj_name in compile_list:
+            obj_names.append(obj_name)
+            action = self._create_source_action(toolset, description, current_model, build_config, mod_obj_dir, build_type, source_path, obj_name)
+            if pch_action is not None and build_type == pch_action.source_type:
+                action.use_precompiled_header(pch_action)
+                pch_users.append(action)
+            if source_path in unity_sources:
+                unity_users[action] = source_path
+            actions.append(action)
+            typed_actions.append((build_type, action))
+        self._build_state.set_source_modules(description.self_dirname, [ x[1] for x in parsed_build_list ])
+
+        src_ctx = self._create_action_context(rebuild_level > 0)
+        src_entries = []
+        pch_entry = None
+        if pch_action is not None:
+            pch_entry = self._actions_pool.put(pch_action, src_ctx, depends=depends)
+        unity_entries = {}
+        for unity_path, unity_text in sorted(unity_sources.items()):
+            unity_action = WorkflowStepAction(self._write_unity_source, unity_path, unity_text).with_explain(self._explain_unity_source)
+            unity_entries[unity_path] = self._actions_pool.put(unity_action, self._create_action_context(False), depends=depends)
+        for action in self._eval_compile_batches(toolset, mod_obj_dir, typed_actions):
+            src_triggers = [ unity_entries[unity_users[x]] for x in action.expand_actions() if x in unity_users ]
+            if [ x for x in action.expand_actions() if x in pch_users ]:
+                src_triggers.append(pch_entry)
+            src_entries.append(self._actions_pool.put(action, src_ctx, depends=depends, triggers=src_triggers))
+
+        model_lib_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_LIB], current_model.model_name, build_config)
+        model_sharedlib_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_SHARED], current_model.model_name, build_config)
+        model_exe_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_EXE], current_model.model_name, build_config)
+        mod_action = None
+
+        description.begin_tokens_tracking()
+        if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_STATIC:
+            mkdir_safe(model_lib_dir)
+            mod_action = toolset.create_lib_static_link_action(description=description,
+                lib_directory=model_lib_dir,
+                obj_directory=mod_obj_dir,
+                obj_names=obj_names, build_model=current_model, build_config=build_config)
+
+        elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED:
+            mkdir_safe(model_sharedlib_dir)
+            mod_action = toolset.create_lib_shared_link_action(description=description,
+                sharedlib_directory=model_sharedlib_dir,
+                lib_directory=model_lib_dir,
+                obj_directory=mod_obj_dir,
+                obj_names=obj_names, build_model=current_model, build_config=build_config)
+
+        elif description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE:
+            mkdir_safe(model_exe_dir)
+            mod_action = toolset.create_exe_link_action(description=description,
+                sharedlib_directory=model_sharedlib_dir,
+                exe_directory=model_exe_dir,
+                lib_directory=model_lib_dir,
+                obj_directory=mod_obj_dir,
+                obj_names=obj_names, build_model=current_model, build_config=build_config)
+        mod_action_tokens = description.end_tokens_tracking()
+
+        if mod_action is None:
+            raise BuildSystemException("Can't create build action for module of type: '{}', provided in: '{}'.".format(description.module_type, description.self_file_parts[0]))
+        mod_action.description_digest = description.eval_tokens_digest(sorted(set(build_list_tokens + mod_action_tokens)))
+
+        mod_ctx = self._create_action_context(rebuild_level > 0)
+        mod_entry = self._actions_pool.put(mod_action, mod_ctx, depends=depends, triggers=src_entries + libs_entries)
+        if fingerprint_plan is not None:
+            if pch_action is not None:
+                fingerprint_plan.actions.append(pch_action)
+            fingerprint_plan.actions.extend(actions + [mod_action])
+
+        if self._faccess:
+            faccess_action = WorkflowStepAction(self._follow_faccess_in_module, description, current_model, mod_obj_dir, faccess_list)
+            self._actions_pool.put(faccess_action, self._create_action_context(False), depends=[mod_entry])
+
+        return mod_entry
+
+    def _create_source_action(self, toolset, description, current_model, build_config, mod_obj_dir, build_type, source_path, obj_name):
+        action = None
+        if build_type == BUILD_TYPE_CPP:
+            action = toolset.create_cpp_build_action(description=description, cpp_source=source_path,
+                obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
+        elif build_type == BUILD_TYPE_C:
+            action = toolset.create_c_build_action(description=description, c_source=source_path,
+                obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
+        elif build_type == BUILD_TYPE_ASM:
+            action = toolset.create_asm_build_action(description=description, asm_source=source_path,
+                obj_directory=mod_obj_dir, obj_name=obj_name, build_model=current_model, build_config=build_config)
+        if action is None:
+            raise BuildSystemException("Can't create build action for: '{}'.".format(source_path))
+        return action
+
+    def _eval_unity_build_list(self, description, mod_obj_dir, parsed_build_list):
+        unity_build = description.unity_build
+        if unity_build is None:
+            unity_build = self._unity
+        if not unity_build:
+            return parsed_build_list, parsed_build_list, {}
+        batch_size = description.unity_batch_size if description.unity_batch_size is not None else _UNITY_BATCH_SIZE_DEFAULT
+        batch_bytes = description.unity_batch_bytes
+        for tag, value in [(TAG_GRAMMAR_KEY_UNITY_BATCH_SIZE, batch_size), (TAG_GRAMMAR_KEY_UNITY_BATCH_BYTES, batch_bytes)]:
+            if value is not None and (not isinstance(value, int) or value < 1):
+                raise BuildSystemException("Invalid value of '{}' is given in '{}', expected positive integer.".format(tag, description.self_file_parts[0]))
+        excluded = [ os.sep + os.path.normcase(os.path.normpath(x)) for x in description.unity_exclude_list ]
+        compile_list = []
+        faccess_list = []
+        unity_sources = {}
+        batches = {}
+        for entry in parsed_build_list:
+            build_type, source_path, _ = entry
+            norm_source_path = os.path.normcase(source_path)
+            if build_type not in [BUILD_TYPE_CPP, BUILD_TYPE_C] or [ x for x in excluded if norm_source_path.endswith(x) ]:
+                compile_list.append(entry)
+                faccess_list.append(entry)
+                continue
+            source_bytes = os.path.getsize(source_path)
+            source_digest = eval_data_digest(eval_relative_path(source_path, description.self_dirname))
+            type_batches = batches.setdefault(build_type, [])
+            if type_batches:
+                last_batch = type_batches[-1]
+                if not last_batch[2] and len(last_batch[0]) < batch_size and (batch_bytes is None or last_batch[1] + source_bytes <= batch_bytes):
+                    last_batch[0].append(entry)
+                    last_batch[1] += source_bytes
+                    last_batch[2] = is_unity_batch_boundary(source_digest, batch_size)
+                    continue
+            type_batches.append([[entry], source_bytes, is_unity_batch_boundary(source_digest, batch_size), source_digest])
+        unity_dir = os.path.join(mod_obj_dir, 'unity')
+        for build_type in [BUILD_TYPE_CPP, BUILD_TYPE_C]:
+            lang = 'cpp' if build_type == BUILD_TYPE_CPP else 'c'
+            for batch_entries, _, _, batch_digest in batches.get(build_type, []):
+                if len(batch_entries) == 1:
+                    compile_list.extend(batch_entries)
+                    faccess_list.extend(batch_entries)
+                    continue
+                unity_name = 'unity-{}-{}'.format(lang, binascii.hexlify(batch_digest[:4]).decode('ascii'))
+                unity_path = os.path.join(unity_dir, '{}.{}'.format(unity_name, lang))
+                unity_text = ''.join([ '#include "{}"\n'.format(eval_relative_path(source_path, unity_dir)) for _, source_path, _ in batch_entries ])
+                unity_sources[unity_path] = unity_text
+                compile_list.append((build_type, unity_path, unity_name))
+                faccess_list.extend([ (x[0], x[1], unity_name) for x in batch_entries ])
+        return compile_list, faccess_list, unity_sources
+
+    def _explain_unity_source(self, output, ctx, unity_path, unity_text):
+        if not os.path.isfile(unity_path):
+            return "output is missing: '{}'".format(unity_path)
+        with open(unity_path, mode='rt') as fh:
+            if fh.read() != unity_text:
+                return "unity source is changed: '{}'".format(unity_path)
+        return None
+
+    def _write_unity_source(self, output, ctx, unity_path, unity_text):
+        if self._explain_unity_source(output, ctx, unity_path, unity_text) is None:
+            return ToolsetActionResult(rebuilt=False, artifacts=None)
+        mkdir_safe(os.path.dirname(unity_path))
+        with open(unity_path, mode='wt') as fh:
+            fh.write(unity_text)
+        if ctx.stat_cache is not None:
+            ctx.stat_cache.invalidate([unity_path])
+        return ToolsetActionResult(rebuilt=True, artifacts=None)
+
+    def _eval_compile_batches(self, toolset, mod_obj_dir, typed_actions):
+        if self._batch_compile < 2:
+            return [ action for _, action in typed_actions ]
+        result = []
+        candidates = {}
+        for build_type, action in typed_actions:
+            duration = self._actions_pool.get_duration(action.target_path)
+            if build_type not in [BUILD_TYPE_CPP, BUILD_TYPE_C] or (duration is not None and duration > _BATCH_COMPILE_SMALL_DURATION):
+                result.append(action)
+                continue
+            candidates.setdefault(build_type, []).append((action, duration if duration is not None else _BATCH_COMPILE_UNKNOWN_DURATION))
+        for build_type in [BUILD_TYPE_CPP, BUILD_TYPE_C]:
+            type_candidates = candidates.get(build_type, [])
+            batch_size = min(self._batch_compile, (len(type_candidates) + self._actions_pool.jobs_count - 1) // self._actions_pool.jobs_count)
+            batches = []
+            batch_duration = 0.0
+            for action, duration in type_candidates:
+                if not batches or len(batches[-1]) >= batch_size or batch_duration >= _BATCH_COMPILE_DURATION_LIMIT:
+                    batches.append([])
+                    batch_duration = 0.0
+                batches[-1].append(action)
+                batch_duration += duration
+            for batch in batches:
+                batch_action = None
+                if len(batch) > 1:
+                    batch_action = toolset.create_batch_build_action(actions=batch, obj_directory=mod_obj_dir)
+                if batch_action is not None:
+                    result.append(batch_action)
+                else:
+                    result.extend(batch)
+        return result
+
+    def _create_pch_action(self, toolset, description, current_model, build_config, mod_obj_dir, parsed_build_list):
+        pch_header = eval_precompiled_header_in_description(description, current_model)
+        if pch_header is None:
+            return None
+        build_types = [ x[0] for x in parsed_build_list ]
+        if BUILD_TYPE_CPP in build_types:
+            source_type = BUILD_TYPE_CPP
+        elif BUILD_TYPE_C in build_types:
+            source_type = BUILD_TYPE_C
+        else:
+            return None
+        return toolset.create_pch_build_action(description=description, header_path=pch_header, source_type=source_type,
+            obj_directory=mod_obj_dir, build_model=current_model, build_config=build_config)
 
-        self._build_cache.cache_build_result(description, used_model_name, mod_build_result[1])
-        print("BUILDSYS: finish build '{}', {},{}".format(description.module_name, description.module_type, used_model_name))
-        return mod_build_result
+    def _follow_faccess_in_module(self, output, ctx, description, current_model, mod_obj_dir, parsed_build_list):
+        faccess_stamps = []
+        faccess_mod_header_refs = set()
+        for build_type, source_path, obj_name in parsed_build_list:
+            norm_src_path = os.path.normcase(source_path)
+            faccess_in_interest = False
+            for faccess_prefix in self._faccess_prefixes:
+                if norm_src_path.startswith(self._sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX]):
+                    break
+                if norm_src_path.startswith(faccess_prefix):
+                    faccess_in_interest = True
+                    break
+            if not faccess_in_interest:
+                continue
+            norm_src_path = source_path[len(self._sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]):]
+            faccess_stamp_file = os.path.join(self._sysinfo[TAG_CFG_DIR_FACCESS], norm_src_path)
+            faccess_stamps += [ (norm_src_path.replace('\\', '/'), faccess_stamp_file) ]
+            facccess_obj_file = os.path.join(mod_obj_dir, obj_name + self._sysinfo[TAG_CFG_OBJ_SUFFIX])
+            facccess_dep_file = os.path.join(mod_obj_dir, obj_name + self._sysinfo[TAG_CFG_DEP_SUFFIX])
+            headers_refs = self._build_state.get_target_depends(facccess_obj_file, legacy_depends_file=facccess_dep_file)
+            if headers_refs is None:
+                continue
+            for header_ref in headers_refs:
+                header_ref_norm = os.path.normcase(os.path.normpath(header_ref))
+                if header_ref_norm in faccess_mod_header_refs:
+                    continue
+                faccess_mod_header_refs.add(header_ref_norm)
+                faccess_header_in_interest = False
+                for faccess_prefix in self._faccess_prefixes:
+                    norm_header_path = self._sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX] + header_ref_norm
+                    if norm_header_path.startswith(self._sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX]):
+                        break
+                    if norm_header_path.startswith(faccess_prefix):
+                        faccess_header_in_interest = True
+                        break
+                if not faccess_header_in_interest:
+                    continue
+                header_relpath = os.path.normpath(header_ref)
+                faccess_stamp_file = os.path.join(self._sysinfo[TAG_CFG_DIR_FACCESS], header_relpath)
+                faccess_stamps += [ (header_relpath.replace('\\', '/'), faccess_stamp_file) ]
+        if current_model.platform_name == TAG_PLATFORM_WINDOWS:
+            if description.module_type in [TAG_GRAMMAR_VALUE_MODULE_TYPE_EXE, TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED]:
+                faccess_rc_file = verify_winrc_file(description)
+                if faccess_rc_file:
+                    self._follow_faccess_for_file(output, faccess_rc_file)
+        if description.module_type == TAG_GRAMMAR_VALUE_MODULE_TYPE_LIB_SHARED:
+            faccess_def_file = verify_exports_def_file(description)
+            if faccess_def_file:
+                self._follow_faccess_for_file(output, faccess_def_file)
+        for faccess_relpath, faccess_stamp_file in faccess_stamps:
+            if self._verbose:
+                output.report_message("BUILDSYS: FACCESS: {}".format(faccess_relpath))
+            mkdir_safe(os.path.dirname(faccess_stamp_file))
+            touch_file(faccess_stamp_file)
+        return ToolsetActionResult(rebuilt=False, artifacts=None)
 
-    def _create_ext_action(self, expected_ext_type, ext_name, description, used_model_name, build_config, rebuild_level):
-        if not ext_name in self._imported_extensions or not description._buildsys_import_list or not ext_name in description._buildsys_import_list:
+    def _create_ext_action(self, expected_ext_type, ext_name, description, used_model_name, build_config, rebuild_level, depends):
+        if not ext_name in self._extensions.imported or not description._buildsys_import_list or not ext_name in description._buildsys_import_list:
             raise BuildSystemException("Build extension '{}' is unknown (or not imported), got from '{}'.".format(ext_name, description.self_file_parts[0]))
-        ext_description = self._imported_extensions[ext_name].description
+        ext_description = self._extensions.imported[ext_name].description
         if ext_description.ext_type != expected_ext_type:
             raise BuildSystemException("Type info mismatched in build extension '{}': got '{}', but expected '{}'.".format(ext_name, ext_description.ext_type, expected_ext_type))
         action = None
         try:
             self._ext_protector.inc_ref(ext_description, used_model_name)
-            action = self._create_ext_action_imp(ext_description, description, used_model_name, build_config, rebuild_level)
+            action = self._create_ext_action_imp(ext_description, description, used_model_name, build_config, rebuild_level, depends)
         finally:
             self._ext_protector.dec_ref(ext_description, used_model_name)
         return action
 
-    def _create_ext_action_imp(self, ext_description, description, used_model_name, build_config, rebuild_level):
+    def _create_ext_action_imp(self, ext_description, description, used_model_name, build_config, rebuild_level, depends):
         ext_ref_count = self._ext_protector.ref_count(ext_description, used_model_name)
         if ext_ref_count > 2:
             raise BuildSystemException("Got unexpected recursive call from '{}'.".format(ext_description.self_file_parts[0]))
@@ -871,14 +1622,16 @@ class BuildWorkflow:
             mkdir_safe(ext_private_dir)
             stamp_fname = 'depends-{}-{}.stamp'.format(self._native_model_remap, build_config)
             stamp_path = os.path.join(ext_private_dir, stamp_fname)
-            up_to_date, _ = is_target_up_to_date(stamp_path, None, ext_description.self_file_parts, self._verbose)
+            up_to_date, _ = is_target_up_to_date(self._stat_cache, stamp_path, None, ext_description.self_file_parts, self._verbose)
             if rebuild_level > 1 or (not up_to_date and rebuild_level >= 0):
                 submod_rebuild_level = 2 if rebuild_level == 2 and ext_ref_count < 2 else 0
+                native_entries = []
                 for dep_ref in ext_description.ext_native_depends:
                     dep_dir = normalize_path_optional(dep_ref, ext_description.self_dirname)
                     dep_desc = native_loader.load_build_description(dep_dir, native_model, required_by=ext_description.self_file_parts[0])
-                    self._perform_build(dep_desc, self._native_model_remap, build_config, submod_rebuild_level)
-                touch_file(stamp_path)
+                    native_entries.append(self._plan_build(dep_desc, self._native_model_remap, build_config, submod_rebuild_level))
+                stamp_action = WorkflowStepAction(self._touch_stamp_file, stamp_path)
+                depends.append(self._actions_pool.put(stamp_action, self._create_action_context(False), depends=native_entries))
 
         local_vars = {}
         if ext_description.ext_obj_dir_native_as_var is not None:
@@ -956,43 +1709,52 @@ class BuildWorkflow:
         ext_action = ExtAction(ext_description.ext_type, ext_description.ext_name, description.module_name, self._verbose, argv)
         return ext_action
 
-    def _perform_pre_build(self, description, used_model_name, build_config, rebuild_level, noarch):
+    def _touch_stamp_file(self, output, ctx, stamp_path):
+        touch_file(stamp_path)
+        return ToolsetActionResult(rebuilt=False, artifacts=None)
+
+    def _plan_pre_build(self, description, used_model_name, build_config, rebuild_level, noarch, depends):
         if noarch or description.module_type in (TAG_GRAMMAR_VALUE_MODULE_TYPE_ZIP_FILE, TAG_GRAMMAR_VALUE_MODULE_TYPE_DOWNLOAD):
             mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
         else:
             mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, used_model_name, build_config)
         mkdir_safe(mod_obj_dir)
         mod_pre_build_stamp_file = os.path.join(mod_obj_dir, PRE_BUILD_OBJ_STAMP_FILE)
-        if os.path.isfile(mod_pre_build_stamp_file):
-            if rebuild_level < 1:
-                return
-            else:
-                os.remove(mod_pre_build_stamp_file)
+        if os.path.isfile(mod_pre_build_stamp_file) and rebuild_level < 1:
+            return None
         if noarch:
             ext_type = TAG_GRAMMAR_VALUE_EXT_TYPE_PRE_BUILD_NOARCH
             ext_list = description.pre_build_noarch
         else:
             ext_type = TAG_GRAMMAR_VALUE_EXT_TYPE_PRE_BUILD
             ext_list = description.pre_build
+        pre_build_depends = list(depends)
+        ext_actions = []
         for ext_name in ext_list:
-            ext_action = self._create_ext_action(ext_type, ext_name, description, used_model_name, build_config, rebuild_level)
-            ext_action()
+            ext_actions.append(self._create_ext_action(ext_type, ext_name, description, used_model_name, build_config, rebuild_level, pre_build_depends))
+        pre_build_action = WorkflowStepAction(self._perform_pre_build, mod_pre_build_stamp_file, ext_actions).with_explain(
+            self._explain_pre_build, "{} of '{}'".format(ext_type, description.module_name))
+        return self._actions_pool.put(pre_build_action, self._create_action_context(False), depends=pre_build_depends)
+
+    def _explain_pre_build(self, output, ctx, mod_pre_build_stamp_file, ext_actions):
+        if not os.path.isfile(mod_pre_build_stamp_file):
+            return "pre-build stamp is missing: '{}'".format(mod_pre_build_stamp_file)
+        return 'rebuild is forced'
+
+    def _perform_pre_build(self, output, ctx, mod_pre_build_stamp_file, ext_actions):
+        if os.path.isfile(mod_pre_build_stamp_file):
+            os.remove(mod_pre_build_stamp_file)
+        for ext_action in ext_actions:
+            ext_action(output)
         touch_file(mod_pre_build_stamp_file)
+        return ToolsetActionResult(rebuilt=True, artifacts=None)
 
-    def _perform_post_build(self, description, used_model_name, build_config, rebuild_level):
-        for ext_name in description.post_build:
-            ext_action = self._create_ext_action(TAG_GRAMMAR_VALUE_EXT_TYPE_POST_BUILD, ext_name,
-                description, used_model_name, build_config, rebuild_level)
-            ext_action()
+    def _perform_post_build(self, output, description, used_model_name, build_config, ext_actions):
+        for ext_action in ext_actions:
+            ext_action(output)
         if description.module_type in (TAG_GRAMMAR_VALUE_MODULE_TYPE_ZIP_FILE, TAG_GRAMMAR_VALUE_MODULE_TYPE_DOWNLOAD):
             mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, TAG_DIR_NOARCH)
         else:
             mod_obj_dir = os.path.join(self._sysinfo[TAG_CFG_DIR_OBJ], description.module_name, used_model_name, build_config)
         mod_post_build_stamp_file = os.path.join(mod_obj_dir, POST_BUILD_OBJ_STAMP_FILE)
         touch_file(mod_post_build_stamp_file)
-
-    def _perform_spec_post_build(self, description, used_model_name, build_config, rebuild_level):
-        for ext_name in description.spec_post_build:
-            ext_action = self._create_ext_action(TAG_GRAMMAR_VALUE_EXT_TYPE_SPEC_POST_BUILD, ext_name,
-                description, used_model_name, build_config, rebuild_level)
-            ext_action()
@@ -13,6 +13,11 @@ BUILD_CONFIG_DEFAULT_SHARED_DIR    = 'shared'
 BUILD_CONFIG_DEFAULT_PUBLIC_DIR    = 'public'
 BUILD_CONFIG_DEFAULT_FACCESS_DIR   = 'faccess'
 BUILD_CONFIG_DEFAULT_FACCESS_EMERGE_FILE = 'faccess.json'
+BUILD_CONFIG_DEFAULT_DURATIONS_FILE = 'durations.json'
+BUILD_CONFIG_DEFAULT_BUILD_STATE_FILE = 'build-state.db'
+BUILD_CONFIG_DEFAULT_DAEMON_SOCKET_FILE = 'daemon.sock'
+BUILD_CONFIG_DEFAULT_DAEMON_LOG_FILE = 'daemon.log'
+BUILD_CONFIG_DEFAULT_LTO_CACHE_DIR = 'lto-cache'
 
 
 BUILD_TYPE_UNKNOWN = 0
@@ -26,6 +31,7 @@ BUILD_RET_TYPE_EXE      = 3
 BUILD_RET_TYPE_DLL      = 4
 BUILD_RET_TYPE_ZIP      = 5
 BUILD_RET_TYPE_RESOURCE = 6
+BUILD_RET_TYPE_DWP      = 7
 
 BUILD_RET_ATTR_DEFAULT          = 0x00000000
 BUILD_RET_ATTR_FLAG_EXECUTABLE  = 0x00000001
@@ -100,6 +106,11 @@ TAG_CFG_DIR_FACCESS = 'dir-faccess'
 TAG_CFG_OBJ_SUFFIX = 'obj-suffix'
 TAG_CFG_PDB_SUFFIX = 'pdb-suffix'
 TAG_CFG_DEP_SUFFIX = 'dep-suffix'
+TAG_CFG_REPRODUCIBLE = 'reproducible'
+TAG_CFG_LTO = 'lto'
+TAG_CFG_SPLIT_DWARF = 'split-dwarf'
+TAG_CFG_COMPRESS_DEBUG_SECTIONS = 'compress-debug-sections'
+TAG_CFG_PROJECT_CONFIG_FILE = 'project-config-file'
 
 TAG_PUBLIC_LAYAOUT_FLAT = 'flat'
 TAG_PUBLIC_FORMAT_ZIP = 'zip'
@@ -109,6 +120,20 @@ TAG_PUBLIC_FORMAT_ALL = [
     TAG_PUBLIC_FORMAT_TGZ,
 ]
 
+TAG_CHECK_MODE_MTIME = 'mtime'
+TAG_CHECK_MODE_HASH = 'hash'
+TAG_CHECK_MODE_ALL = [
+    TAG_CHECK_MODE_MTIME,
+    TAG_CHECK_MODE_HASH,
+]
+
+TAG_REMOTE_CACHE_MODE_READ_ONLY = 'read-only'
+TAG_REMOTE_CACHE_MODE_READ_WRITE = 'read-write'
+TAG_REMOTE_CACHE_MODE_ALL = [
+    TAG_REMOTE_CACHE_MODE_READ_ONLY,
+    TAG_REMOTE_CACHE_MODE_READ_WRITE,
+]
+
 TAG_DIR_NOARCH = 'noarch'
 
 TAG_ARCH_X86     = 'x86'
@@ -243,6 +268,15 @@ TAG_GRAMMAR_KEY_EXPLICIT_DEPENDS             = 'explicit_depends'
 TAG_GRAMMAR_KEY_ZIP_SECTION                  = 'zip_section'
 TAG_GRAMMAR_KEY_WINRC_FILE                   = 'winrc_file'
 TAG_GRAMMAR_KEY_WINRC_DEFINITIONS            = 'winrc_definitions'
+TAG_GRAMMAR_KEY_PRECOMPILED_HEADER           = 'precompiled_header'
+TAG_GRAMMAR_KEY_UNITY_BUILD                  = 'unity_build'
+TAG_GRAMMAR_KEY_UNITY_BATCH_SIZE             = 'unity_batch_size'
+TAG_GRAMMAR_KEY_UNITY_BATCH_BYTES            = 'unity_batch_bytes'
+TAG_GRAMMAR_KEY_UNITY_EXCLUDE_LIST           = 'unity_exclude_list'
+TAG_GRAMMAR_KEY_LTO                          = 'lto'
+TAG_GRAMMAR_KEY_LINKER                       = 'linker'
+TAG_GRAMMAR_KEY_SPLIT_DWARF                  = 'split_dwarf'
+TAG_GRAMMAR_KEY_COMPRESS_DEBUG_SECTIONS      = 'compress_debug_sections'
 
 
 TAG_GRAMMAR_SPEC_FILE_ENTAILS = [
@@ -293,6 +327,15 @@ TAG_GRAMMAR_KEYS_COMMON = {
     TAG_GRAMMAR_KEY_ZIP_SECTION                  : (None, GRAMMAR_PREPROCESS_ENABLED),
     TAG_GRAMMAR_KEY_WINRC_FILE                   : (None, GRAMMAR_PREPROCESS_ENABLED),
     TAG_GRAMMAR_KEY_WINRC_DEFINITIONS            : (list, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_PRECOMPILED_HEADER           : (None, GRAMMAR_PREPROCESS_ENABLED),
+    TAG_GRAMMAR_KEY_UNITY_BUILD                  : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_UNITY_BATCH_SIZE             : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_UNITY_BATCH_BYTES            : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_UNITY_EXCLUDE_LIST           : (list, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_LTO                          : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_LINKER                       : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_SPLIT_DWARF                  : (None, GRAMMAR_PREPROCESS_DISABLED),
+    TAG_GRAMMAR_KEY_COMPRESS_DEBUG_SECTIONS      : (None, GRAMMAR_PREPROCESS_DISABLED),
 }
 
 
@@ -418,6 +461,23 @@ def _extend_definitions_grammar_keys():
     return result
 
 
+def _extend_precompiled_header_grammar_keys():
+    result = {}
+    defaults = TAG_GRAMMAR_KEYS_COMMON[TAG_GRAMMAR_KEY_PRECOMPILED_HEADER]
+    for platform in (
+            TAG_PLATFORM_WINDOWS,
+            TAG_PLATFORM_LINUX,
+            TAG_PLATFORM_MACOSX,
+            TAG_PLATFORM_ALIAS_POSIX,
+            ):
+        key = '_'.join([TAG_GRAMMAR_KEY_PRECOMPILED_HEADER, platform])
+        result[key] = defaults
+        for arch in TAG_ALL_KNOWN_ARCH_LIST:
+            subkey = '_'.join([key, arch])
+            result[subkey] = defaults
+    return result
+
+
 def _extend_grammar_keys():
     result = {}
     result.update(TAG_GRAMMAR_KEYS_COMMON)
@@ -425,6 +485,7 @@ def _extend_grammar_keys():
     result.update(_extend_src_search_dir_list_grammar_keys())
     result.update(_extend_prebuilt_lib_list_grammar_keys())
     result.update(_extend_definitions_grammar_keys())
+    result.update(_extend_precompiled_header_grammar_keys())
     return result
 
 TAG_GRAMMAR_KEYS_ALL = _extend_grammar_keys()
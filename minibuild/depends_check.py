@@ -1,40 +1,35 @@
 import datetime
-import decimal
 import os.path
 import sys
 
 from .build_art import BuildArtifact
 from .constants import *
 from .error_utils import BuildSystemException
-from .os_utils import load_py_object, normalize_path_optional
+from .os_utils import normalize_path_optional
+from .stat_cache import MTIME_TOLERANCE_DEFAULT_NS, query_file_status, set_file_mtime_ns
 
-_MTIME_PRECISION = decimal.Decimal('0.001') # 0.001 second
 _MTIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
 
 
-def prerequisite_newer_then_target(mt_target, mt_pre, fname_target, fname_pre, verbose):
-    mtd_target = decimal.Decimal(mt_target).quantize(_MTIME_PRECISION)
-    mtd_pre = decimal.Decimal(mt_pre).quantize(_MTIME_PRECISION)
-    newer = mtd_pre > mtd_target
+def prerequisite_newer_then_target(mt_target, mt_pre, fname_target, fname_pre, verbose, tolerance_ns=MTIME_TOLERANCE_DEFAULT_NS):
+    newer = mt_pre - mt_target > tolerance_ns
     if verbose and newer:
-        mtdf_pre = datetime.datetime.fromtimestamp(mtd_pre).strftime(_MTIME_FORMAT)
-        mtdf_pre = mtdf_pre[:-3]
-        mtdf_target = datetime.datetime.fromtimestamp(mtd_target).strftime(_MTIME_FORMAT)
-        mtdf_target = mtdf_target[:-3]
-        print("BUILDSYS: prerequisite is newer than target:\n    {}, i.e. {} - prerequisite: {}\n    {}, i.e. {} - target: {}".format(mtd_pre, mtdf_pre, fname_pre, mtd_target, mtdf_target, fname_target))
+        mtdf_pre = datetime.datetime.fromtimestamp(mt_pre // 1000 / 1000000.0).strftime(_MTIME_FORMAT)
+        mtdf_target = datetime.datetime.fromtimestamp(mt_target // 1000 / 1000000.0).strftime(_MTIME_FORMAT)
+        print("BUILDSYS: prerequisite is newer than target:\n    {}, i.e. {} - prerequisite: {}\n    {}, i.e. {} - target: {}".format(mt_pre, mtdf_pre, fname_pre, mt_target, mtdf_target, fname_target))
     return newer
 
 
-def is_target_up_to_date(target_file_path, obj_files, required_depends, verbose):
-    if not os.path.isfile(target_file_path):
+def is_target_up_to_date(stat_cache, target_file_path, obj_files, required_depends, verbose):
+    if not stat_cache.isfile(target_file_path):
         return False, None
 
     if obj_files:
         for obj_file_path in obj_files:
-            if not os.path.isfile(obj_file_path):
+            if not stat_cache.isfile(obj_file_path):
                 return False, (obj_file_path, None)
 
-    target_mtime = os.path.getmtime(target_file_path)
+    target_mtime = stat_cache.mtime_ns(target_file_path)
 
     if required_depends:
         for dep in required_depends:
@@ -42,48 +37,127 @@ def is_target_up_to_date(target_file_path, obj_files, required_depends, verbose)
                 dep_path = dep.path
             else:
                 dep_path = dep
-            dep_mtime = os.path.getmtime(dep_path)
-            if prerequisite_newer_then_target(target_mtime, dep_mtime, target_file_path, dep_path, verbose):
+            dep_mtime = stat_cache.mtime_ns(dep_path)
+            if prerequisite_newer_then_target(target_mtime, dep_mtime, target_file_path, dep_path, verbose, stat_cache.tolerance_ns):
                 return False, (dep_path, dep_mtime)
 
     if obj_files:
         for obj_file_path in obj_files:
-            obj_mtime = os.path.getmtime(obj_file_path)
-            if prerequisite_newer_then_target(target_mtime, obj_mtime, target_file_path, obj_file_path, verbose):
+            obj_mtime = stat_cache.mtime_ns(obj_file_path)
+            if prerequisite_newer_then_target(target_mtime, obj_mtime, target_file_path, obj_file_path, verbose, stat_cache.tolerance_ns):
                 return False, (obj_file_path, obj_mtime)
 
     return True, None
 
 
-def is_target_with_deps_up_to_date(project_root, source_file_path, target_file_path, depends_file_path, extra_depends, verbose):
-    if not os.path.isfile(source_file_path):
-        return False
-    if not os.path.isfile(target_file_path):
-        return False
-    if not os.path.isfile(depends_file_path):
-        return False
-    source_mtime = os.path.getmtime(source_file_path)
-    target_mtime = os.path.getmtime(target_file_path)
-
-    if prerequisite_newer_then_target(target_mtime, source_mtime, target_file_path, source_file_path, verbose):
-        return False
+def explain_target_rebuild(stat_cache, target_file_path, obj_files, required_depends, verbose):
+    up_to_date, prerequisite_info = is_target_up_to_date(stat_cache, target_file_path, obj_files, required_depends, verbose)
+    if up_to_date:
+        return None
+    if prerequisite_info is None:
+        return "output is missing: '{}'".format(target_file_path)
+    if prerequisite_info[1] is None:
+        return "prerequisite is missing: '{}'".format(prerequisite_info[0])
+    return "prerequisite is newer: '{}'".format(prerequisite_info[0])
+
+
+def explain_target_with_deps_rebuild(stat_cache, project_root, source_file_path, target_file_path, depends, extra_depends, verbose):
+    if depends is None:
+        return "dependencies are not recorded: '{}'".format(target_file_path)
+    if not stat_cache.isfile(source_file_path):
+        return "source is missing: '{}'".format(source_file_path)
+    if not stat_cache.isfile(target_file_path):
+        return "output is missing: '{}'".format(target_file_path)
+    source_mtime = stat_cache.mtime_ns(source_file_path)
+    target_mtime = stat_cache.mtime_ns(target_file_path)
+
+    if prerequisite_newer_then_target(target_mtime, source_mtime, target_file_path, source_file_path, verbose, stat_cache.tolerance_ns):
+        return "prerequisite is newer: '{}'".format(source_file_path)
 
     for ext_dep in extra_depends:
-        ext_dep_mtime = os.path.getmtime(ext_dep)
-        if prerequisite_newer_then_target(target_mtime, ext_dep_mtime, target_file_path, ext_dep, verbose):
-            return False
+        ext_dep_mtime = stat_cache.mtime_ns(ext_dep)
+        if prerequisite_newer_then_target(target_mtime, ext_dep_mtime, target_file_path, ext_dep, verbose, stat_cache.tolerance_ns):
+            return "prerequisite is newer: '{}'".format(ext_dep)
 
-    depends = load_py_object(depends_file_path)
     for dep_item in depends:
         dep_item_path = os.path.join(project_root, dep_item)
-        if not os.path.isfile(dep_item_path):
-            return False
-        dep_item_mtime = os.path.getmtime(dep_item_path)
-        if prerequisite_newer_then_target(target_mtime, dep_item_mtime, target_file_path, dep_item_path, verbose):
-            return False
+        if not stat_cache.isfile(dep_item_path):
+            return "prerequisite is missing: '{}'".format(dep_item_path)
+        dep_item_mtime = stat_cache.mtime_ns(dep_item_path)
+        if prerequisite_newer_then_target(target_mtime, dep_item_mtime, target_file_path, dep_item_path, verbose, stat_cache.tolerance_ns):
+            return "prerequisite is newer: '{}'".format(dep_item_path)
+    return None
+
+
+def is_target_with_deps_up_to_date(stat_cache, project_root, source_file_path, target_file_path, depends, extra_depends, verbose):
+    return explain_target_with_deps_rebuild(stat_cache, project_root, source_file_path, target_file_path, depends, extra_depends, verbose) is None
+
+
+def eval_target_with_deps_prerequisites(project_root, source_file_path, depends, extra_depends):
+    prerequisites = [ source_file_path ]
+    prerequisites.extend(extra_depends)
+    prerequisites.extend([ os.path.join(project_root, dep_item) for dep_item in depends ])
+    return prerequisites
+
+
+def eval_target_prerequisites(obj_files, required_depends):
+    prerequisites = []
+    if required_depends:
+        for dep in required_depends:
+            if isinstance(dep, BuildArtifact):
+                prerequisites.append(dep.path)
+            else:
+                prerequisites.append(dep)
+    if obj_files:
+        prerequisites.extend(obj_files)
+    return prerequisites
+
+
+def is_target_content_up_to_date(output, ctx, target_file_path, prerequisites, always=False):
+    if not always and not ctx.content_check:
+        return False
+    recorded_digest = ctx.build_state.get_target_inputs_digest(target_file_path)
+    if recorded_digest is None:
+        return False
+    actual_digest = ctx.build_state.eval_inputs_digest(ctx.stat_cache, prerequisites)
+    if actual_digest != recorded_digest:
+        return False
+    if ctx.verbose:
+        output.report_message("BUILDSYS: content of prerequisites is unchanged, target: {}".format(target_file_path))
     return True
 
 
+def explain_target_command_rebuild(output, ctx, target_file_path, command_digest):
+    if command_digest is None:
+        return None
+    if not ctx.stat_cache.isfile(target_file_path):
+        return "output is missing: '{}'".format(target_file_path)
+    if ctx.build_state.get_target_command_digest(target_file_path) == command_digest:
+        return None
+    if ctx.verbose:
+        output.report_message("BUILDSYS: command line or environment changed, target: {}".format(target_file_path))
+    return "command line or environment changed: '{}'".format(target_file_path)
+
+
+def is_target_command_up_to_date(output, ctx, target_file_path, command_digest):
+    return explain_target_command_rebuild(output, ctx, target_file_path, command_digest) is None
+
+
+def record_target_content(ctx, target_file_path, prerequisites, always=False):
+    if always or ctx.content_check:
+        ctx.build_state.set_target_inputs_digest(target_file_path, ctx.build_state.eval_inputs_digest(ctx.stat_cache, prerequisites))
+
+
+def is_target_output_changed(output, ctx, target_file_path, keep_timestamp=False, stamp_file_path=None):
+    if ctx.build_state.restat_output(target_file_path, keep_timestamp):
+        return True
+    if keep_timestamp and stamp_file_path is not None:
+        set_file_mtime_ns(stamp_file_path, query_file_status(target_file_path).mtime_ns)
+    if ctx.verbose:
+        output.report_message("BUILDSYS: output is unchanged: {}".format(target_file_path))
+    return False
+
+
 def eval_include_dirs_in_description(description, project_root, source_type):
     include_dirs = []
     if source_type == BUILD_TYPE_ASM:
@@ -172,6 +246,28 @@ def verify_exports_def_file(description):
     return exports_fname
 
 
+def eval_precompiled_header_in_description(description, current_model):
+    tag = TAG_GRAMMAR_KEY_PRECOMPILED_HEADER
+    platform_alias = current_model.platform_alias
+    all_attr = [tag]
+    if platform_alias is not None:
+        all_attr += ['_'.join([tag, platform_alias])]
+        all_attr += ['_'.join([tag, platform_alias, current_model.architecture_abi_name])]
+    all_attr += ['_'.join([tag, current_model.platform_name])]
+    all_attr += ['_'.join([tag, current_model.platform_name, current_model.architecture_abi_name])]
+    header = None
+    for attr_name in all_attr:
+        value = getattr(description, attr_name)
+        if value is not None:
+            header = value
+    if not header:
+        return None
+    header_fname = normalize_path_optional(header, description.self_dirname)
+    if not os.path.isfile(header_fname):
+        raise BuildSystemException("Precompiled header '{}' not found, required in '{}'".format(header_fname, description.self_file_parts[0]))
+    return header_fname
+
+
 def verify_winrc_file(description):
     if description.winrc_file is None:
         return None
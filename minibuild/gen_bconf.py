@@ -10,6 +10,7 @@ from .depends_check import prerequisite_newer_then_target
 from .error_utils import BuildSystemException
 from .os_utils import touch_file
 from .pragma_tokens import load_buildconf_pragmas
+from .stat_cache import query_file_status
 
 
 class _ToolsetPragmaConfig:
@@ -216,8 +217,8 @@ def _generate_build_config_imp(config_proto, dest_config, sys_platform, sys_arch
 def generate_build_config(config_proto, config_file, sys_platform, sys_arch, verbose):
     gen_stamp_file = os.path.splitext(config_file)[0] + '.stamp'
     if os.path.isfile(config_proto) and os.path.isfile(gen_stamp_file) and os.path.isfile(config_file):
-        mt_proto = os.path.getmtime(config_proto)
-        mt_target = os.path.getmtime(gen_stamp_file)
+        mt_proto = query_file_status(config_proto).mtime_ns
+        mt_target = query_file_status(gen_stamp_file).mtime_ns
         if not prerequisite_newer_then_target(mt_target, mt_proto, gen_stamp_file, config_proto, verbose):
             return
     _generate_build_config_imp(config_proto, config_file, sys_platform, sys_arch, verbose)
@@ -1,9 +1,9 @@
 import os.path
 
+from .build_state import eval_command_digest
 from .constants import *
 from .depends_check import *
 from .error_utils import BuildSystemException
-from .string_utils import escape_string
 from .toolset_base import ToolsetActionBase, ToolsetActionResult
 
 
@@ -24,16 +24,33 @@ class NasmSourceBuildAction(ToolsetActionBase):
         self.include_dirs = eval_include_dirs_in_description(description, self.project_root, BUILD_TYPE_ASM)
         self.definitions = eval_definitions_list_in_description(description, build_model, BUILD_TYPE_ASM)
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
         self.arch = build_model.architecture_abi_name
         self.platform_name = build_model.platform_name
         self.build_config = build_config
 
+    @property
+    def target_path(self):
+        return self.obj_path
+
+    def eval_rebuild_reason(self, output, ctx, command_digest=None):
+        if command_digest is None:
+            command_digest = eval_command_digest(self.build_argv(), ctx.subprocess_env(None))
+        reason = explain_target_command_rebuild(output, ctx, self.obj_path, command_digest)
+        if reason is not None:
+            return reason
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        reason = explain_target_with_deps_rebuild(ctx.stat_cache, self.project_root, self.asm_path, self.obj_path, depends, self.extra_deps, ctx.verbose)
+        if reason is not None and depends is not None and is_target_content_up_to_date(output, ctx, self.obj_path,
+                eval_target_with_deps_prerequisites(self.project_root, self.asm_path, depends, self.extra_deps)):
+            return None
+        return reason
+
     def execute(self, output, ctx):
+        argv = self.build_argv()
+        command_digest = eval_command_digest(argv, ctx.subprocess_env(None))
         target_is_ready = False
         if not ctx.force:
-            target_is_ready = is_target_with_deps_up_to_date(
-                self.project_root, self.asm_path, self.obj_path, self.dep_path, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx, command_digest) is None
         if target_is_ready:
             if ctx.verbose:
                 output.report_message("BUILDSYS: up-to-date: {}".format(self.asm_path))
@@ -42,6 +59,21 @@ class NasmSourceBuildAction(ToolsetActionBase):
         if ctx.verbose:
             output.report_message("BUILDSYS: ASM: {}".format(self.asm_path))
 
+        ctx.subprocess_communicate(output, argv, issuer=self.asm_path, title=os.path.basename(self.asm_path))
+
+        depends = parse_gnu_makefile_depends(self.common_prefix, self.asm_path, self.deptmp_path, self.obj_path)
+        rebuilt = is_target_output_changed(output, ctx, self.obj_path)
+        ctx.build_state.set_target_depends(self.obj_path, depends, command_digest)
+        record_target_content(ctx, self.obj_path, eval_target_with_deps_prerequisites(self.project_root, self.asm_path, depends, self.extra_deps))
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=None, executed=True)
+
+    def eval_prerequisites(self, ctx):
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        if depends is None:
+            return None
+        return eval_target_with_deps_prerequisites(self.project_root, self.asm_path, depends, self.extra_deps)
+
+    def build_argv(self):
         out_format = NASM_OUTPUT_FORMATS.get(self.platform_name, {}).get(self.arch)
         if not out_format:
             raise BuildSystemException("NASM: Got unsupported platform '{}' or arch '{}'.".format(self.platform_name, self.arch))
@@ -60,13 +92,4 @@ class NasmSourceBuildAction(ToolsetActionBase):
             argv += [ '-D{}'.format(_def) ]
 
         argv += ['-o', self.obj_path, '-MD', self.deptmp_path, self.asm_path]
-
-        ctx.subprocess_communicate(output, argv, issuer=self.asm_path, title=os.path.basename(self.asm_path))
-
-        depends = parse_gnu_makefile_depends(self.common_prefix, self.asm_path, self.deptmp_path, self.obj_path)
-        with open(self.dep_path, mode='wt') as dep_content:
-            dep_content.writelines(['[\n'])
-            for dep_item in depends:
-                dep_content.writelines(['    "', escape_string(dep_item), '",\n'])
-            dep_content.writelines([']\n'])
-        return ToolsetActionResult(rebuilt=True, artifacts=None)
+        return argv
@@ -0,0 +1,313 @@
+import binascii
+import json
+import os
+import os.path
+import re
+import shutil
+import sys
+import tempfile
+import threading
+
+from .build_state import eval_data_digest
+from .error_utils import BuildSystemException
+from .os_utils import mkdir_safe
+
+
+OBJECT_CACHE_DEFAULT_MAX_SIZE = 5 * 1024 * 1024 * 1024
+_OBJECT_CACHE_FORMAT = 'minibuild-object-cache-2'
+_OBJECT_CACHE_STATS_FILE = 'stats.json'
+_OBJECT_CACHE_MANIFEST_ENTRIES_MAX = 16
+_OBJECT_CACHE_EVICT_RATIO = 0.9
+_OBJECT_CACHE_STATS_KEYS = ['hits', 'misses', 'stores', 'evictions', 'size']
+_RE_SIZE_VALUE = re.compile(r'^\s*([0-9]+(?:\.[0-9]*)?)\s*([KMGT]?)I?B?\s*$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def parse_size_value(text):
+    m = _RE_SIZE_VALUE.match(text)
+    if not m:
+        raise BuildSystemException("Can't parse size value: '{}', expected number with optional K, M, G or T suffix.".format(text))
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2).upper()])
+
+
+def _hexlify(digest):
+    return binascii.hexlify(digest).decode('ascii')
+
+
+def _replace_file(tmp_path, path):
+    if hasattr(os, 'replace'):
+        os.replace(tmp_path, path)
+        return
+    if sys.platform == 'win32' and os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+
+
+def write_file_atomic(path, data, executable=False):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as fh:
+        fh.write(data)
+    os.chmod(tmp_path, (0o777 if executable else 0o666) & ~_UMASK)
+    _replace_file(tmp_path, path)
+
+
+def copy_file_atomic(src_path, path, executable=False):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as fh_dst:
+        with open(src_path, 'rb') as fh_src:
+            shutil.copyfileobj(fh_src, fh_dst)
+    os.chmod(tmp_path, (0o777 if executable else 0o666) & ~_UMASK)
+    _replace_file(tmp_path, path)
+
+
+def _load_json_optional(path):
+    try:
+        with open(path, 'rt') as fh:
+            return json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class ObjectCacheStats:
+    def __init__(self, hits=0, misses=0, stores=0, evictions=0, size=0):
+        self.hits = hits
+        self.misses = misses
+        self.stores = stores
+        self.evictions = evictions
+        self.size = size
+
+    def to_dict(self):
+        return { key: getattr(self, key) for key in _OBJECT_CACHE_STATS_KEYS }
+
+
+def load_object_cache_stats(cache_dir):
+    stats_data = _load_json_optional(os.path.join(cache_dir, _OBJECT_CACHE_STATS_FILE)) or {}
+    return ObjectCacheStats(**{ key: stats_data.get(key, 0) for key in _OBJECT_CACHE_STATS_KEYS })
+
+
+class LocalCacheStorage:
+    title = 'object cache'
+    writable = True
+    error_text = None
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._manifests_dir = os.path.join(cache_dir, 'manifests')
+        self._blobs_dir = os.path.join(cache_dir, 'objects')
+        self._stats_file = os.path.join(cache_dir, _OBJECT_CACHE_STATS_FILE)
+
+    def _manifest_path(self, key):
+        return os.path.join(self._manifests_dir, key[:2], key + '.json')
+
+    def _blob_path(self, digest):
+        return os.path.join(self._blobs_dir, digest[:2], digest)
+
+    def prefetch(self, keys):
+        pass
+
+    def load_manifest(self, key):
+        manifest_path = self._manifest_path(key)
+        manifest = _load_json_optional(manifest_path)
+        if manifest:
+            try:
+                os.utime(manifest_path, None)
+            except OSError:
+                pass
+        return manifest
+
+    def save_manifest(self, key, manifest_text):
+        manifest_path = self._manifest_path(key)
+        mkdir_safe(os.path.dirname(manifest_path))
+        write_file_atomic(manifest_path, manifest_text.encode('utf-8'))
+        return len(manifest_text)
+
+    def fetch_blob(self, digest, path, executable):
+        blob_path = self._blob_path(digest)
+        if not os.path.isfile(blob_path):
+            return False
+        copy_file_atomic(blob_path, path, executable)
+        try:
+            os.utime(blob_path, None)
+        except OSError:
+            pass
+        return True
+
+    def store_blobs(self, blobs):
+        stored_size = 0
+        for digest, path in blobs:
+            blob_path = self._blob_path(digest)
+            if os.path.isfile(blob_path):
+                continue
+            mkdir_safe(os.path.dirname(blob_path))
+            copy_file_atomic(path, blob_path)
+            stored_size += os.path.getsize(blob_path)
+        return stored_size
+
+    def finish(self, run_stats, stored_size):
+        if not run_stats.hits and not run_stats.misses and not run_stats.stores:
+            return
+        mkdir_safe(self.cache_dir)
+        stats = load_object_cache_stats(self.cache_dir)
+        stats.hits += run_stats.hits
+        stats.misses += run_stats.misses
+        stats.stores += run_stats.stores
+        stats.size += stored_size
+        if stats.size > self.max_size:
+            stats.size, evictions = self._evict()
+            stats.evictions += evictions
+            run_stats.evictions = evictions
+        write_file_atomic(self._stats_file, json.dumps(stats.to_dict(), sort_keys=True).encode('utf-8'))
+
+    def _evict(self):
+        cache_files = []
+        total_size = 0
+        for top_dir in [self._manifests_dir, self._blobs_dir]:
+            for dirpath, _, filenames in os.walk(top_dir):
+                for fname in filenames:
+                    fpath = os.path.join(dirpath, fname)
+                    try:
+                        st = os.stat(fpath)
+                    except OSError:
+                        continue
+                    cache_files.append((st.st_mtime, st.st_size, fpath))
+                    total_size += st.st_size
+        cache_files.sort()
+        evictions = 0
+        size_limit = int(self.max_size * _OBJECT_CACHE_EVICT_RATIO)
+        for _, fsize, fpath in cache_files:
+            if total_size <= size_limit:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                continue
+            total_size -= fsize
+            evictions += 1
+        return total_size, evictions
+
+
+class ObjectCache:
+    def __init__(self, project_root, project_output, storages):
+        self.project_root = project_root
+        self.storages = storages
+        self._path_prefixes = [
+            (os.path.normpath(project_output), '@OUTPUT@'),
+            (os.path.normpath(project_root), '@ROOT@'),
+        ]
+        self._guard = threading.Lock()
+        self._run_stats = [ ObjectCacheStats() for _ in storages ]
+        self._stored_sizes = [ 0 for _ in storages ]
+
+    def _normalize_arg(self, arg):
+        for prefix, replacement in self._path_prefixes:
+            arg = arg.replace(prefix, replacement)
+        return arg.replace('\\', '/')
+
+    def _count(self, storage_index, attr, size=0):
+        with self._guard:
+            run_stats = self._run_stats[storage_index]
+            setattr(run_stats, attr, getattr(run_stats, attr) + 1)
+            self._stored_sizes[storage_index] += size
+
+    def _eval_file_digest(self, ctx, path):
+        file_status = ctx.stat_cache.status(path)
+        if file_status is None or not file_status.is_file:
+            return None
+        return _hexlify(ctx.build_state.get_file_digest(path, file_status))
+
+    def eval_key(self, ctx, toolchain_id, argv, inputs, description_digest=None, normalize_paths=True):
+        inputs_digests = []
+        for input_path in inputs:
+            input_digest = self._eval_file_digest(ctx, input_path)
+            if input_digest is None:
+                return None
+            inputs_digests.append(input_digest)
+        if normalize_paths:
+            argv = [ self._normalize_arg(arg) for arg in argv ]
+        key_data = [_OBJECT_CACHE_FORMAT, toolchain_id, argv, inputs_digests]
+        if description_digest is not None:
+            key_data.append(_hexlify(description_digest))
+        return _hexlify(eval_data_digest(key_data))
+
+    def prefetch(self, keys):
+        for storage in self.storages:
+            storage.prefetch(keys)
+
+    def fetch(self, ctx, key, output_paths):
+        for storage_index, storage in enumerate(self.storages):
+            entry = self._fetch_entry(ctx, storage, key, output_paths)
+            if entry is None:
+                self._count(storage_index, 'misses')
+                continue
+            self._count(storage_index, 'hits')
+            for prev_index in range(storage_index):
+                self._store_entry(prev_index, key, entry, output_paths)
+            return entry['depends']
+        return None
+
+    def _fetch_entry(self, ctx, storage, key, output_paths):
+        manifest = storage.load_manifest(key)
+        if not manifest:
+            return None
+        for entry in manifest:
+            if len(entry['outputs']) != len(output_paths):
+                continue
+            if not self._is_manifest_entry_matched(ctx, entry):
+                continue
+            fetched = True
+            for output_digest, output_path, executable in zip(entry['outputs'], output_paths, entry['executable']):
+                if not storage.fetch_blob(output_digest, output_path, executable):
+                    fetched = False
+                    break
+            if fetched:
+                return entry
+        return None
+
+    def _is_manifest_entry_matched(self, ctx, entry):
+        for dep_item, dep_digest in zip(entry['depends'], entry['digests']):
+            if self._eval_file_digest(ctx, os.path.join(self.project_root, dep_item)) != dep_digest:
+                return False
+        return True
+
+    def store(self, ctx, key, output_paths, depends):
+        digests = []
+        for dep_item in depends:
+            dep_digest = self._eval_file_digest(ctx, os.path.join(self.project_root, dep_item))
+            if dep_digest is None:
+                return
+            digests.append(dep_digest)
+        outputs = []
+        for output_path in output_paths:
+            output_digest = self._eval_file_digest(ctx, output_path)
+            if output_digest is None:
+                return
+            outputs.append(output_digest)
+        executable = [ os.access(output_path, os.X_OK) for output_path in output_paths ]
+        entry = {'depends': list(depends), 'digests': digests, 'outputs': outputs, 'executable': executable}
+        for storage_index in range(len(self.storages)):
+            self._store_entry(storage_index, key, entry, output_paths)
+
+    def _store_entry(self, storage_index, key, entry, output_paths):
+        storage = self.storages[storage_index]
+        if not storage.writable:
+            return
+        stored_size = storage.store_blobs(list(zip(entry['outputs'], output_paths)))
+        manifest = storage.load_manifest(key) or []
+        manifest = [entry] + [ x for x in manifest if x.get('depends') != entry['depends'] or x.get('digests') != entry['digests'] ]
+        stored_size += storage.save_manifest(key, json.dumps(manifest[:_OBJECT_CACHE_MANIFEST_ENTRIES_MAX], sort_keys=True))
+        if storage.error_text is not None:
+            return
+        self._count(storage_index, 'stores', stored_size)
+
+    def finish(self):
+        result = []
+        for storage_index, storage in enumerate(self.storages):
+            run_stats = self._run_stats[storage_index]
+            storage.finish(run_stats, self._stored_sizes[storage_index])
+            result.append((storage, run_stats))
+            self._run_stats[storage_index] = ObjectCacheStats()
+            self._stored_sizes[storage_index] = 0
+        return result
@@ -36,6 +36,7 @@ def cleanup_dir(dir_name):
 def touch_file(fname):
     with open(fname, 'ab'):
         pass
+    os.utime(fname, None)
 
 
 def normalize_path_optional(path, not_abs_dir_prefix):
@@ -0,0 +1,133 @@
+import json
+import socket
+import threading
+
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError, URLError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError, URLError
+
+from .constants import TAG_REMOTE_CACHE_MODE_READ_WRITE
+from .object_cache import write_file_atomic
+
+
+REMOTE_CACHE_DEFAULT_TIMEOUT = 5.0
+_REMOTE_CACHE_QUERY_BATCH_SIZE = 512
+
+
+class _RemoteCacheRequest(Request):
+    def __init__(self, url, method, data=None, headers=None):
+        Request.__init__(self, url, data=data, headers=headers if headers else {})
+        self._request_method = method
+
+    def get_method(self):
+        return self._request_method
+
+
+class RemoteCacheStorage:
+    title = 'remote cache'
+
+    def __init__(self, url, mode, timeout=REMOTE_CACHE_DEFAULT_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.writable = mode == TAG_REMOTE_CACHE_MODE_READ_WRITE
+        self.timeout = timeout
+        self.error_text = None
+        self._guard = threading.Lock()
+        self._queried_keys = set()
+        self._present_keys = set()
+
+    def _request(self, method, path, data=None, content_type=None):
+        if self.error_text is not None:
+            return None
+        headers = {}
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+        request = _RemoteCacheRequest('{}/{}'.format(self.url, path), method, data=data, headers=headers)
+        try:
+            response = urlopen(request, timeout=self.timeout)
+            try:
+                return response.read()
+            finally:
+                response.close()
+        except HTTPError as exc:
+            if exc.code == 404:
+                return None
+            self._disable('{} /{}: HTTP {}'.format(method, path, exc.code))
+        except (URLError, socket.error, socket.timeout, IOError) as exc:
+            self._disable('{} /{}: {}'.format(method, path, exc))
+        return None
+
+    def _disable(self, error_text):
+        with self._guard:
+            if self.error_text is None:
+                self.error_text = error_text
+
+    def _query_existing(self, path, names):
+        existing = set()
+        for offset in range(0, len(names), _REMOTE_CACHE_QUERY_BATCH_SIZE):
+            batch = names[offset:offset + _REMOTE_CACHE_QUERY_BATCH_SIZE]
+            response = self._request('POST', path, json.dumps(batch).encode('utf-8'), 'application/json')
+            if response is None:
+                return None
+            try:
+                existing.update(json.loads(response.decode('utf-8')))
+            except ValueError:
+                self._disable('POST /{}: malformed response'.format(path))
+                return None
+        return existing
+
+    def prefetch(self, keys):
+        keys = sorted(set(keys) - self._queried_keys)
+        if not keys:
+            return
+        present_keys = self._query_existing('ac/exists', keys)
+        if present_keys is None:
+            return
+        with self._guard:
+            self._queried_keys.update(keys)
+            self._present_keys.update(present_keys)
+
+    def load_manifest(self, key):
+        with self._guard:
+            if key in self._queried_keys and key not in self._present_keys:
+                return None
+        response = self._request('GET', 'ac/' + key)
+        if response is None:
+            return None
+        try:
+            return json.loads(response.decode('utf-8'))
+        except ValueError:
+            return None
+
+    def save_manifest(self, key, manifest_text):
+        manifest_data = manifest_text.encode('utf-8')
+        self._request('PUT', 'ac/' + key, manifest_data, 'application/json')
+        with self._guard:
+            self._present_keys.add(key)
+        return len(manifest_data)
+
+    def fetch_blob(self, digest, path, executable):
+        response = self._request('GET', 'cas/' + digest)
+        if response is None:
+            return False
+        write_file_atomic(path, response, executable)
+        return True
+
+    def store_blobs(self, blobs):
+        present_digests = self._query_existing('cas/exists', sorted(set([ digest for digest, _ in blobs ])))
+        if present_digests is None:
+            return 0
+        stored_size = 0
+        for digest, path in blobs:
+            if digest in present_digests:
+                continue
+            with open(path, 'rb') as fh:
+                blob_data = fh.read()
+            self._request('PUT', 'cas/' + digest, blob_data, 'application/octet-stream')
+            present_digests.add(digest)
+            stored_size += len(blob_data)
+        return stored_size
+
+    def finish(self, run_stats, stored_size):
+        pass
@@ -9,15 +9,21 @@ import shlex
 import subprocess
 import sys
 
+from .build_daemon import BuildDaemonServer, eval_daemon_socket_path, run_daemon_client, stop_daemon
 from .build_description import BuildDescriptionLoader
-from .build_workflow import BuildWorkflow
+from .build_state import BuildState
+from .build_watch import WATCH_DEBOUNCE_DEFAULT, run_watch_loop
+from .build_workflow import BuildExtensionsRegistry, BuildWorkflow
 from .config_ini import *
 from .constants import *
 from .error_utils import BuildSystemException, BuildSystemSysExit, buildsys_error_to_string
 from .faccess_emerge import perform_faccess_emerge
 from .gen_bconf import generate_build_config
+from .object_cache import LocalCacheStorage, ObjectCache, load_object_cache_stats, parse_size_value
+from .remote_cache import REMOTE_CACHE_DEFAULT_TIMEOUT, RemoteCacheStorage
 from .os_utils import *
 from .pragma_tokens import load_buildconf_pragmas, makefile_is_project_landmark
+from .stat_cache import MTIME_TOLERANCE_DEFAULT_NS, query_file_status
 from .__version__ import __version__
 
 
@@ -31,6 +37,8 @@ SUPPORTED_PLATFORMS_PROBE = [
     (is_windows_32bit,      TAG_PLATFORM_WINDOWS,       TAG_ARCH_X86),
 ]
 
+_SETUP_VOLATILE_ENVIRON = frozenset(['PWD', 'OLDPWD', 'SHLVL', '_', 'MINIBUILD_DAEMON'])
+
 
 def parse_landmark_details(value, config_proto, pragma_line):
     landmark_options = {}
@@ -294,153 +302,269 @@ def guess_parallelism():
     return processors_count + 2
 
 
-def create_build_workflow(frozen, build_directory, verbose, argv):
-    buildsys_error = None
-    sysinfo = None
-    toolset_choices = []
-    model_aliases = {}
-    try:
-        current_platform = platform.system()
-        if not current_platform:
-            current_platform = sys.platform
+def probe_host_platform():
+    current_platform = platform.system()
+    if not current_platform:
+        current_platform = sys.platform
 
-        for os_probe, sys_platform, sys_arch in SUPPORTED_PLATFORMS_PROBE:
-            if os_probe():
-                break
-        else:
-            raise BuildSystemException("Current platform '{}' is not supported.".format(current_platform))
+    for os_probe, sys_platform, sys_arch in SUPPORTED_PLATFORMS_PROBE:
+        if os_probe():
+            break
+    else:
+        raise BuildSystemException("Current platform '{}' is not supported.".format(current_platform))
 
-        is_wsl = False
-        if sys_platform == TAG_PLATFORM_LINUX:
-            if os.access('/proc/version', os.R_OK):
-                with open('/proc/version', 'rt') as fp:
-                    proc_version = fp.read()
-                if 'Microsoft' in proc_version:
-                    is_wsl = True
+    is_wsl = False
+    if sys_platform == TAG_PLATFORM_LINUX:
+        if os.access('/proc/version', os.R_OK):
+            with open('/proc/version', 'rt') as fp:
+                proc_version = fp.read()
+            if 'Microsoft' in proc_version:
+                is_wsl = True
 
-        project_root, conf_mk, conf_options = resolve_project_landmark(build_directory, verbose)
+    return sys_platform, sys_arch, is_wsl
 
-        if verbose:
-            if is_wsl:
-                print("BUILDSYS: Landmark: project-root: '{}', on WSL/{} {}".format(project_root, sys_platform, sys_arch))
-            else:
-                print("BUILDSYS: Landmark: project-root: '{}', on {} {}".format(project_root, sys_platform, sys_arch))
 
-        pragma_token_output_dir = TAG_PRAGMA_BUILD_DIR_OUTPUT
+def resolve_project_output(project_root, conf_mk, conf_options, is_wsl):
+    pragma_token_output_dir = TAG_PRAGMA_BUILD_DIR_OUTPUT
+    if is_wsl:
+        if conf_options and TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL in conf_options and conf_options[TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL]:
+            pragma_token_output_dir = TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL
+
+    if conf_options and pragma_token_output_dir in conf_options and conf_options[pragma_token_output_dir]:
+        custom_output_dname = conf_options[pragma_token_output_dir]
+        if custom_output_dname.startswith('@'):
+            custom_output_dname = custom_output_dname.replace('@', project_root, 1)
+
+        output_dname = normalize_path_optional(custom_output_dname, os.path.dirname(conf_mk))
+    else:
+        output_dname = os.path.join(project_root, BUILD_CONFIG_DEFAULT_OUTPUT_DIR)
+
+    return output_dname
+
+
+def eval_setup_environ():
+    return { key: value for key, value in os.environ.items() if key not in _SETUP_VOLATILE_ENVIRON }
+
+
+def eval_watched_file_status(path):
+    file_status = query_file_status(path)
+    if file_status is None:
+        return None
+    return (file_status.mtime_ns, file_status.size, file_status.inode)
+
+
+class ProjectSetup:
+    def __init__(self, sys_platform, sys_arch, project_root, conf_mk, config_file, sysinfo, config, model_aliases, subst_info, toolset_models_mapping, toolset_choices):
+        self.sys_platform = sys_platform
+        self.sys_arch = sys_arch
+        self.project_root = project_root
+        self.conf_mk = conf_mk
+        self.config_file = config_file
+        self.sysinfo = sysinfo
+        self.config = config
+        self.model_aliases = model_aliases
+        self.subst_info = subst_info
+        self.toolset_models_mapping = toolset_models_mapping
+        self.toolset_choices = toolset_choices
+        self.extensions = BuildExtensionsRegistry()
+        self.build_state = BuildState(os.path.join(sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT], BUILD_CONFIG_DEFAULT_BUILD_STATE_FILE), sysinfo[TAG_CFG_DIR_PROJECT_ROOT])
+        self.environ = eval_setup_environ()
+        self._watched_status = self._eval_watched_status()
+        self._descriptions_status = {}
+
+    def _eval_watched_status(self):
+        return [ (path, eval_watched_file_status(path)) for path in [self.conf_mk, self.config_file] if path ]
+
+    def _list_description_loaders(self):
+        loaders = []
+        for _, desc_loader in self.toolset_models_mapping.values():
+            if desc_loader not in loaders:
+                loaders.append(desc_loader)
+        return loaders
+
+    def is_up_to_date(self):
+        return self.environ == eval_setup_environ() and self._watched_status == self._eval_watched_status()
+
+    def snapshot_descriptions(self):
+        for desc_loader in self._list_description_loaders():
+            for path in desc_loader.list_loaded_files():
+                if path not in self._descriptions_status:
+                    self._descriptions_status[path] = eval_watched_file_status(path)
+
+    def drop_stale_descriptions(self, verbose):
+        for path in sorted(self._descriptions_status):
+            if eval_watched_file_status(path) == self._descriptions_status[path]:
+                continue
+            if verbose:
+                print("BUILDSYS: makefile changed, reload all: '{}'".format(path))
+            for desc_loader in self._list_description_loaders():
+                desc_loader.reset()
+            self.extensions = BuildExtensionsRegistry()
+            self._descriptions_status = {}
+            break
+
+
+def load_project_setup(frozen, build_directory, verbose):
+    sys_platform, sys_arch, is_wsl = probe_host_platform()
+    project_root, conf_mk, conf_options = resolve_project_landmark(build_directory, verbose)
+
+    if verbose:
         if is_wsl:
-            if conf_options and TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL in conf_options and conf_options[TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL]:
-                pragma_token_output_dir = TAG_PRAGMA_BUILD_DIR_OUTPUT_WSL
+            print("BUILDSYS: Landmark: project-root: '{}', on WSL/{} {}".format(project_root, sys_platform, sys_arch))
+        else:
+            print("BUILDSYS: Landmark: project-root: '{}', on {} {}".format(project_root, sys_platform, sys_arch))
 
-        if conf_options and pragma_token_output_dir in conf_options and conf_options[pragma_token_output_dir]:
-            custom_output_dname = conf_options[pragma_token_output_dir]
-            if custom_output_dname.startswith('@'):
-                custom_output_dname = custom_output_dname.replace('@', project_root, 1)
+    output_dname = resolve_project_output(project_root, conf_mk, conf_options, is_wsl)
 
-            output_dname = normalize_path_optional(custom_output_dname, os.path.dirname(conf_mk))
+    if verbose:
+        print("BUILDSYS: Landmark: output directory: '{}'".format(output_dname))
+
+    bootstrap_dir  = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_BOOTSTRAP_DIR))
+    obj_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_OBJ_DIR))
+    exe_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_EXE_DIR))
+    ext_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_EXT_DIR))
+    static_lib_dir = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_LIB_DIR))
+    shared_lib_dir = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_SHARED_DIR))
+    public_dir     = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_PUBLIC_DIR))
+    faccess_dir    = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_FACCESS_DIR))
+
+    sysinfo = {
+        TAG_CFG_FROZEN: frozen,
+        TAG_CFG_DIR_PROJECT_ROOT: project_root,
+        TAG_CFG_DIR_PROJECT_OUTPUT: output_dname,
+        TAG_CFG_PROJECT_ROOT_COMMON_PREFIX: os.path.normcase(project_root) + os.path.sep,
+        TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX : os.path.normcase(output_dname) + os.path.sep,
+        TAG_CFG_DIR_BOOTSTRAP: bootstrap_dir,
+        TAG_CFG_DIR_OBJ: obj_dir,
+        TAG_CFG_DIR_EXE: exe_dir,
+        TAG_CFG_DIR_EXT: ext_dir,
+        TAG_CFG_DIR_LIB: static_lib_dir,
+        TAG_CFG_DIR_SHARED: shared_lib_dir,
+        TAG_CFG_DIR_PUBLIC: public_dir,
+        TAG_CFG_DIR_FACCESS: faccess_dir,
+        TAG_CFG_OBJ_SUFFIX : '.obj',
+        TAG_CFG_PDB_SUFFIX : '.pdb',
+        TAG_CFG_DEP_SUFFIX : '.dep',
+        TAG_CFG_REPRODUCIBLE : False,
+        TAG_CFG_LTO : False,
+        TAG_CFG_SPLIT_DWARF : False,
+        TAG_CFG_COMPRESS_DEBUG_SECTIONS : False,
+    }
+
+    if conf_mk:
+        config_file = os.path.normpath(os.path.join(bootstrap_dir, '{}-{}'.format(sys_platform, BUILD_SYSTEM_CONFIG_FILE)))
+        mkdir_safe(bootstrap_dir)
+        generate_build_config(conf_mk, config_file, sys_platform, sys_arch, verbose)
+    else:
+        config_file = os.path.normpath(os.path.join(project_root, BUILD_SYSTEM_CONFIG_FILE))
+    if not os.path.isfile(config_file):
+        raise BuildSystemException("Project config file is not found by path: '{}'.".format(config_file))
+
+    sysinfo[TAG_CFG_PROJECT_CONFIG_FILE] = config_file
+    config = load_ini_config(path=config_file)
+    model_aliases = read_model_aliases(config)
+
+    platform_cfg_option = 'toolset-{}'.format(sys_platform)
+    toolset_sections_names = get_ini_conf_strings_optional(config, TAG_INI_CONF_MAIN, platform_cfg_option)
+    if not toolset_sections_names:
+        raise BuildSystemException("Malformed project config file: got empty value at '{}/{}'.".format(TAG_INI_CONF_MAIN, platform_cfg_option))
+
+    toolset_init_requests = []
+    for toolset_section in toolset_sections_names:
+        toolset_module_title = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_MODULE)
+        if toolset_module_title is None:
+            raise BuildSystemException("Malformed project config file: option not found at '{}/{}'.".format(toolset_section, TAG_INI_TOOLSET_MODULE))
+        if not toolset_module_title:
+            raise BuildSystemException("Malformed project config file: got empty value at '{}/{}'.".format(toolset_section, TAG_INI_TOOLSET_MODULE))
+        toolset_serialized_config = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_CONFIG)
+        if toolset_serialized_config:
+            ast = compile(toolset_serialized_config, '<toolset-config>', 'eval')
+            toolset_init_args = eval(ast, {"__builtins__": None}, {})
         else:
-            output_dname = os.path.join(project_root, BUILD_CONFIG_DEFAULT_OUTPUT_DIR)
+            toolset_init_args = {}
+        toolset_serialized_custom_models = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_MODELS)
+        if toolset_serialized_custom_models:
+            ast = compile(toolset_serialized_custom_models, '<toolset-models>', 'eval')
+            toolset_custom_models = eval(ast, {"__builtins__": None}, {})
+        else:
+            toolset_custom_models = None
 
-        if verbose:
-            print("BUILDSYS: Landmark: output directory: '{}'".format(output_dname))
-
-        bootstrap_dir  = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_BOOTSTRAP_DIR))
-        obj_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_OBJ_DIR))
-        exe_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_EXE_DIR))
-        ext_dir        = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_EXT_DIR))
-        static_lib_dir = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_LIB_DIR))
-        shared_lib_dir = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_SHARED_DIR))
-        public_dir     = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_PUBLIC_DIR))
-        faccess_dir    = os.path.normpath(os.path.join(output_dname, BUILD_CONFIG_DEFAULT_FACCESS_DIR))
-
-        sysinfo = {
-            TAG_CFG_FROZEN: frozen,
-            TAG_CFG_DIR_PROJECT_ROOT: project_root,
-            TAG_CFG_DIR_PROJECT_OUTPUT: output_dname,
-            TAG_CFG_PROJECT_ROOT_COMMON_PREFIX: os.path.normcase(project_root) + os.path.sep,
-            TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX : os.path.normcase(output_dname) + os.path.sep,
-            TAG_CFG_DIR_BOOTSTRAP: bootstrap_dir,
-            TAG_CFG_DIR_OBJ: obj_dir,
-            TAG_CFG_DIR_EXE: exe_dir,
-            TAG_CFG_DIR_EXT: ext_dir,
-            TAG_CFG_DIR_LIB: static_lib_dir,
-            TAG_CFG_DIR_SHARED: shared_lib_dir,
-            TAG_CFG_DIR_PUBLIC: public_dir,
-            TAG_CFG_DIR_FACCESS: faccess_dir,
-            TAG_CFG_OBJ_SUFFIX : '.obj',
-            TAG_CFG_PDB_SUFFIX : '.pdb',
-            TAG_CFG_DEP_SUFFIX : '.dep',
-        }
-
-        if conf_mk:
-            config_file = os.path.normpath(os.path.join(bootstrap_dir, '{}-{}'.format(sys_platform, BUILD_SYSTEM_CONFIG_FILE)))
-            mkdir_safe(bootstrap_dir)
-            generate_build_config(conf_mk, config_file, sys_platform, sys_arch, verbose)
+        toolset_init_requests += [ (toolset_module_title, toolset_custom_models, toolset_init_args) ]
+
+    subst_info = {
+        TAG_SUBST_PROJECT_ROOT: project_root,
+        TAG_SUBST_PROJECT_OUTPUT: output_dname,
+    }
+
+    toolset_models_mapping = {}
+    toolset_choices = []
+    imported_toolset_modules = {}
+    for toolset_module_title, toolset_custom_models, toolset_init_args in toolset_init_requests:
+        mod_toolset = imported_toolset_modules.get(toolset_module_title)
+        if mod_toolset is None:
+            try:
+                toolset_module_name = '{}.toolset_{}'.format(__package__, toolset_module_title)
+                mod_toolset = importlib.import_module(toolset_module_name)
+                imported_toolset_modules[toolset_module_title] = mod_toolset
+            except ImportError:
+                raise BuildSystemException("Malformed project config file: got unknown toolset module: '{}'.".format(toolset_module_title))
+
+        desc_loader = BuildDescriptionLoader(sys_platform, sys_arch)
+        toolset = mod_toolset.create_toolset(sysinfo, desc_loader, sys_platform, sys_arch, toolset_custom_models, **toolset_init_args)
+        desc_loader.set_toolset_name(toolset.toolset_name)
+        desc_loader.set_target_platform(toolset.platform_name)
+        desc_loader.set_substitutions(subst_info)
+
+        toolset_models = toolset.supported_models
+        for model_name in toolset_models:
+            if model_name in toolset_models_mapping:
+                raise BuildSystemException("Malformed project config file: got clash of model names for '{}'.".format(model_name))
+            model = toolset_models[model_name]
+            toolset_models_mapping[model_name] = (toolset, desc_loader)
+            toolset_choices.append(model_name)
+
+    return ProjectSetup(sys_platform, sys_arch, project_root, conf_mk, config_file, sysinfo, config, model_aliases, subst_info, toolset_models_mapping, toolset_choices)
+
+
+class ProjectSetupCache:
+    def __init__(self, frozen):
+        self.frozen = frozen
+        self._setups = {}
+
+    def __call__(self, build_directory, verbose):
+        project_root, conf_mk, _ = resolve_project_landmark(build_directory, False)
+        setup_key = (project_root, conf_mk)
+        project_setup = self._setups.get(setup_key)
+        if project_setup is not None and not project_setup.is_up_to_date():
+            if verbose:
+                print("BUILDSYS: project config or environment changed, reload all: '{}'".format(project_root))
+            project_setup = None
+        if project_setup is None:
+            project_setup = load_project_setup(self.frozen, build_directory, verbose)
+            self._setups[setup_key] = project_setup
         else:
-            config_file = os.path.normpath(os.path.join(project_root, BUILD_SYSTEM_CONFIG_FILE))
-        if not os.path.isfile(config_file):
-            raise BuildSystemException("Project config file is not found by path: '{}'.".format(config_file))
-
-        config = load_ini_config(path=config_file)
-        model_aliases = read_model_aliases(config)
-
-        platform_cfg_option = 'toolset-{}'.format(sys_platform)
-        toolset_sections_names = get_ini_conf_strings_optional(config, TAG_INI_CONF_MAIN, platform_cfg_option)
-        if not toolset_sections_names:
-            raise BuildSystemException("Malformed project config file: got empty value at '{}/{}'.".format(TAG_INI_CONF_MAIN, platform_cfg_option))
-
-        toolset_init_requests = []
-        for toolset_section in toolset_sections_names:
-            toolset_module_title = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_MODULE)
-            if toolset_module_title is None:
-                raise BuildSystemException("Malformed project config file: option not found at '{}/{}'.".format(toolset_section, TAG_INI_TOOLSET_MODULE))
-            if not toolset_module_title:
-                raise BuildSystemException("Malformed project config file: got empty value at '{}/{}'.".format(toolset_section, TAG_INI_TOOLSET_MODULE))
-            toolset_serialized_config = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_CONFIG)
-            if toolset_serialized_config:
-                ast = compile(toolset_serialized_config, '<toolset-config>', 'eval')
-                toolset_init_args = eval(ast, {"__builtins__": None}, {})
-            else:
-                toolset_init_args = {}
-            toolset_serialized_custom_models = get_ini_conf_string0(config, toolset_section, TAG_INI_TOOLSET_MODELS)
-            if toolset_serialized_custom_models:
-                ast = compile(toolset_serialized_custom_models, '<toolset-models>', 'eval')
-                toolset_custom_models = eval(ast, {"__builtins__": None}, {})
-            else:
-                toolset_custom_models = None
-
-            toolset_init_requests += [ (toolset_module_title, toolset_custom_models, toolset_init_args) ]
-
-        subst_info = {
-            TAG_SUBST_PROJECT_ROOT: project_root,
-            TAG_SUBST_PROJECT_OUTPUT: output_dname,
-        }
-
-        toolset_models_mapping = {}
-        imported_toolset_modules = {}
-        for toolset_module_title, toolset_custom_models, toolset_init_args in toolset_init_requests:
-            mod_toolset = imported_toolset_modules.get(toolset_module_title)
-            if mod_toolset is None:
-                try:
-                    toolset_module_name = '{}.toolset_{}'.format(__package__, toolset_module_title)
-                    mod_toolset = importlib.import_module(toolset_module_name)
-                    imported_toolset_modules[toolset_module_title] = mod_toolset
-                except ImportError:
-                    raise BuildSystemException("Malformed project config file: got unknown toolset module: '{}'.".format(toolset_module_title))
-
-            desc_loader = BuildDescriptionLoader(sys_platform, sys_arch)
-            toolset = mod_toolset.create_toolset(sysinfo, desc_loader, sys_platform, sys_arch, toolset_custom_models, **toolset_init_args)
-            desc_loader.set_toolset_name(toolset.toolset_name)
-            desc_loader.set_target_platform(toolset.platform_name)
-            desc_loader.set_substitutions(subst_info)
-
-            toolset_models = toolset.supported_models
-            for model_name in toolset_models:
-                if model_name in toolset_models_mapping:
-                    raise BuildSystemException("Malformed project config file: got clash of model names for '{}'.".format(model_name))
-                model = toolset_models[model_name]
-                toolset_models_mapping[model_name] = (toolset, desc_loader)
-                toolset_choices.append(model_name)
+            project_setup.drop_stale_descriptions(verbose)
+        return project_setup
+
+    def snapshot_descriptions(self):
+        for project_setup in self._setups.values():
+            project_setup.snapshot_descriptions()
+
 
+def create_build_workflow(frozen, build_directory, verbose, argv, setup_provider=None):
+    buildsys_error = None
+    project_setup = None
+    sysinfo = None
+    toolset_choices = []
+    model_aliases = {}
+    try:
+        if setup_provider is None:
+            project_setup = load_project_setup(frozen, build_directory, verbose)
+        else:
+            project_setup = setup_provider(build_directory, verbose)
+        sysinfo = project_setup.sysinfo
+        toolset_choices = project_setup.toolset_choices
+        model_aliases = project_setup.model_aliases
     except BuildSystemException as ex:
         buildsys_error = ex
 
@@ -470,11 +594,53 @@ def create_build_workflow(frozen, build_directory, verbose, argv):
         help="public format, default is 'auto', i.e. 'zip' when target is built for Windows and 'tgz' otherwise")
     parser.add_argument('--public-layout', nargs='?', choices=['default', TAG_PUBLIC_LAYAOUT_FLAT], default='default',
         help="public layout, 'flat' means to avoid any subdirectories creation when publishing")
+    parser.add_argument('--mtime-tolerance', nargs='?', default=MTIME_TOLERANCE_DEFAULT_NS / 1000000.0, metavar='MS', type=float,
+        help='R|ignore modification times newer than target by\nless than MS milliseconds, default={}'.format(MTIME_TOLERANCE_DEFAULT_NS / 1000000.0))
+    parser.add_argument('--check',     nargs='?', choices=TAG_CHECK_MODE_ALL[:], default=TAG_CHECK_MODE_MTIME,
+        help="R|how to detect changed prerequisites, default={}\n'{}' also skips rebuild when only mtime moved\nbut content digest is unchanged".format(TAG_CHECK_MODE_MTIME, TAG_CHECK_MODE_HASH))
+    parser.add_argument('--cache-dir', nargs='?', metavar='dirname',
+        help='R|directory of object cache shared between builds,\ndefault is taken from MINIBUILD_CACHE_DIR, if set')
+    parser.add_argument('--cache-max-size', nargs='?', metavar='SIZE', default='5G',
+        help='R|size limit of object cache, least recently used\nentries are evicted above it, default=5G')
+    parser.add_argument('--cache-stats', action='store_true', help='print object cache statistics and exit')
+    parser.add_argument('--remote-cache', nargs='?', metavar='URL',
+        help='R|URL of remote build cache server, default is taken\nfrom MINIBUILD_REMOTE_CACHE, if set')
+    parser.add_argument('--remote-cache-mode', choices=TAG_REMOTE_CACHE_MODE_ALL, default=TAG_REMOTE_CACHE_MODE_READ_ONLY,
+        help='R|remote cache usage, results of local builds are\nuploaded in read-write mode, default={}'.format(TAG_REMOTE_CACHE_MODE_READ_ONLY))
+    parser.add_argument('--remote-cache-timeout', type=float, metavar='SEC', default=REMOTE_CACHE_DEFAULT_TIMEOUT,
+        help='R|timeout of remote cache requests, build falls back\nto local toolchain on expiry, default={}'.format(REMOTE_CACHE_DEFAULT_TIMEOUT))
+    parser.add_argument('--batch-compile', type=int, metavar='N', default=0,
+        help='R|compile up to N small C/C++ sources of a module\nin one compiler driver invocation, sources are\nconsidered small by recorded compile durations')
+    parser.add_argument('--unity',     action='store_true',
+        help='R|compile C/C++ sources merged into unity translation\nunits, unless module sets unity_build = 0')
+    parser.add_argument('--lto',       action='store_true',
+        help='R|use link-time optimization in release builds,\nunless module sets lto = 0')
+    parser.add_argument('--split-dwarf', action='store_true',
+        help='R|keep DWARF of debug builds in .dwo files packaged\nby dwp, unless module sets split_dwarf = 0')
+    parser.add_argument('--compress-debug-sections', action='store_true',
+        help='R|compress DWARF sections of debug builds,\nunless module sets compress_debug_sections = 0')
+    parser.add_argument('--reproducible', action='store_true',
+        help='R|produce outputs independent of checkout location,\ntime and shell environment: prefix-mapped debug info,\nnormalized archives and minimal toolchain environment')
     parser.add_argument('--trace',     action='store_true', help='show all command lines while building')
     parser.add_argument('--verbose',   action='store_true', help='verbose output while building')
     parser.add_argument('--faccess',   action='store_true', help="R|track all files being accessed while building,\nas result stamps of accessed files are saved\nin '<project-output>/{}' directory".format(BUILD_CONFIG_DEFAULT_FACCESS_DIR))
     parser.add_argument('--faccess-directory', nargs='*', metavar='dirname', help="R|Directory name relative to <project-root> where to\ntrack files being accessed, default is <project-root>")
     parser.add_argument('--faccess-emerge', action='store_true', help="R|Emerge content of '<project-output>/{}' directory\nin '<project-output>/{}' file".format(BUILD_CONFIG_DEFAULT_FACCESS_DIR, BUILD_CONFIG_DEFAULT_FACCESS_EMERGE_FILE))
+    parser.add_argument('--query-depends', nargs='+', metavar='path',
+        help='R|print targets, modules and artifacts recorded by previous\nbuilds as depending on given files and exit')
+    parser.add_argument('--plan',      action='store_true',
+        help='R|dry run: print actions which would run, reason of\neach one and estimated cost from recorded durations')
+    parser.add_argument('--plan-json', nargs='?', metavar='FILE', help='with --plan, also write the plan to FILE as JSON')
+    parser.add_argument('--affected-by', nargs='?', metavar='FILE',
+        help="R|list of changed files, one per line, relative to\n<project-root> (e.g. 'git diff --name-only' output),\nbuild only if current module is affected by them,\n'-' means to read list from standard input")
+    parser.add_argument('--affected-report', action='store_true', help='with --affected-by, print affected modules and exit')
+    parser.add_argument('--compile',   nargs='?', metavar='SOURCE',
+        help='R|compile only given source file of module which owns it,\nwithout linking, and exit')
+    parser.add_argument('--watch',     action='store_true',
+        help='R|build, then keep watching sources, headers and makefiles\nwith inotify and rebuild affected targets on change')
+    parser.add_argument('--daemon',    action='store_true',
+        help='R|run build in background server kept per project output,\nwhich keeps loaded configuration and makefiles warm,\ndefault is taken from MINIBUILD_DAEMON, if set')
+    parser.add_argument('--daemon-stop', action='store_true', help='stop background server of project and exit')
     parser.add_argument('--version',   action='store_true', help='print version number and exit')
     if frozen:
         parser.add_argument('--interpreter', action='store_true', help='launch this executable as python interpreter')
@@ -492,9 +658,61 @@ def create_build_workflow(frozen, build_directory, verbose, argv):
         perform_faccess_emerge(sysinfo)
         return None, None
 
+    cache_dir = args.cache_dir if args.cache_dir else os.environ.get('MINIBUILD_CACHE_DIR')
+    if cache_dir:
+        cache_dir = normalize_path_optional(cache_dir, os.getcwd())
+
+    if args.cache_stats:
+        if not cache_dir:
+            raise BuildSystemException("Object cache directory is not given, use '--cache-dir' or MINIBUILD_CACHE_DIR.")
+        cache_stats = load_object_cache_stats(cache_dir)
+        print("BUILDSYS: object cache: '{}'".format(cache_dir))
+        print("    hits: {}, misses: {}, stores: {}, evictions: {}, size: {}".format(
+            cache_stats.hits, cache_stats.misses, cache_stats.stores, cache_stats.evictions, cache_stats.size))
+        return None, None
+
     if buildsys_error is not None:
         raise buildsys_error
 
+    if args.query_depends:
+        print_query_depends(project_setup.build_state, [ normalize_path_optional(path, os.getcwd()) for path in args.query_depends ])
+        return None, None
+
+    project_root = project_setup.project_root
+    affected_by = None
+    if args.affected_by:
+        if args.watch:
+            raise BuildSystemException("Options '--affected-by' and '--watch' can't be used together.")
+        affected_by = load_affected_paths(args.affected_by, project_root)
+        project_files = [ os.path.normcase(path) for path in [project_setup.conf_mk, project_setup.config_file] if path ]
+        if [ path for path in affected_by if os.path.normcase(path) in project_files ]:
+            print("BUILDSYS: project configuration is changed, all modules are affected")
+            if args.affected_report:
+                return None, None
+            affected_by = None
+    elif args.affected_report:
+        raise BuildSystemException("Option '--affected-report' requires '--affected-by'.")
+    if args.plan_json and not args.plan:
+        raise BuildSystemException("Option '--plan-json' requires '--plan'.")
+    if args.plan and args.watch:
+        raise BuildSystemException("Options '--plan' and '--watch' can't be used together.")
+    compile_source = None
+    if args.compile:
+        for option_name, option_value in [('--watch', args.watch), ('--plan', args.plan), ('--affected-by', args.affected_by), ('--public', args.public)]:
+            if option_value:
+                raise BuildSystemException("Options '--compile' and '{}' can't be used together.".format(option_name))
+        compile_source = normalize_path_optional(args.compile, os.getcwd())
+        if not os.path.normcase(compile_source).startswith(sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]):
+            raise BuildSystemException("Source file requested for compile '{}' (resolved as '{}') is out of <project-root> source tree.".format(args.compile, compile_source))
+        if not os.path.isfile(compile_source):
+            raise BuildSystemException("Source file requested for compile not found: '{}'.".format(compile_source))
+
+    sys_platform = project_setup.sys_platform
+    sys_arch = project_setup.sys_arch
+    config = project_setup.config
+    subst_info = project_setup.subst_info
+    toolset_models_mapping = project_setup.toolset_models_mapping
+
     public_format = None
     if args.public_format in TAG_PUBLIC_FORMAT_ALL:
         public_format = args.public_format
@@ -565,12 +783,37 @@ def create_build_workflow(frozen, build_directory, verbose, argv):
     if parallelism <= 0:
         parallelism = 1
 
+    if args.mtime_tolerance < 0:
+        raise BuildSystemException("Got negative value for '--mtime-tolerance': {}".format(args.mtime_tolerance))
+    mtime_tolerance_ns = int(args.mtime_tolerance * 1000000)
+    if args.batch_compile < 0:
+        raise BuildSystemException("Got negative value for '--batch-compile': {}".format(args.batch_compile))
+    sysinfo[TAG_CFG_REPRODUCIBLE] = args.reproducible
+    sysinfo[TAG_CFG_LTO] = args.lto
+    sysinfo[TAG_CFG_SPLIT_DWARF] = args.split_dwarf
+    sysinfo[TAG_CFG_COMPRESS_DEBUG_SECTIONS] = args.compress_debug_sections
+
+    cache_storages = []
+    if cache_dir:
+        cache_storages.append(LocalCacheStorage(cache_dir, parse_size_value(args.cache_max_size)))
+    remote_cache_url = args.remote_cache if args.remote_cache else os.environ.get('MINIBUILD_REMOTE_CACHE')
+    if remote_cache_url:
+        if args.remote_cache_timeout <= 0:
+            raise BuildSystemException("Got non-positive value for '--remote-cache-timeout': {}".format(args.remote_cache_timeout))
+        cache_storages.append(RemoteCacheStorage(remote_cache_url, args.remote_cache_mode, args.remote_cache_timeout))
+    object_cache = None
+    if cache_storages:
+        object_cache = ObjectCache(project_root, sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT], cache_storages)
+
     if os.environ.get('MINIBUILD_TRACE'):
         cmd_trace = True
     else:
         cmd_trace = args.trace
     logic = BuildWorkflow(sysinfo=sysinfo, toolset_models_mapping=toolset_models_mapping, native_model_remap=native_model_remap,
-        grammar_substitutions=subst_info, verbose=verbose, trace=cmd_trace, parallelism=parallelism, faccess=args.faccess, faccess_prefixes=faccess_prefixes)
+        grammar_substitutions=subst_info, verbose=verbose, trace=cmd_trace, parallelism=parallelism, faccess=args.faccess, faccess_prefixes=faccess_prefixes,
+        mtime_tolerance_ns=mtime_tolerance_ns, content_check=(args.check == TAG_CHECK_MODE_HASH), object_cache=object_cache,
+        extensions=project_setup.extensions, build_state=project_setup.build_state, unity=args.unity,
+        batch_compile=args.batch_compile)
 
     for model_name in toolset_models_mapping:
         _, desc_loader = toolset_models_mapping[model_name]
@@ -585,10 +828,39 @@ def create_build_workflow(frozen, build_directory, verbose, argv):
     build_args['public_format'] = public_format
     build_args['public_layout'] = public_layout
     build_args['rebuild_level'] = args.force
+    build_args['affected_by'] = affected_by
+    build_args['affected_report'] = args.affected_report
+    build_args['plan'] = args.plan
+    build_args['plan_file'] = normalize_path_optional(args.plan_json, os.getcwd()) if args.plan_json else None
+    build_args['watch'] = args.watch
+    build_args['compile_source'] = compile_source
 
     return logic, build_args
 
 
+def load_affected_paths(affected_by, project_root):
+    if affected_by == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        list_fname = normalize_path_optional(affected_by, os.getcwd())
+        if not os.path.isfile(list_fname):
+            raise BuildSystemException("List of changed files not found: '{}'.".format(list_fname))
+        with open(list_fname, 'rt') as fh:
+            lines = fh.read().splitlines()
+    return [ normalize_path_optional(line.strip(), project_root) for line in lines if line.strip() ]
+
+
+def print_query_depends(build_state, paths):
+    dependents = build_state.query_dependents(paths)
+    print("BUILDSYS: dependents of '{}':".format("', '".join(paths)))
+    for module_key in dependents.modules:
+        print("    module: {}".format(module_key))
+    for target_path in dependents.targets:
+        print("    target: {}".format(target_path))
+    for artifact_path in dependents.artifacts:
+        print("    artifact: {}".format(artifact_path))
+
+
 def preload_argv(args, dir_redirect):
     argv = []
     verbose = False
@@ -628,7 +900,26 @@ def invoke_interpreter(argv, cwd, frozen, verbose):
         raise BuildSystemException("Pass-through command completed with non-zero exit code.")
 
 
-def script_main_perform(argv_in, frozen, dir_redirect, walks, level, verbose=None):
+def watch_build_workflow(logic, build_args, frozen, build_directory, verbose, argv, setup_provider):
+    project_root, conf_mk, _ = resolve_project_landmark(build_directory, False)
+    if conf_mk:
+        project_makefiles = [ conf_mk ]
+    else:
+        project_makefiles = [ os.path.join(project_root, BUILD_SYSTEM_CONFIG_FILE) ]
+    workflows = [ (logic, build_args) ]
+
+    def create_workflow():
+        if workflows:
+            return workflows.pop()
+        next_logic, next_build_args = create_build_workflow(frozen, build_directory, verbose, argv, setup_provider)
+        next_build_args.pop('watch')
+        next_build_args.pop('compile_source')
+        return next_logic, next_build_args
+
+    run_watch_loop(create_workflow, project_makefiles, WATCH_DEBOUNCE_DEFAULT, verbose)
+
+
+def script_main_perform(argv_in, frozen, dir_redirect, walks, level, verbose=None, setup_provider=None):
     pass_with_interpreter = False
     if isinstance(argv_in, PassThroughCommand):
         argv = argv_in.argv
@@ -652,14 +943,91 @@ def script_main_perform(argv_in, frozen, dir_redirect, walks, level, verbose=Non
     if build_directory in walks:
         raise BuildSystemException("Maximum recursion depth exceeded, see #pragma in '{}', line: {}".format(argv_in.fname, argv_in.lineno))
     walks.add(build_directory)
-    logic, args = create_build_workflow(frozen, build_directory, verbose, argv)
+    logic, args = create_build_workflow(frozen, build_directory, verbose, argv, setup_provider)
     if logic is not None:
-        logic.run(**args)
+        compile_source = args.pop('compile_source')
+        if args.pop('watch'):
+            watch_build_workflow(logic, args, frozen, build_directory, verbose, argv, setup_provider)
+        elif compile_source is not None:
+            logic.compile_source(compile_source, args['used_model_name'], args['build_config'], args['rebuild_level'])
+        else:
+            logic.run(**args)
     elif isinstance(args, PassThroughCommandList):
         for cmd in args.items:
             if level == 0:
                 walks.clear()
-            script_main_perform(cmd, frozen, build_directory, walks, level+1, verbose)
+            script_main_perform(cmd, frozen, build_directory, walks, level+1, verbose, setup_provider)
+
+
+def script_main_guarded(argv, frozen, setup_provider=None):
+    try:
+        walks = set()
+        script_main_perform(argv, frozen, os.getcwd(), walks, 0, setup_provider=setup_provider)
+        return 0
+    except BuildSystemSysExit as exc:
+        return exc.to_exit_code()
+    except BuildSystemException as exc:
+        print(buildsys_error_to_string(exc))
+        return exc.to_exit_code()
+
+
+def preload_daemon_argv(args):
+    argv = []
+    daemon_mode = True if os.environ.get('MINIBUILD_DAEMON') else False
+    daemon_stop = False
+    for arg in args:
+        if arg == '--daemon':
+            daemon_mode = True
+        elif arg == '--daemon-stop':
+            daemon_stop = True
+        else:
+            argv.append(arg)
+    return daemon_mode, daemon_stop, argv
+
+
+def is_daemon_argv_supported(argv):
+    if '--watch' in argv or '--affected-by=-' in argv:
+        return False
+    for arg, next_arg in zip(argv, argv[1:]):
+        if arg == '--affected-by' and next_arg == '-':
+            return False
+    return True
+
+
+def resolve_daemon_location(argv):
+    build_directory, _, _ = preload_argv(argv, os.getcwd())
+    project_root, conf_mk, conf_options = resolve_project_landmark(build_directory, False)
+    _, _, is_wsl = probe_host_platform()
+    output_dname = resolve_project_output(project_root, conf_mk, conf_options, is_wsl)
+    return eval_daemon_socket_path(output_dname), os.path.join(output_dname, BUILD_CONFIG_DEFAULT_DAEMON_LOG_FILE)
+
+
+def eval_daemon_spawn(frozen, socket_path):
+    spawn_argv = [sys.executable]
+    spawn_env = dict(os.environ)
+    if not frozen:
+        spawn_argv += ['-m', __package__]
+        package_parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        python_path = spawn_env.get('PYTHONPATH')
+        spawn_env['PYTHONPATH'] = os.pathsep.join([package_parent_dir, python_path]) if python_path else package_parent_dir
+    spawn_argv += ['--daemon-serve', socket_path]
+    return spawn_argv, spawn_env
+
+
+def eval_daemon_version():
+    return '{} {}'.format(__version__, sys.executable)
+
+
+def serve_build_daemon(frozen, socket_path):
+    setup_cache = ProjectSetupCache(frozen)
+
+    def perform_request(argv):
+        try:
+            return script_main_guarded(argv, frozen, setup_cache)
+        finally:
+            setup_cache.snapshot_descriptions()
+
+    BuildDaemonServer(socket_path, eval_daemon_version(), perform_request).serve()
 
 
 def script_main(argv=None):
@@ -670,11 +1038,28 @@ def script_main(argv=None):
         if len(argv) == 1 and argv[0] == '--version':
             print(format_version_string(frozen))
             return 0
-        walks = set()
-        script_main_perform(argv, frozen, os.getcwd(), walks, 0)
-        return 0
+        if len(argv) == 2 and argv[0] == '--daemon-serve':
+            serve_build_daemon(frozen, argv[1])
+            return 0
+        daemon_mode, daemon_stop, argv = preload_daemon_argv(argv)
+        if daemon_stop:
+            socket_path, _ = resolve_daemon_location(argv)
+            if stop_daemon(socket_path):
+                print("BUILDSYS: daemon stopped: '{}'".format(socket_path))
+            else:
+                print("BUILDSYS: daemon is not running: '{}'".format(socket_path))
+            return 0
+        if daemon_mode and is_daemon_argv_supported(argv):
+            try:
+                socket_path, log_path = resolve_daemon_location(argv)
+            except BuildSystemException:
+                socket_path = None
+            if socket_path is not None:
+                spawn_argv, spawn_env = eval_daemon_spawn(frozen, socket_path)
+                return run_daemon_client(socket_path, eval_daemon_version(), argv, spawn_argv, spawn_env, log_path)
     except BuildSystemSysExit as exc:
         return exc.to_exit_code()
     except BuildSystemException as exc:
         print(buildsys_error_to_string(exc))
         return exc.to_exit_code()
+    return script_main_guarded(argv, frozen)
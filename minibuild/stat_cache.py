@@ -0,0 +1,78 @@
+import os
+import os.path
+import stat
+import threading
+
+from .error_utils import BuildSystemException
+
+
+MTIME_TOLERANCE_DEFAULT_NS = 1000000 # 0.001 second
+
+
+class FileStatus:
+    def __init__(self, mtime_ns, size, inode, is_file):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.inode = inode
+        self.is_file = is_file
+
+
+def query_file_status(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    mtime_ns = getattr(st, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 1000000000)
+    return FileStatus(mtime_ns, st.st_size, st.st_ino, stat.S_ISREG(st.st_mode))
+
+
+def set_file_mtime_ns(path, mtime_ns):
+    st = os.stat(path)
+    atime_ns = getattr(st, 'st_atime_ns', None)
+    if atime_ns is None:
+        os.utime(path, (st.st_atime, mtime_ns / 1000000000.0))
+    else:
+        os.utime(path, ns=(atime_ns, mtime_ns))
+
+
+class StatCache:
+    def __init__(self, tolerance_ns=MTIME_TOLERANCE_DEFAULT_NS, volatile_prefix=None):
+        self.tolerance_ns = tolerance_ns
+        self._volatile_prefix = volatile_prefix
+        self._entries = {}
+        self._guard = threading.Lock()
+
+    def reset(self):
+        with self._guard:
+            self._entries = {}
+
+    def invalidate(self, paths):
+        with self._guard:
+            for path in paths:
+                self._entries.pop(path, None)
+
+    def retain(self, paths):
+        with self._guard:
+            self._entries = { path: self._entries[path] for path in paths if path in self._entries }
+
+    def status(self, path):
+        with self._guard:
+            if path in self._entries:
+                return self._entries[path]
+        file_status = query_file_status(path)
+        if self._volatile_prefix is None or not os.path.normcase(path).startswith(self._volatile_prefix):
+            with self._guard:
+                self._entries[path] = file_status
+        return file_status
+
+    def isfile(self, path):
+        file_status = self.status(path)
+        return file_status is not None and file_status.is_file
+
+    def mtime_ns(self, path):
+        file_status = self.status(path)
+        if file_status is None:
+            raise BuildSystemException("Can't get status of file: '{}'.".format(path))
+        return file_status.mtime_ns
@@ -1,14 +1,42 @@
 from __future__ import print_function
+import copy
+import os
 import subprocess
 import sys
 
 from .error_utils import *
 
 
+REPRODUCIBLE_ENV_PASSTHROUGH = frozenset([
+    'PATH', 'TMPDIR', 'TEMP', 'TMP', 'SYSTEMROOT', 'SYSTEMDRIVE', 'WINDIR', 'COMSPEC', 'PATHEXT',
+    'COMPILER_PATH', 'INCLUDE', 'LIB', 'LIBPATH', 'SDKROOT', 'DEVELOPER_DIR', 'MACOSX_DEPLOYMENT_TARGET',
+    'SOURCE_DATE_EPOCH',
+])
+REPRODUCIBLE_ENV_DEFAULTS = {
+    'LANG': 'C',
+    'LC_ALL': 'C',
+    'TZ': 'UTC',
+    'SOURCE_DATE_EPOCH': '0',
+}
+
+
+def eval_reproducible_env(env):
+    if env is None:
+        env = os.environ
+    reproducible_env = dict(REPRODUCIBLE_ENV_DEFAULTS)
+    for var_name in env.keys():
+        if var_name.upper() in REPRODUCIBLE_ENV_PASSTHROUGH:
+            reproducible_env[var_name] = env[var_name]
+    return reproducible_env
+
+
 class ToolsetActionResult(object):
-    def __init__(self, rebuilt, artifacts):
+    def __init__(self, rebuilt, artifacts, executed=False):
         self.rebuilt = rebuilt
         self.artifacts = artifacts
+        self.executed = executed
+        self.timing_shares = None
+        self.cached = False
         self.error_text = None
         self.exit_code = None
 
@@ -24,10 +52,31 @@ class ToolsetActionOutputDirect(ToolsetActionOutput):
 
 
 class ToolsetActionContext(object):
-    def __init__(self, force, verbose, trace):
+    def __init__(self, force, verbose, trace, build_state=None, stat_cache=None, content_check=False, object_cache=None, reproducible=False, job_slots=1):
         self.force = force
         self.verbose = verbose
         self.trace = trace
+        self.build_state = build_state
+        self.stat_cache = stat_cache
+        self.content_check = content_check
+        self.object_cache = object_cache
+        self.reproducible = reproducible
+        self.job_slots = job_slots
+
+    def subprocess_env(self, env):
+        if self.reproducible:
+            return eval_reproducible_env(env)
+        return env
+
+    def derive(self, force):
+        ctx = copy.copy(self)
+        ctx.force = force
+        return ctx
+
+    def with_job_slots(self, job_slots):
+        ctx = copy.copy(self)
+        ctx.job_slots = job_slots
+        return ctx
 
     def subprocess_communicate(self, output, argv, issuer, env=None, cwd=None, output_filter=None, title=None):
         ret = None
@@ -37,7 +86,7 @@ class ToolsetActionContext(object):
             output.report_message(' '.join(argv))
         if title is not None:
             output.report_message(title)
-        p = subprocess.Popen(argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, cwd=cwd)
+        p = subprocess.Popen(argv, env=self.subprocess_env(env), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, cwd=cwd)
         stdout_data, _ = p.communicate()
         stdout_data = stdout_data.rstrip('\r\n').strip()
         if output_filter is not None:
@@ -50,6 +99,30 @@ class ToolsetActionContext(object):
 
 
 class ToolsetActionBase(object):
+    description_digest = None
+    explain_in_order = False
+    heavy = False
+
+    @property
+    def target_path(self):
+        return None
+
+    @property
+    def plan_title(self):
+        return self.target_path
+
+    def eval_cache_key(self, ctx):
+        return None
+
+    def eval_prerequisites(self, ctx):
+        return None
+
+    def eval_rebuild_reason(self, output, ctx):
+        return None
+
+    def expand_actions(self):
+        return [self]
+
     def safe_execute(self, ctx, output=None):
         if output is None:
             output = ToolsetActionOutputDirect()
@@ -121,6 +194,12 @@ class ToolsetBase(object):
     def create_asm_build_action(self, description, asm_source, obj_directory, obj_name, build_model, build_config):
         raise BuildSystemPureVirtualCall(self)
 
+    def create_batch_build_action(self, actions, obj_directory):
+        return None
+
+    def create_pch_build_action(self, description, header_path, source_type, obj_directory, build_model, build_config):
+        raise BuildSystemException("Precompiled header is not supported by toolset '{}', required in '{}'.".format(self.toolset_name, description.self_file_parts[0]))
+
     def create_lib_static_link_action(self, description, lib_directory, obj_directory, obj_names, build_model, build_config):
         raise BuildSystemPureVirtualCall(self)
 
@@ -2,6 +2,7 @@ from __future__ import print_function
 
 __all__ = ['create_toolset', 'describe_toolset']
 
+import binascii
 import ctypes
 import os
 import os.path
@@ -12,6 +13,7 @@ import sys
 
 from .arch_parse import parse_arch_specific_tokens
 from .build_art import BuildArtifact
+from .build_state import eval_command_digest, eval_data_digest
 from .constants import *
 from .depends_check import *
 from .error_utils import BuildSystemException
@@ -116,7 +118,97 @@ def parse_gcc_version_string(version_text):
     return None
 
 
+GCC_LINKER_DEFAULT = 'default'
+GCC_LINKERS_KNOWN = ['bfd', 'gold', 'lld', 'mold']
+GCC_LINKER_THREADS_FLAGS = {
+    'bfd': [],
+    'gold': ['-Wl,--threads', '-Wl,--thread-count={}'],
+    'lld': ['-Wl,--threads={}'],
+    'mold': ['-Wl,--thread-count={}'],
+}
+
+
+def eval_gcc_driver_stamp(tools):
+    driver_path = tools.gpp
+    if not os.path.dirname(driver_path):
+        env = tools.env if tools.env is not None else os.environ
+        for dname in env.get('PATH', '').split(os.pathsep):
+            if dname and os.path.isfile(os.path.join(dname, driver_path)):
+                driver_path = os.path.join(dname, driver_path)
+                break
+    try:
+        driver_mtime = int(os.stat(driver_path).st_mtime)
+    except OSError:
+        driver_mtime = None
+    return [os.path.realpath(driver_path), driver_mtime]
+
+
+def init_gcc_linkers(tools, bootstrap_dir, required=None):
+    cache_dir = os.path.join(bootstrap_dir, 'linkers')
+    driver_digest = binascii.hexlify(eval_data_digest(eval_gcc_driver_stamp(tools))).decode('ascii')[:16]
+    cache_file = os.path.join(cache_dir, '{}-{}.py'.format(os.path.basename(tools.gpp), driver_digest))
+    if os.path.exists(cache_file):
+        available = load_py_object(cache_file)
+        if required is None or required in available:
+            return available
+    available = []
+    for linker in GCC_LINKERS_KNOWN:
+        argv = [tools.gpp, '-fuse-ld={}'.format(linker), '-Wl,-v' if tools.is_clang else '-Wl,--version']
+        try:
+            p = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, env=tools.env)
+            p.communicate()
+        except Exception:
+            continue
+        if p.returncode == 0:
+            available.append(linker)
+    mkdir_safe(cache_dir)
+    with open(cache_file, mode='wt') as fh:
+        fh.writelines(['[', ', '.join([ "'{}'".format(x) for x in available ]), ']\n'])
+    return available
+
+
+def eval_lto_enabled(sysinfo, description, build_config):
+    if build_config != BUILD_CONFIG_RELEASE:
+        return False
+    lto = description.lto
+    if lto is None:
+        lto = sysinfo.get(TAG_CFG_LTO)
+    return True if lto else False
+
+
+def eval_debug_info_options(sysinfo, tools, description, build_config):
+    if build_config != BUILD_CONFIG_DEBUG or tools.is_clang or tools.is_mingw:
+        return False, False
+    split_dwarf = description.split_dwarf
+    if split_dwarf is None:
+        split_dwarf = sysinfo.get(TAG_CFG_SPLIT_DWARF)
+    compress_debug_sections = description.compress_debug_sections
+    if compress_debug_sections is None:
+        compress_debug_sections = sysinfo.get(TAG_CFG_COMPRESS_DEBUG_SECTIONS)
+    return True if split_dwarf else False, True if compress_debug_sections else False
+
+
+def eval_prefix_map_flags(sysinfo):
+    if not sysinfo.get(TAG_CFG_REPRODUCIBLE):
+        return []
+    project_root = sysinfo[TAG_CFG_DIR_PROJECT_ROOT]
+    project_output = sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT]
+    prefix_maps = [(project_root, '.')]
+    if not sysinfo[TAG_CFG_PROJECT_OUTPUT_COMMON_PREFIX].startswith(sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]):
+        try:
+            output_alias = os.path.relpath(project_output, project_root)
+        except ValueError:
+            output_alias = BUILD_CONFIG_DEFAULT_OUTPUT_DIR
+        prefix_maps.append((project_output, output_alias))
+    flags = []
+    for prefix_from, prefix_to in prefix_maps:
+        flags += [ '-ffile-prefix-map={}={}'.format(prefix_from, prefix_to), '-fdebug-prefix-map={}={}'.format(prefix_from, prefix_to) ]
+    return flags
+
+
 class SourceBuildActionGCC(ToolsetActionBase):
+    compile_header = False
+
     def __init__(self, tools, sysinfo, description, source_path, source_type, obj_directory, obj_name, build_model, build_config):
         self.tools = tools
         self.source_path = source_path
@@ -125,8 +217,10 @@ class SourceBuildActionGCC(ToolsetActionBase):
         self.obj_path = os.path.join(obj_directory, obj_name + sysinfo[TAG_CFG_OBJ_SUFFIX])
         self.dep_path = os.path.join(obj_directory, obj_name + sysinfo[TAG_CFG_DEP_SUFFIX])
         self.deptmp_path = self.dep_path + 'tmp'
+        self.dwo_path = os.path.join(obj_directory, obj_name + '.dwo')
         self.project_root = sysinfo[TAG_CFG_DIR_PROJECT_ROOT]
         self.common_prefix = sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]
+        self.prefix_map_flags = eval_prefix_map_flags(sysinfo)
         self.arch_flags = []
         self.arch_flags += build_model.get_arch_compile_flags()
         self.symbol_visibility_default = description.symbol_visibility_default
@@ -137,13 +231,49 @@ class SourceBuildActionGCC(ToolsetActionBase):
         if description.disabled_warnings and source_type != BUILD_TYPE_ASM:
             self.disabled_warnings = description.disabled_warnings
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
+        self.pch_flags = []
+        self.lto = eval_lto_enabled(sysinfo, description, build_config) and source_type != BUILD_TYPE_ASM
+        self.split_dwarf, self.compress_debug_sections = eval_debug_info_options(sysinfo, tools, description, build_config)
+        if source_type == BUILD_TYPE_ASM:
+            self.split_dwarf = False
+        self.toolchain_id = [self.tools.gpp, build_model.toolset_version]
+
+    @property
+    def target_path(self):
+        return self.obj_path
+
+    @property
+    def object_outputs(self):
+        if self.split_dwarf and not self.compile_header:
+            return [self.obj_path, self.dwo_path]
+        return [self.obj_path]
+
+    def use_precompiled_header(self, pch_action):
+        self.pch_flags = pch_action.eval_include_flags()
+        self.extra_deps.append(pch_action.obj_path)
+
+    def eval_rebuild_reason(self, output, ctx, command_digest=None):
+        if command_digest is None:
+            command_digest = eval_command_digest(self.build_argv(), ctx.subprocess_env(self.tools.env))
+        reason = explain_target_command_rebuild(output, ctx, self.obj_path, command_digest)
+        if reason is not None:
+            return reason
+        for output_path in self.object_outputs[1:]:
+            if not os.path.isfile(output_path):
+                return "output is missing: '{}'".format(output_path)
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        reason = explain_target_with_deps_rebuild(ctx.stat_cache, self.project_root, self.source_path, self.obj_path, depends, self.extra_deps, ctx.verbose)
+        if reason is not None and depends is not None and is_target_content_up_to_date(output, ctx, self.obj_path,
+                eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps)):
+            return None
+        return reason
 
     def execute(self, output, ctx):
+        argv = self.build_argv()
+        command_digest = eval_command_digest(argv, ctx.subprocess_env(self.tools.env))
         target_is_ready = False
         if not ctx.force:
-            target_is_ready = is_target_with_deps_up_to_date(
-                self.project_root, self.source_path, self.obj_path, self.dep_path, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx, command_digest) is None
         if target_is_ready:
             if ctx.verbose:
                 output.report_message("BUILDSYS: up-to-date: {}".format(self.source_path))
@@ -157,6 +287,51 @@ class SourceBuildActionGCC(ToolsetActionBase):
             elif self.source_type == BUILD_TYPE_ASM:
                 output.report_message("BUILDSYS: ASM: {}".format(self.source_path))
 
+        cache_key = self.eval_cache_key(ctx)
+        if cache_key is not None:
+            depends = ctx.object_cache.fetch(ctx, cache_key, self.object_outputs)
+            if depends is not None:
+                output.report_message("{} (cached)".format(os.path.basename(self.source_path)))
+                result = self.register_object(output, ctx, depends, command_digest)
+                result.cached = True
+                return result
+        return self.compile_object(output, ctx, argv, command_digest, cache_key)
+
+    def compile_object(self, output, ctx, argv, command_digest, cache_key):
+        compile_cwd = self.project_root if self.prefix_map_flags else None
+        ctx.subprocess_communicate(output, argv, issuer=self.source_path, title=os.path.basename(self.source_path), env=self.tools.env, cwd=compile_cwd)
+
+        depends = parse_gnu_makefile_depends(self.common_prefix, self.source_path, self.deptmp_path, self.obj_path)
+        result = self.register_compiled_object(output, ctx, depends, command_digest, cache_key)
+        result.executed = True
+        return result
+
+    def register_compiled_object(self, output, ctx, depends, command_digest, cache_key):
+        result = self.register_object(output, ctx, depends, command_digest)
+        if cache_key is not None:
+            ctx.object_cache.store(ctx, cache_key, self.object_outputs, depends)
+        return result
+
+    def eval_cache_key(self, ctx):
+        if ctx.object_cache is None or (self.split_dwarf and not self.compile_header):
+            return None
+        return ctx.object_cache.eval_key(ctx, self.toolchain_id, self.build_argv(), [self.source_path], normalize_paths=True if self.prefix_map_flags else False)
+
+    def eval_prerequisites(self, ctx):
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        if depends is None:
+            return None
+        return eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps)
+
+    def register_object(self, output, ctx, depends, command_digest):
+        rebuilt = False
+        for output_path in self.object_outputs:
+            rebuilt = is_target_output_changed(output, ctx, output_path) or rebuilt
+        ctx.build_state.set_target_depends(self.obj_path, depends, command_digest)
+        record_target_content(ctx, self.obj_path, eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps))
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=None)
+
+    def build_argv(self, batch=False):
         argv = [self.tools.gpp, '-Werror-implicit-function-declaration', '-ffunction-sections', '-fdata-sections', '-fno-omit-frame-pointer' ]
 
         argv += self.arch_flags
@@ -164,9 +339,9 @@ class SourceBuildActionGCC(ToolsetActionBase):
             argv += ['-isysroot', self.tools.sysroot]
 
         if self.source_type == BUILD_TYPE_CPP:
-            argv += ['-x', 'c++', '-std=c++11']
+            argv += ['-x', 'c++-header' if self.compile_header else 'c++', '-std=c++11']
         elif self.source_type == BUILD_TYPE_C:
-            argv += ['-x', 'c']
+            argv += ['-x', 'c-header' if self.compile_header else 'c']
         elif self.source_type == BUILD_TYPE_ASM:
             argv += ['-x', 'assembler-with-cpp']
         else:
@@ -180,7 +355,10 @@ class SourceBuildActionGCC(ToolsetActionBase):
                 argv += ['-fstack-protector-strong']
         if not self.symbol_visibility_default:
             argv += ['-fvisibility=hidden']
-        argv += ['-Wall', '-MD', '-MF', self.deptmp_path]
+        argv += ['-Wall', '-MD']
+        if not batch:
+            argv += ['-MF', self.deptmp_path]
+        argv += self.prefix_map_flags
 
         for wd in self.disabled_warnings:
             argv += [ '-Wno-{}'.format(wd) ]
@@ -189,9 +367,18 @@ class SourceBuildActionGCC(ToolsetActionBase):
             argv += ['-O3']
         elif self.build_config == BUILD_CONFIG_DEBUG:
             argv += ['-O0', '-g']
+            if self.split_dwarf:
+                argv += ['-gdwarf-4']
+                if not self.compile_header:
+                    argv += ['-gsplit-dwarf']
+            if self.compress_debug_sections and not self.compile_header:
+                argv += ['-gz']
         else:
             raise BuildSystemException("Unsupported build config: '{}'".format(self.build_config))
 
+        if self.lto:
+            argv += ['-flto=thin' if self.tools.is_clang else '-flto']
+
         for incd in self.include_dirs:
             argv += [ '-I{}'.format(incd) ]
 
@@ -201,17 +388,140 @@ class SourceBuildActionGCC(ToolsetActionBase):
         if not self.tools.is_clang and not self.tools.is_mingw:
             argv += [ '-D_GNU_SOURCE' ]
 
-        argv += [ '-c', '-o', self.obj_path, self.source_path ]
+        argv += self.pch_flags
+        if batch:
+            argv += [ '-c' ]
+        else:
+            argv += [ '-c', '-o', self.obj_path, self.source_path ]
+        return argv
 
-        ctx.subprocess_communicate(output, argv, issuer=self.source_path, title=os.path.basename(self.source_path), env=self.tools.env)
 
-        depends = parse_gnu_makefile_depends(self.common_prefix, self.source_path, self.deptmp_path, self.obj_path)
-        with open(self.dep_path, mode='wt') as dep_content:
-            dep_content.writelines(['[\n'])
-            for dep_item in depends:
-                dep_content.writelines(['    "', escape_string(dep_item), '",\n'])
-            dep_content.writelines([']\n'])
-        return ToolsetActionResult(rebuilt=True, artifacts=None)
+class SourceBatchBuildActionGCC(ToolsetActionBase):
+    def __init__(self, tools, sysinfo, obj_directory, sources):
+        self.tools = tools
+        self.sources = sources
+        self.common_prefix = sysinfo[TAG_CFG_PROJECT_ROOT_COMMON_PREFIX]
+        self.batch_directory = os.path.join(obj_directory, 'batch', os.path.splitext(os.path.basename(sources[0].obj_path))[0])
+
+    @property
+    def plan_title(self):
+        return "{} (+{} more)".format(self.sources[0].obj_path, len(self.sources) - 1)
+
+    def expand_actions(self):
+        return list(self.sources)
+
+    def eval_rebuild_reason(self, output, ctx):
+        for source in self.sources:
+            reason = source.eval_rebuild_reason(output, ctx)
+            if reason is not None:
+                return reason
+        return None
+
+    def execute(self, output, ctx):
+        rebuilt = False
+        pending = []
+        for source in self.sources:
+            command_digest = eval_command_digest(source.build_argv(), ctx.subprocess_env(self.tools.env))
+            if not ctx.force and source.eval_rebuild_reason(output, ctx, command_digest) is None:
+                if ctx.verbose:
+                    output.report_message("BUILDSYS: up-to-date: {}".format(source.source_path))
+                continue
+            cache_key = source.eval_cache_key(ctx)
+            if cache_key is not None:
+                depends = ctx.object_cache.fetch(ctx, cache_key, source.object_outputs)
+                if depends is not None:
+                    output.report_message("{} (cached)".format(os.path.basename(source.source_path)))
+                    rebuilt = source.register_object(output, ctx, depends, command_digest).rebuilt or rebuilt
+                    continue
+            pending.append((source, command_digest, cache_key))
+
+        failed = []
+        if len(pending) == 1:
+            failed = pending
+        elif pending:
+            failed, batch_rebuilt = self.compile_batch(output, ctx, pending)
+            rebuilt = batch_rebuilt or rebuilt
+        for source, command_digest, cache_key in failed:
+            rebuilt = source.compile_object(output, ctx, source.build_argv(), command_digest, cache_key).rebuilt or rebuilt
+        result = ToolsetActionResult(rebuilt=rebuilt, artifacts=None, executed=True if pending else False)
+        result.timing_shares = self.eval_timing_shares([ source for source, _, _ in pending ])
+        return result
+
+    def eval_timing_shares(self, compiled):
+        if not compiled:
+            return None
+        sizes = [ os.path.getsize(source.source_path) if os.path.isfile(source.source_path) else 0 for source in compiled ]
+        total_size = sum(sizes)
+        if not total_size:
+            return { source.target_path: 1.0 / len(compiled) for source in compiled }
+        return { source.target_path: float(size) / total_size for source, size in zip(compiled, sizes) }
+
+    def compile_batch(self, output, ctx, pending):
+        mkdir_safe(self.batch_directory)
+        produced = []
+        for source, _, _ in pending:
+            produced_name = os.path.splitext(os.path.basename(source.source_path))[0] + '.o'
+            produced_obj = os.path.join(self.batch_directory, produced_name)
+            produced_dep = os.path.splitext(produced_obj)[0] + '.d'
+            for stale_path in [produced_obj, produced_dep]:
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+            produced.append((produced_name, produced_obj, produced_dep))
+
+        argv = pending[0][0].build_argv(batch=True) + [ source.source_path for source, _, _ in pending ]
+        for source, _, _ in pending:
+            output.report_message(os.path.basename(source.source_path))
+        batch_failed = False
+        try:
+            ctx.subprocess_communicate(output, argv, issuer=pending[0][0].source_path, env=self.tools.env, cwd=self.batch_directory,
+                output_filter=lambda text, returncode: (None, text if returncode == 0 else ''))
+        except BuildSystemException:
+            batch_failed = True
+
+        failed = []
+        rebuilt = False
+        for (source, command_digest, cache_key), (produced_name, produced_obj, produced_dep) in zip(pending, produced):
+            if batch_failed and not (os.path.isfile(produced_obj) and os.path.isfile(produced_dep)):
+                failed.append((source, command_digest, cache_key))
+                continue
+            depends = parse_gnu_makefile_depends(self.common_prefix, source.source_path, produced_dep, produced_name)
+            if os.path.exists(source.obj_path):
+                os.remove(source.obj_path)
+            os.rename(produced_obj, source.obj_path)
+            rebuilt = source.register_compiled_object(output, ctx, depends, command_digest, cache_key).rebuilt or rebuilt
+        return failed, rebuilt
+
+
+class PrecompiledHeaderBuildActionGCC(SourceBuildActionGCC):
+    compile_header = True
+
+    def __init__(self, tools, sysinfo, description, header_path, source_type, obj_directory, build_model, build_config):
+        pch_directory = os.path.join(obj_directory, 'pch')
+        stub_name = os.path.basename(header_path)
+        SourceBuildActionGCC.__init__(self, tools, sysinfo, description, os.path.join(pch_directory, stub_name), source_type, pch_directory, stub_name, build_model, build_config)
+        self.header_path = header_path
+        self.pch_directory = pch_directory
+        self.obj_path = self.source_path + ('.pch' if self.tools.is_clang else '.gch')
+
+    def eval_include_flags(self):
+        if self.tools.is_clang:
+            return ['-include', self.source_path]
+        return ['-include', self.source_path, '-Winvalid-pch', '-fpch-deps']
+
+    def execute(self, output, ctx):
+        stub_text = '#include "{}"\n'.format(self.header_path.replace('\\', '/'))
+        stub_ready = False
+        if os.path.isfile(self.source_path):
+            with open(self.source_path, mode='rt') as fh:
+                stub_ready = fh.read() == stub_text
+        if not stub_ready:
+            mkdir_safe(self.pch_directory)
+            with open(self.source_path, mode='wt') as fh:
+                fh.write(stub_text)
+        return SourceBuildActionGCC.execute(self, output, ctx)
+
+    def eval_cache_key(self, ctx):
+        return None
 
 
 class StaticLibLinkActionGCC(ToolsetActionBase):
@@ -229,33 +539,76 @@ class StaticLibLinkActionGCC(ToolsetActionBase):
             self.obj_fnames.append(obj_fname)
             self.primary_deps.append(os.path.join(obj_directory, obj_fname))
 
-        self.extra_deps = description.self_file_parts[:]
+        self.extra_deps = []
+        self.archiver = self.tools.ar_lto if eval_lto_enabled(sysinfo, description, build_config) else self.tools.ar
+        self.toolchain_id = [self.archiver, build_model.toolset_version]
+        self.deterministic_archive = True if sysinfo.get(TAG_CFG_REPRODUCIBLE) else False
+
+    @property
+    def target_path(self):
+        return self.outlib_path
+
+    def eval_rebuild_reason(self, output, ctx):
+        reason = explain_target_command_rebuild(output, ctx, self.outlib_path, self.description_digest)
+        if reason is not None:
+            return reason
+        reason = explain_target_rebuild(ctx.stat_cache, self.outlib_path, self.primary_deps, self.extra_deps, ctx.verbose)
+        if reason is not None and is_target_content_up_to_date(output, ctx, self.outlib_path, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True):
+            return None
+        return reason
 
     def execute(self, output, ctx):
         build_result = [BuildArtifact(BUILD_RET_TYPE_LIB, self.outlib_path, BUILD_RET_ATTR_DEFAULT)]
         target_is_ready = False
         if not ctx.force:
-            target_is_ready, _ = is_target_up_to_date(self.outlib_path, self.primary_deps, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx) is None
         if target_is_ready:
             output.report_message("BUILDSYS: up-to-date: '{}', lib: {}".format(self.module_name, self.outlib_path))
             return ToolsetActionResult(rebuilt=False, artifacts=build_result)
 
+        argv = self.build_argv()
+        cache_key = None
+        if ctx.object_cache is not None:
+            cache_key = ctx.object_cache.eval_key(ctx, self.toolchain_id, argv + self.obj_fnames,
+                self.primary_deps + self.extra_deps, self.description_digest)
+        if cache_key is not None and ctx.object_cache.fetch(ctx, cache_key, [self.outlib_path]) is not None:
+            output.report_message("BUILDSYS: create LIB module '{}' (cached)".format(self.module_name))
+            result = self.register_output(output, ctx, build_result)
+            result.cached = True
+            return result
+
         output.report_message("BUILDSYS: create LIB module '{}' ...".format(self.module_name))
 
         with open(os.path.join(self.obj_directory, self.rsp_fname), mode='wt') as rsp_fh:
             for rsp_entry in self.obj_fnames:
                 rsp_fh.writelines([rsp_entry, '\n'])
-        if self.tools.is_clang and not self.tools.is_crosstool:
-            argv = [self.tools.ar, '-static', '-filelist', self.rsp_fname, '-o', self.outlib_path]
-        else:
-            argv = [self.tools.ar, 'rcs', self.outlib_path, '@' + self.rsp_fname ]
         ctx.subprocess_communicate(output, argv, issuer=self.outlib_path, env=self.tools.env, cwd=self.obj_directory)
-        return ToolsetActionResult(rebuilt=True, artifacts=build_result)
+        result = self.register_output(output, ctx, build_result)
+        result.executed = True
+        if cache_key is not None:
+            ctx.object_cache.store(ctx, cache_key, [self.outlib_path], [])
+        return result
+
+    def eval_prerequisites(self, ctx):
+        return eval_target_prerequisites(self.primary_deps, self.extra_deps)
+
+    def build_argv(self):
+        if self.tools.is_clang and not self.tools.is_crosstool:
+            return [self.archiver, '-static', '-filelist', self.rsp_fname, '-o', self.outlib_path]
+        return [self.archiver, 'rcsD' if self.deterministic_archive else 'rcs', self.outlib_path, '@' + self.rsp_fname]
+
+    def register_output(self, output, ctx, build_result):
+        rebuilt = is_target_output_changed(output, ctx, self.outlib_path, keep_timestamp=True)
+        ctx.build_state.set_target_depends(self.outlib_path, [], self.description_digest)
+        record_target_content(ctx, self.outlib_path, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True)
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=build_result)
 
 
 class LinkActionGCC(ToolsetActionBase):
-    def __init__(self, tools, sysinfo, loader, description, exe_directory, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config):
+    def __init__(self, tools, sysinfo, loader, description, exe_directory, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config, linker=None):
         self.tools = tools
+        self.linker = linker
+        self.link_threads = tools.link_threads if linker is not None else None
         self.sharedlib_directory = sharedlib_directory
         self.is_dll = True if exe_directory is None else False
         self.obj_directory = obj_directory
@@ -265,7 +618,6 @@ class LinkActionGCC(ToolsetActionBase):
         self.lib_directory = lib_directory
         self.primary_deps = [ self.link_stamp_file ]
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
         self.win_stack_size = description.win_stack_size
         self.use_wmain = description.wmain
         self.zip_section = None
@@ -309,6 +661,10 @@ class LinkActionGCC(ToolsetActionBase):
 
         self.bin_path_public = os.path.join(self.link_public_dir, self.bin_basename)
         self.bin_path_private = os.path.join(self.link_private_dir, self.bin_basename)
+        self.split_dwarf, self.compress_debug_sections = eval_debug_info_options(sysinfo, tools, description, build_config)
+        self.dwp_path_public = self.bin_path_public + '.dwp'
+        self.dwp_path_private = self.bin_path_private + '.dwp'
+        self.symbols_file = os.path.join(self.link_private_dir, 'symbols.json')
 
         if self.is_dll:
             self.export_def_file = verify_exports_def_file(description)
@@ -345,7 +701,13 @@ class LinkActionGCC(ToolsetActionBase):
         self.arch_compile_flags += build_model.get_arch_compile_flags()
         self.arch_link_flags = []
         self.arch_link_flags += build_model.get_arch_link_flags(description)
+        self.prefix_map_flags = eval_prefix_map_flags(sysinfo)
         self.build_config = build_config
+        self.lto = eval_lto_enabled(sysinfo, description, build_config)
+        self.heavy = self.lto
+        self.lto_cache_dir = None
+        if self.lto and self.tools.is_clang:
+            self.lto_cache_dir = os.path.join(sysinfo[TAG_CFG_DIR_PROJECT_OUTPUT], BUILD_CONFIG_DEFAULT_LTO_CACHE_DIR, build_model.model_name)
 
         for obj_name in obj_names:
             obj_fname = obj_name + sysinfo[TAG_CFG_OBJ_SUFFIX]
@@ -360,113 +722,96 @@ class LinkActionGCC(ToolsetActionBase):
         self.link_libshared_names = []
         eval_libnames_in_description(loader, description, build_model, self.link_libstatic_names, self.link_libshared_names)
         self.prebuilt_lib_names = eval_prebuilt_lib_list_in_description(description, build_model)
+        self.toolchain_id = [self.tools.gpp, build_model.toolset_version]
 
-    def execute(self, output, ctx):
-        mod_type_id = BUILD_RET_TYPE_DLL if self.is_dll else BUILD_RET_TYPE_EXE
-        mod_attr = BUILD_RET_ATTR_DEFAULT if self.is_dll or self.tools.is_mingw else BUILD_RET_ATTR_FLAG_EXECUTABLE
-        build_result = [BuildArtifact(mod_type_id, self.bin_path_public, mod_attr)]
-        target_is_ready = False
-        if not ctx.force:
-            target_is_ready, _ = is_target_up_to_date(self.bin_path_public, self.primary_deps, self.extra_deps, ctx.verbose)
-        mod_type = 'DLL' if self.is_dll else 'EXE'
-        if target_is_ready:
-            output.report_message("BUILDSYS: up-to-date: '{}', {}: {}".format(self.module_name, mod_type, self.bin_path_public))
-            return ToolsetActionResult(rebuilt=True, artifacts=build_result)
-
-        output.report_message("BUILDSYS: link {} module '{}' ...".format(mod_type, self.module_name))
-        for built_item_info in build_result:
-            if os.path.exists(built_item_info.path):
-                if ctx.verbose:
-                    output.report_message("BUILDSYS: remove file: {}".format(built_item_info.path))
-                os.remove(built_item_info.path)
-        cleanup_dir(self.link_private_dir)
-        link_stamp_file_tmp = self.link_stamp_file + '.tmp'
-        touch_file(link_stamp_file_tmp)
-
-        if self.tools.is_mingw:
-            if self.winrc_file is not None:
-                argv = [self.tools.windres]
-                argv += self.windres_arch_flags
-                argv += [self.winrc_file, self.res_file]
-                for incd in self.include_dirs:
-                    argv += [ '-I{}'.format(incd) ]
-                for defrc in self.winrc_definitions:
-                    argv += [ '-D{}'.format(defrc) ]
-                ctx.subprocess_communicate(output, argv, issuer=self.winrc_file, title=os.path.basename(self.winrc_file), env=self.tools.env)
-
-            if self.manifest_res_file is not None:
-                manifest_builtin = os.path.join(self.link_private_dir, self.module_name_private + '.manifest')
-                manifest_rc = os.path.join(self.link_private_dir, self.module_name_private + '.manifest.rc')
-                with open(manifest_builtin, mode='wt') as fh_manifest:
-                    fh_manifest.writelines([WINRC_MANIFEST])
-                manifest_id = '2' if self.is_dll else '1'
-                with open(manifest_rc, mode='wt') as fh_manifest_rc:
-                    fh_manifest_rc.writelines([
-                        '#include <winuser.h>\n',
-                        '{} RT_MANIFEST {}\n'.format(manifest_id, self.module_name_private + '.manifest')
-                    ])
-                argv = [self.tools.windres]
-                argv += self.windres_arch_flags
-                argv += [manifest_rc, self.manifest_res_file]
-                ctx.subprocess_communicate(output, argv, issuer=manifest_rc, title=os.path.basename(manifest_rc), env=self.tools.env)
-
-        if self.with_default_ssp:
-            with open(os.path.join(self.link_private_dir, self.ssp_stub_fname_src), mode='wt') as fh_ssp:
-                fh_ssp.writelines([SSP_STUB_SOURCE])
-            argv = [ self.tools.gpp ]
-            argv += self.arch_link_flags
-            if self.tools.sysroot:
-                argv += ['-isysroot', self.tools.sysroot]
-            argv += ['-x', 'c', '-fpic', '-fvisibility=hidden', '-Wall', '-O3', '-c', '-o', self.ssp_stub_fname_obj, self.ssp_stub_fname_src]
-            ctx.subprocess_communicate(output, argv, issuer=self.ssp_stub_fname_src, title=self.ssp_stub_fname_src, env=self.tools.env, cwd=self.link_private_dir)
-
+    @property
+    def target_path(self):
+        return self.bin_path_public
+
+    def eval_link_inputs(self):
+        link_inputs = [ dep for dep in self.primary_deps if not dep.startswith(self.link_private_dir + os.sep) ]
+        link_inputs += self.extra_deps
+        for libname in self.link_libstatic_names:
+            link_inputs.append(os.path.join(self.lib_directory, 'lib' + libname + '.a'))
+        for libname in self.link_libshared_names:
+            if self.tools.is_mingw:
+                link_inputs.append(os.path.join(self.sharedlib_directory, libname + '.dll'))
+            else:
+                link_inputs.append(os.path.join(self.sharedlib_directory, 'lib' + libname + '.so'))
+        return link_inputs
+
+    def eval_export_list(self):
+        actual_export_list = []
+        if self.export_def_file is not None:
+            export_list_from_def = load_export_list_from_def_file(self.export_def_file, self.export_winapi_only, self.tools.is_mingw)
+            actual_export_list.extend(export_list_from_def)
+        if self.export_list:
+            for explicit_export in self.export_list:
+                if self.export_winapi_only and not self.tools.is_mingw:
+                    if explicit_export in self.export_winapi_only:
+                        continue
+                actual_export_list.append(explicit_export)
+        return actual_export_list
+
+    def write_export_files(self, actual_export_list):
+        if self.export_map_file is not None:
+            if self.tools.is_clang:
+                with open(self.export_map_file, 'wt') as fh:
+                    for export_entry in actual_export_list:
+                        print('_{}'.format(export_entry), file=fh)
+            else:
+                with open(self.export_map_file, 'wt') as fh:
+                    print("{", file=fh)
+                    print("    global:", file=fh)
+                    for export_entry in actual_export_list:
+                        print("        {};".format(export_entry), file=fh)
+                    print("\n    local: *;", file=fh)
+                    print("};", file=fh)
+
+        with open(self.symbols_file, 'wt') as fh:
+            print("[", file=fh)
+            exp_idx = 0
+            for export_entry in sorted(actual_export_list):
+                exp_idx += 1
+                exp_tail = ',' if exp_idx < len(actual_export_list) else ''
+                print('    "{}"{}'.format(export_entry, exp_tail), file=fh)
+            print("]", file=fh)
+
+    def build_link_argv(self, lto_jobs=None):
         argv = [ self.tools.gpp ]
         argv += self.arch_link_flags
+        argv += self.prefix_map_flags
+
+        if self.linker is not None:
+            argv += ['-fuse-ld={}'.format(self.linker)]
+            if self.link_threads is not None:
+                argv += [ flag.format(self.link_threads) for flag in GCC_LINKER_THREADS_FLAGS[self.linker] ]
+
+        if self.lto:
+            if self.tools.is_clang:
+                argv += ['-flto=thin', '-Wl,-cache_path_lto,{}'.format(self.lto_cache_dir)]
+                if lto_jobs is not None:
+                    argv += ['-Wl,-mllvm,-threads={}'.format(lto_jobs)]
+            else:
+                argv += ['-flto' if lto_jobs is None else '-flto={}'.format(lto_jobs)]
 
         if self.tools.is_mingw:
             argv += ['-Wl,--enable-stdcall-fixup']
 
+        if self.compress_debug_sections:
+            argv += ['-gz']
+
         if self.is_dll:
             argv += ['-shared']
             if not self.tools.is_clang:
                 argv += ['-Wl,--no-undefined' ]
 
-            actual_export_list = []
-            if self.export_def_file is not None:
-                export_list_from_def = load_export_list_from_def_file(self.export_def_file, self.export_winapi_only, self.tools.is_mingw)
-                actual_export_list.extend(export_list_from_def)
-            if self.export_list:
-                for explicit_export in self.export_list:
-                    if self.export_winapi_only and not self.tools.is_mingw:
-                        if explicit_export in self.export_winapi_only:
-                            continue
-                    actual_export_list.append(explicit_export)
-
             if self.export_map_file is not None:
                 if self.tools.is_clang:
-                    with open(self.export_map_file, 'wt') as fh:
-                        for export_entry in actual_export_list:
-                            print('_{}'.format(export_entry), file=fh)
                     argv += [ '-Wl,-exported_symbols_list,{}'.format(self.export_map_file) ]
                 else:
-                    with open(self.export_map_file, 'wt') as fh:
-                        print("{", file=fh)
-                        print("    global:", file=fh)
-                        for export_entry in actual_export_list:
-                            print("        {};".format(export_entry), file=fh)
-                        print("\n    local: *;", file=fh)
-                        print("};", file=fh)
                     argv += [ '-Wl,--version-script={}'.format(self.export_map_file) ]
 
-            with open(os.path.join(self.link_private_dir, 'symbols.json'), 'wt') as fh:
-                print("[", file=fh)
-                exp_idx = 0
-                for export_entry in sorted(actual_export_list):
-                    exp_idx += 1
-                    exp_tail = ',' if exp_idx < len(actual_export_list) else ''
-                    print('    "{}"{}'.format(export_entry, exp_tail), file=fh)
-                print("]", file=fh)
-
         else:
             if self.tools.is_mingw:
                 if self.use_wmain:
@@ -538,7 +883,125 @@ class LinkActionGCC(ToolsetActionBase):
             for framework_name in self.macosx_framework_list:
                 argv += [ '-framework', framework_name ]
 
-        argv = argv_to_rsp(argv, self.rsp_file)
+        return argv
+
+    def eval_link_cache_key(self, ctx, argv, actual_export_list):
+        if ctx.object_cache is None:
+            return None
+        link_args = argv + ['-exports'] + actual_export_list
+        if self.macosx_install_name_options:
+            link_args += ['-install-name'] + self.macosx_install_name_options
+        if self.zip_section is not None:
+            link_args += ['-zip-section', self.zip_section]
+        return ctx.object_cache.eval_key(ctx, self.toolchain_id, link_args, self.eval_link_inputs(), self.description_digest)
+
+    def eval_link_digest(self):
+        if self.description_digest is None or (self.linker is None and self.link_threads is None):
+            return self.description_digest
+        return eval_data_digest([binascii.hexlify(self.description_digest).decode('ascii'), self.linker, self.link_threads])
+
+    def eval_rebuild_reason(self, output, ctx):
+        reason = explain_target_command_rebuild(output, ctx, self.bin_path_public, self.eval_link_digest())
+        if reason is not None:
+            return reason
+        if self.split_dwarf and not os.path.isfile(self.dwp_path_public):
+            return "output is missing: '{}'".format(self.dwp_path_public)
+        reason = explain_target_rebuild(ctx.stat_cache, self.bin_path_public, self.primary_deps, self.extra_deps, ctx.verbose)
+        if reason is not None and is_target_content_up_to_date(output, ctx, self.bin_path_public, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True):
+            return None
+        return reason
+
+    def execute(self, output, ctx):
+        mod_type_id = BUILD_RET_TYPE_DLL if self.is_dll else BUILD_RET_TYPE_EXE
+        mod_attr = BUILD_RET_ATTR_DEFAULT if self.is_dll or self.tools.is_mingw else BUILD_RET_ATTR_FLAG_EXECUTABLE
+        build_result = [BuildArtifact(mod_type_id, self.bin_path_public, mod_attr)]
+        if self.split_dwarf:
+            build_result.append(BuildArtifact(BUILD_RET_TYPE_DWP, self.dwp_path_public, BUILD_RET_ATTR_DEFAULT))
+        target_is_ready = False
+        if not ctx.force:
+            target_is_ready = self.eval_rebuild_reason(output, ctx) is None
+        mod_type = 'DLL' if self.is_dll else 'EXE'
+        if target_is_ready:
+            output.report_message("BUILDSYS: up-to-date: '{}', {}: {}".format(self.module_name, mod_type, self.bin_path_public))
+            return ToolsetActionResult(rebuilt=False, artifacts=build_result)
+
+        actual_export_list = self.eval_export_list() if self.is_dll else []
+        argv_link = self.build_link_argv()
+        cache_key = self.eval_link_cache_key(ctx, argv_link, actual_export_list)
+        cache_outputs = [self.bin_path_public]
+        if self.split_dwarf:
+            cache_outputs.append(self.dwp_path_public)
+        if self.is_dll:
+            cache_outputs.append(self.symbols_file)
+        if self.with_default_ssp:
+            cache_outputs.append(os.path.join(self.link_private_dir, self.ssp_stub_fname_obj))
+        for built_item_info in build_result:
+            if os.path.exists(built_item_info.path):
+                if ctx.verbose:
+                    output.report_message("BUILDSYS: remove file: {}".format(built_item_info.path))
+                os.remove(built_item_info.path)
+        cleanup_dir(self.link_private_dir)
+        link_stamp_file_tmp = self.link_stamp_file + '.tmp'
+        touch_file(link_stamp_file_tmp)
+
+        if cache_key is not None and ctx.object_cache.fetch(ctx, cache_key, cache_outputs) is not None:
+            output.report_message("BUILDSYS: link {} module '{}' (cached)".format(mod_type, self.module_name))
+            os.rename(link_stamp_file_tmp, self.link_stamp_file)
+            os.utime(self.link_stamp_file, None)
+            os.utime(self.bin_path_public, None)
+            result = self.register_output(output, ctx, build_result)
+            result.cached = True
+            return result
+
+        output.report_message("BUILDSYS: link {} module '{}' ...".format(mod_type, self.module_name))
+
+        if self.tools.is_mingw:
+            if self.winrc_file is not None:
+                argv = [self.tools.windres]
+                argv += self.windres_arch_flags
+                argv += [self.winrc_file, self.res_file]
+                for incd in self.include_dirs:
+                    argv += [ '-I{}'.format(incd) ]
+                for defrc in self.winrc_definitions:
+                    argv += [ '-D{}'.format(defrc) ]
+                ctx.subprocess_communicate(output, argv, issuer=self.winrc_file, title=os.path.basename(self.winrc_file), env=self.tools.env)
+
+            if self.manifest_res_file is not None:
+                manifest_builtin = os.path.join(self.link_private_dir, self.module_name_private + '.manifest')
+                manifest_rc = os.path.join(self.link_private_dir, self.module_name_private + '.manifest.rc')
+                with open(manifest_builtin, mode='wt') as fh_manifest:
+                    fh_manifest.writelines([WINRC_MANIFEST])
+                manifest_id = '2' if self.is_dll else '1'
+                with open(manifest_rc, mode='wt') as fh_manifest_rc:
+                    fh_manifest_rc.writelines([
+                        '#include <winuser.h>\n',
+                        '{} RT_MANIFEST {}\n'.format(manifest_id, self.module_name_private + '.manifest')
+                    ])
+                argv = [self.tools.windres]
+                argv += self.windres_arch_flags
+                argv += [manifest_rc, self.manifest_res_file]
+                ctx.subprocess_communicate(output, argv, issuer=manifest_rc, title=os.path.basename(manifest_rc), env=self.tools.env)
+
+        if self.with_default_ssp:
+            with open(os.path.join(self.link_private_dir, self.ssp_stub_fname_src), mode='wt') as fh_ssp:
+                fh_ssp.writelines([SSP_STUB_SOURCE])
+            argv = [ self.tools.gpp ]
+            argv += self.arch_link_flags
+            if self.tools.sysroot:
+                argv += ['-isysroot', self.tools.sysroot]
+            argv += ['-x', 'c', '-fpic', '-fvisibility=hidden', '-Wall', '-O3']
+            argv += self.prefix_map_flags
+            argv += ['-c', '-o', self.ssp_stub_fname_obj, self.ssp_stub_fname_src]
+            ctx.subprocess_communicate(output, argv, issuer=self.ssp_stub_fname_src, title=self.ssp_stub_fname_src, env=self.tools.env, cwd=self.link_private_dir)
+
+        if self.is_dll:
+            self.write_export_files(actual_export_list)
+
+        if self.lto:
+            if self.lto_cache_dir is not None:
+                mkdir_safe(self.lto_cache_dir)
+            argv_link = self.build_link_argv(lto_jobs=ctx.job_slots)
+        argv = argv_to_rsp(argv_link, self.rsp_file)
         ctx.subprocess_communicate(output, argv, issuer=self.bin_path_private, env=self.tools.env, cwd=self.obj_directory)
 
         if self.macosx_install_name_options:
@@ -563,12 +1026,29 @@ class LinkActionGCC(ToolsetActionBase):
                 with open(self.zip_section, 'rb') as fhzip:
                     shutil.copyfileobj(fhzip, fhbin)
 
+        if self.split_dwarf:
+            argv = [self.tools.dwp, '-e', self.bin_path_private, '-o', self.dwp_path_private]
+            ctx.subprocess_communicate(output, argv, issuer=self.dwp_path_private, title=os.path.basename(self.dwp_path_public), env=self.tools.env)
+            os.rename(self.dwp_path_private, self.dwp_path_public)
+
         os.rename(self.bin_path_private, self.bin_path_public)
         os.rename(link_stamp_file_tmp, self.link_stamp_file)
         os.utime(self.link_stamp_file, None)
         os.utime(self.bin_path_public, None)
+        result = self.register_output(output, ctx, build_result)
+        result.executed = True
+        if cache_key is not None:
+            ctx.object_cache.store(ctx, cache_key, cache_outputs, [])
+        return result
 
-        return ToolsetActionResult(rebuilt=True, artifacts=build_result)
+    def eval_prerequisites(self, ctx):
+        return eval_target_prerequisites(self.primary_deps, self.extra_deps)
+
+    def register_output(self, output, ctx, build_result):
+        rebuilt = is_target_output_changed(output, ctx, self.bin_path_public, keep_timestamp=True, stamp_file_path=self.link_stamp_file)
+        ctx.build_state.set_target_depends(self.bin_path_public, [], self.eval_link_digest())
+        record_target_content(ctx, self.bin_path_public, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True)
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=build_result)
 
 
 class GccModel(ToolsetModel):
@@ -636,6 +1116,8 @@ class ToolsetGCC(ToolsetBase):
         self._loader = loader
         self._tools = tools
         self._nasm_checked = False
+        self._available_linkers = None
+        self._missing_linkers = set()
 
         models = []
         toolset_version = tools.eval_version_info()
@@ -834,6 +1316,22 @@ class ToolsetGCC(ToolsetBase):
     def create_c_build_action(self, description, c_source, obj_directory, obj_name, build_model, build_config):
         return SourceBuildActionGCC(self._tools, self._sysinfo, description, c_source, BUILD_TYPE_C, obj_directory, obj_name, build_model, build_config)
 
+    def create_batch_build_action(self, actions, obj_directory):
+        if eval_prefix_map_flags(self._sysinfo):
+            return None
+        batch_argv = None
+        for action in actions:
+            if not isinstance(action, SourceBuildActionGCC) or action.compile_header or action.source_type == BUILD_TYPE_ASM or action.split_dwarf:
+                return None
+            if batch_argv is None:
+                batch_argv = action.build_argv(batch=True)
+            elif action.build_argv(batch=True) != batch_argv:
+                return None
+        return SourceBatchBuildActionGCC(self._tools, self._sysinfo, obj_directory, actions)
+
+    def create_pch_build_action(self, description, header_path, source_type, obj_directory, build_model, build_config):
+        return PrecompiledHeaderBuildActionGCC(self._tools, self._sysinfo, description, header_path, source_type, obj_directory, build_model, build_config)
+
     def create_asm_build_action(self, description, asm_source, obj_directory, obj_name, build_model, build_config):
         if description.nasm:
             if not self._tools.nasm_enabled:
@@ -855,18 +1353,40 @@ class ToolsetGCC(ToolsetBase):
         return StaticLibLinkActionGCC(self._tools, self._sysinfo, description, lib_directory, obj_directory, obj_names, build_model, build_config)
 
     def create_exe_link_action(self, description, exe_directory, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config):
-        return LinkActionGCC(self._tools, self._sysinfo, self._loader, description, exe_directory, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config)
+        return LinkActionGCC(self._tools, self._sysinfo, self._loader, description, exe_directory, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config,
+            linker=self._select_linker(description))
 
     def create_lib_shared_link_action(self, description, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config):
-        return LinkActionGCC(self._tools, self._sysinfo, self._loader, description, None, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config)
+        return LinkActionGCC(self._tools, self._sysinfo, self._loader, description, None, sharedlib_directory, lib_directory, obj_directory, obj_names, build_model, build_config,
+            linker=self._select_linker(description))
+
+    def _select_linker(self, description):
+        linker = description.linker
+        if linker is None:
+            linker = self._tools.linker
+        if linker is None or linker == GCC_LINKER_DEFAULT:
+            return None
+        if linker not in GCC_LINKERS_KNOWN:
+            raise BuildSystemException("Unknown linker '{}' is requested in '{}', supported values: {}.".format(linker, description.self_file_parts[0], ', '.join([GCC_LINKER_DEFAULT] + GCC_LINKERS_KNOWN)))
+        if self._available_linkers is None or (linker not in self._available_linkers and linker not in self._missing_linkers):
+            self._available_linkers = init_gcc_linkers(self._tools, self._sysinfo[TAG_CFG_DIR_BOOTSTRAP], linker)
+        if linker not in self._available_linkers:
+            if linker not in self._missing_linkers:
+                self._missing_linkers.add(linker)
+                print("BUILDSYS: linker '{}' is not available for '{}', default linker is used.".format(linker, self._tools.gpp))
+            return None
+        return linker
 
 
 class ToolsInfoGCC:
-    def __init__(self, dir_prefix=None, sysroot=None, bin_prefix=None, is_mingw=None, is_clang=None, is_crosstool=None, arch_list=None, nasm=None, api_levels=None, toolset_version=None, crosstool_target_platform=None, env=None):
+    def __init__(self, dir_prefix=None, sysroot=None, bin_prefix=None, is_mingw=None, is_clang=None, is_crosstool=None, arch_list=None, nasm=None, api_levels=None, toolset_version=None, crosstool_target_platform=None, env=None,
+            linker=None, link_threads=None):
         tool_gcc = 'clang' if is_clang else 'gcc'
         tool_gpp = 'clang' if is_clang else 'g++'
         tool_ar  = 'libtool' if is_clang and not is_crosstool else 'ar'
+        tool_ar_lto = tool_ar if is_clang else 'gcc-ar'
         tool_windres = 'windres' if is_mingw else None
+        tool_dwp = 'dwp'
 
         if is_crosstool:
             if crosstool_target_platform not in [TAG_PLATFORM_LINUX, TAG_PLATFORM_MACOSX]:
@@ -876,6 +1396,8 @@ class ToolsInfoGCC:
             tool_gcc = tool_gcc + '.exe'
             tool_gpp = tool_gpp + '.exe'
             tool_ar  = tool_ar  + '.exe'
+            tool_ar_lto = tool_ar_lto + '.exe'
+            tool_dwp = tool_dwp + '.exe'
             if tool_windres is not None:
                 tool_windres = tool_windres + '.exe'
 
@@ -883,6 +1405,8 @@ class ToolsInfoGCC:
             tool_gcc = bin_prefix + tool_gcc
             tool_gpp = bin_prefix + tool_gpp
             tool_ar  = bin_prefix + tool_ar
+            tool_ar_lto = bin_prefix + tool_ar_lto
+            tool_dwp = bin_prefix + tool_dwp
             if tool_windres is not None:
                 tool_windres = bin_prefix + tool_windres
 
@@ -890,6 +1414,8 @@ class ToolsInfoGCC:
             tool_gcc = os.path.join(dir_prefix, tool_gcc)
             tool_gpp = os.path.join(dir_prefix, tool_gpp)
             tool_ar  = os.path.join(dir_prefix, tool_ar)
+            tool_ar_lto = os.path.join(dir_prefix, tool_ar_lto)
+            tool_dwp = os.path.join(dir_prefix, tool_dwp)
             if tool_windres is not None:
                 tool_windres = os.path.join(dir_prefix, tool_windres)
 
@@ -907,8 +1433,12 @@ class ToolsInfoGCC:
         self.gcc = tool_gcc
         self.gpp = tool_gpp
         self.ar  = tool_ar
+        self.ar_lto = tool_ar_lto
+        self.dwp = tool_dwp
         self.windres = tool_windres
         self.nasm_executable = nasm if nasm else 'nasm'
+        self.linker = linker
+        self.link_threads = link_threads
         self.nasm_enabled = False
         self.toolset_version = toolset_version
 
@@ -1019,7 +1549,8 @@ def init_cross_tools(crosstools_title, sysinfo, toolset_name, target_platform, x
         custom_env['COMPILER_PATH'] = package_path_bin
 
     tools = ToolsInfoGCC(dir_prefix=package_path_bin, sysroot=sysroot_path, bin_prefix=bin_prefix, is_crosstool=is_crosstool, is_mingw=is_mingw, crosstool_target_platform=target_platform,
-                        is_clang=is_clang, arch_list=arch_parsed, api_levels=api_levels, toolset_version=toolset_version, nasm=nasm, env=custom_env)
+                        is_clang=is_clang, arch_list=arch_parsed, api_levels=api_levels, toolset_version=toolset_version, nasm=nasm, env=custom_env,
+                        linker=xtools_cfg.get('linker'), link_threads=xtools_cfg.get('link_threads'))
     return tools
 
 
@@ -1046,7 +1577,7 @@ def _create_clang_toolset(sysinfo, loader, sys_platform, sys_arch, toolset_custo
             if api_level:
                 api_levels[arch_value] = api_level
     api_level_sys = {sys_arch: api_levels.get(sys_arch)}
-    clang_tools = ToolsInfoGCC(is_clang=True, nasm=nasm_executable, api_levels=api_level_sys)
+    clang_tools = ToolsInfoGCC(is_clang=True, nasm=nasm_executable, api_levels=api_level_sys, linker=kwargs.get('linker'), link_threads=kwargs.get('link_threads'))
     return ToolsetGCC('clang', clang_tools, sysinfo, loader, toolset_custom_models)
 
 
@@ -1065,10 +1596,25 @@ def create_toolset(sysinfo, loader, sys_platform, sys_arch, toolset_custom_model
                                      arch_list_enabled=TAG_ALL_KNOWN_ARCH_LIST, api_levels_enabled=None)
         return ToolsetGCC('gcc', cross_tools, sysinfo, loader, toolset_custom_models)
 
-    gcc_tools = ToolsInfoGCC(nasm=nasm_executable)
+    gcc_tools = ToolsInfoGCC(nasm=nasm_executable, linker=kwargs.get('linker'), link_threads=kwargs.get('link_threads'))
     return ToolsetGCC('gcc', gcc_tools, sysinfo, loader, toolset_custom_models)
 
 
+def _describe_linker_parts(config_proto, pragma_line, options):
+    linker_parts = []
+    linker = options.get('linker')
+    if linker:
+        if linker not in [GCC_LINKER_DEFAULT] + GCC_LINKERS_KNOWN:
+            raise BuildSystemException("Can't process makefile: '{}', line: {}, token 'linker' is malformed: '{}', supported values: {}.".format(config_proto, pragma_line, linker, ', '.join([GCC_LINKER_DEFAULT] + GCC_LINKERS_KNOWN)))
+        linker_parts += ["'linker':'{}'".format(linker)]
+    link_threads = options.get('link_threads')
+    if link_threads:
+        if not link_threads.isdigit() or int(link_threads) <= 0:
+            raise BuildSystemException("Can't process makefile: '{}', line: {}, token 'link_threads' is malformed: '{}'".format(config_proto, pragma_line, link_threads))
+        linker_parts += ["'link_threads':{}".format(int(link_threads))]
+    return linker_parts
+
+
 def _describe_toolset_imp(native_id, config_proto, pragma_line, sys_platform, sys_arch, toolset_label, **kwargs):
     nasm_executable = kwargs.get('nasm_executable')
     toolset_id = None
@@ -1139,6 +1685,7 @@ def _describe_toolset_imp(native_id, config_proto, pragma_line, sys_platform, sy
                 conflicts = ['mingw-multiarch']
                 models_per_arch[TAG_ARCH_X86_64] = GCC_MODEL_MINGW64
 
+        mingw_parts += _describe_linker_parts(config_proto, pragma_line, mingw)
         config_parts += ["'mingw':{{{}}}".format(','.join(mingw_parts))]
 
     elif 'xtools' in kwargs:
@@ -1174,6 +1721,7 @@ def _describe_toolset_imp(native_id, config_proto, pragma_line, sys_platform, sy
         if xtools_version:
             xtools_parts += ["'version':'{}'".format(xtools_version)]
 
+        xtools_parts += _describe_linker_parts(config_proto, pragma_line, xtools)
         toolset_id = 'xtools-{}'.format('-'.join(sorted(xtools_arch_list)))
         config_parts += ["'xtools':{{{}}}".format(','.join(xtools_parts))]
 
@@ -1227,6 +1775,7 @@ def _describe_toolset_imp(native_id, config_proto, pragma_line, sys_platform, sy
         if xtools_version:
             xtools_parts += ["'version':'{}'".format(xtools_version)]
 
+        xtools_parts += _describe_linker_parts(config_proto, pragma_line, xtools)
         toolset_id = 'macosx-xtools'
         config_parts += ["'macosx-xtools':{{{}}}".format(','.join(xtools_parts))]
         if toolset_label:
@@ -1240,6 +1789,8 @@ def _describe_toolset_imp(native_id, config_proto, pragma_line, sys_platform, sy
         else:
             toolset_id = '{}-native'.format(native_id)
 
+        config_parts += _describe_linker_parts(config_proto, pragma_line, kwargs)
+
         if sys_platform == TAG_PLATFORM_LINUX:
             if native_id == 'gcc':
                 models_per_arch[sys_arch] = LINUX_GCC_MODEL_NAMES[sys_arch]
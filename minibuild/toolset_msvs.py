@@ -18,6 +18,7 @@ else:
 
 from .arch_parse import parse_arch_specific_tokens
 from .build_art import BuildArtifact
+from .build_state import eval_command_digest
 from .constants import *
 from .depends_check import *
 from .error_utils import BuildSystemException
@@ -476,12 +477,28 @@ class MasmSourceBuildAction(ToolsetActionBase):
         self.include_dirs = eval_include_dirs_in_description(description, sysinfo[TAG_CFG_DIR_PROJECT_ROOT], BUILD_TYPE_ASM)
         self.definitions = eval_definitions_list_in_description(description, build_model, BUILD_TYPE_ASM)
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
+
+    @property
+    def target_path(self):
+        return self.obj_path
+
+    def eval_rebuild_reason(self, output, ctx, command_digest=None):
+        if command_digest is None:
+            command_digest = eval_command_digest(self.build_argv(), ctx.subprocess_env(self.env))
+        reason = explain_target_command_rebuild(output, ctx, self.obj_path, command_digest)
+        if reason is not None:
+            return reason
+        reason = explain_target_rebuild(ctx.stat_cache, self.obj_path, [self.asm_path], self.extra_deps, ctx.verbose)
+        if reason is not None and is_target_content_up_to_date(output, ctx, self.obj_path, eval_target_prerequisites([self.asm_path], self.extra_deps)):
+            return None
+        return reason
 
     def execute(self, output, ctx):
+        argv = self.build_argv()
+        command_digest = eval_command_digest(argv, ctx.subprocess_env(self.env))
         target_is_ready = False
         if not ctx.force:
-            target_is_ready, _ = is_target_up_to_date(self.obj_path, [self.asm_path], self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx, command_digest) is None
         if target_is_ready:
             if ctx.verbose:
                 output.report_message("BUILDSYS: up-to-date: {}".format(self.asm_path))
@@ -490,6 +507,16 @@ class MasmSourceBuildAction(ToolsetActionBase):
         if ctx.verbose:
             output.report_message("BUILDSYS: ASM: {}".format(self.asm_path))
 
+        ctx.subprocess_communicate(output, argv, issuer=self.asm_path, env=self.env)
+        rebuilt = is_target_output_changed(output, ctx, self.obj_path)
+        ctx.build_state.set_target_depends(self.obj_path, [], command_digest)
+        record_target_content(ctx, self.obj_path, eval_target_prerequisites([self.asm_path], self.extra_deps))
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=None, executed=True)
+
+    def eval_prerequisites(self, ctx):
+        return eval_target_prerequisites([self.asm_path], self.extra_deps)
+
+    def build_argv(self):
         argv = [self.ml, '/c', '/nologo']
 
         for incd in self.include_dirs:
@@ -499,9 +526,7 @@ class MasmSourceBuildAction(ToolsetActionBase):
             argv += [ '/D{}'.format(_def) ]
 
         argv += [ '/Fo{}'.format(self.obj_path), self.asm_path]
-
-        ctx.subprocess_communicate(output, argv, issuer=self.asm_path, env=self.env)
-        return ToolsetActionResult(rebuilt=True, artifacts=None)
+        return argv
 
 
 class SourceBuildActionMSVS(ToolsetActionBase):
@@ -524,12 +549,30 @@ class SourceBuildActionMSVS(ToolsetActionBase):
         if description.disabled_warnings:
             self.disabled_warnings = description.disabled_warnings
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
+
+    @property
+    def target_path(self):
+        return self.obj_path
+
+    def eval_rebuild_reason(self, output, ctx, command_digest=None):
+        if command_digest is None:
+            command_digest = eval_command_digest(self.build_argv(), ctx.subprocess_env(self.env))
+        reason = explain_target_command_rebuild(output, ctx, self.obj_path, command_digest)
+        if reason is not None:
+            return reason
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        reason = explain_target_with_deps_rebuild(ctx.stat_cache, self.project_root, self.source_path, self.obj_path, depends, self.extra_deps, ctx.verbose)
+        if reason is not None and depends is not None and is_target_content_up_to_date(output, ctx, self.obj_path,
+                eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps)):
+            return None
+        return reason
 
     def execute(self, output, ctx):
+        argv = self.build_argv()
+        command_digest = eval_command_digest(argv, ctx.subprocess_env(self.env))
         target_is_ready = False
         if not ctx.force:
-            target_is_ready = is_target_with_deps_up_to_date(self.project_root, self.source_path, self.obj_path, self.dep_path, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx, command_digest) is None
         if target_is_ready:
             if ctx.verbose:
                 output.report_message("BUILDSYS: up-to-date: {}".format(self.source_path))
@@ -541,6 +584,19 @@ class SourceBuildActionMSVS(ToolsetActionBase):
             else:
                 output.report_message("BUILDSYS: C: {}".format(self.source_path))
 
+        depends = ctx.subprocess_communicate(output, argv, issuer=self.source_path, env=self.env, output_filter=self.msvs_headers_filter)
+        rebuilt = is_target_output_changed(output, ctx, self.obj_path)
+        ctx.build_state.set_target_depends(self.obj_path, depends, command_digest)
+        record_target_content(ctx, self.obj_path, eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps))
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=None, executed=True)
+
+    def eval_prerequisites(self, ctx):
+        depends = ctx.build_state.get_target_depends(self.obj_path, legacy_depends_file=self.dep_path)
+        if depends is None:
+            return None
+        return eval_target_with_deps_prerequisites(self.project_root, self.source_path, depends, self.extra_deps)
+
+    def build_argv(self):
         argv = [self.cl, '/c', '/nologo', '/showIncludes', '/Gy']
         if self.source_type == BUILD_TYPE_CPP:
             argv += ['/TP', '/EHsc', '/GR', '/Zc:forScope', '/Zc:wchar_t']
@@ -573,15 +629,7 @@ class SourceBuildActionMSVS(ToolsetActionBase):
             argv += ['/DNDEBUG']
 
         argv += [ '/Fo{}'.format(self.obj_path), '/Fd{}'.format(self.pdb_path), self.source_path ]
-
-        depends = ctx.subprocess_communicate(output, argv, issuer=self.source_path, env=self.env, output_filter=self.msvs_headers_filter)
-
-        with open(self.dep_path, mode='wt') as dep_content:
-            dep_content.writelines(['[\n'])
-            for dep_item in depends:
-                dep_content.writelines(['    "', escape_string(dep_item), '",\n'])
-            dep_content.writelines([']\n'])
-        return ToolsetActionResult(rebuilt=True, artifacts=None)
+        return argv
 
     def msvs_headers_filter(self, stdout_data, return_code):
         depends = []
@@ -618,13 +666,26 @@ class StaticLibLinkActionMSVS(ToolsetActionBase):
             self.obj_fnames.append(obj_fname)
             self.primary_deps.append(os.path.join(obj_directory, obj_fname))
 
-        self.extra_deps = description.self_file_parts[:]
+        self.extra_deps = []
+
+    @property
+    def target_path(self):
+        return self.outlib_path
+
+    def eval_rebuild_reason(self, output, ctx):
+        reason = explain_target_command_rebuild(output, ctx, self.outlib_path, self.description_digest)
+        if reason is not None:
+            return reason
+        reason = explain_target_rebuild(ctx.stat_cache, self.outlib_path, self.primary_deps, self.extra_deps, ctx.verbose)
+        if reason is not None and is_target_content_up_to_date(output, ctx, self.outlib_path, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True):
+            return None
+        return reason
 
     def execute(self, output, ctx):
         build_result = [BuildArtifact(BUILD_RET_TYPE_LIB, self.outlib_path, BUILD_RET_ATTR_DEFAULT)]
         target_is_ready = False
         if not ctx.force:
-            target_is_ready, _ = is_target_up_to_date(self.outlib_path, self.primary_deps, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx) is None
         if target_is_ready:
             output.report_message("BUILDSYS: up-to-date: '{}', LIB: {}".format(self.module_name, self.outlib_path))
             return ToolsetActionResult(rebuilt=False, artifacts=build_result)
@@ -633,7 +694,13 @@ class StaticLibLinkActionMSVS(ToolsetActionBase):
         argv = [self.lib_tool, '/nologo', '/out:{}'.format(self.outlib_path)] + self.obj_fnames
         argv = argv_to_rsp(argv, self.rsp_file)
         ctx.subprocess_communicate(output, argv, issuer=self.outlib_path, env=self.env, cwd=self.obj_directory)
-        return ToolsetActionResult(rebuilt=True, artifacts=build_result)
+        rebuilt = is_target_output_changed(output, ctx, self.outlib_path, keep_timestamp=True)
+        ctx.build_state.set_target_depends(self.outlib_path, [], self.description_digest)
+        record_target_content(ctx, self.outlib_path, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True)
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=build_result, executed=True)
+
+    def eval_prerequisites(self, ctx):
+        return eval_target_prerequisites(self.primary_deps, self.extra_deps)
 
 
 def rc_tool_output_filter(stdout_data, return_code):
@@ -666,7 +733,6 @@ class LinkActionMSVS(ToolsetActionBase):
         self.lib_directory = lib_directory
         self.primary_deps = [ self.link_stamp_file ]
         self.extra_deps = []
-        self.extra_deps.extend(description.self_file_parts)
         self.use_wmain = description.wmain
         self.win_stack_size = description.win_stack_size
         self.zip_section = None
@@ -746,6 +812,19 @@ class LinkActionMSVS(ToolsetActionBase):
         else:
             self.linker_options += ['/SUBSYSTEM:WINDOWS,{}'.format(os_version)]
 
+    @property
+    def target_path(self):
+        return self.bin_path_public
+
+    def eval_rebuild_reason(self, output, ctx):
+        reason = explain_target_command_rebuild(output, ctx, self.bin_path_public, self.description_digest)
+        if reason is not None:
+            return reason
+        reason = explain_target_rebuild(ctx.stat_cache, self.bin_path_public, self.primary_deps, self.extra_deps, ctx.verbose)
+        if reason is not None and is_target_content_up_to_date(output, ctx, self.bin_path_public, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True):
+            return None
+        return reason
+
     def execute(self, output, ctx):
         mod_type_id = BUILD_RET_TYPE_DLL if self.is_dll else BUILD_RET_TYPE_EXE
         build_result = [BuildArtifact(mod_type_id, self.bin_path_public, BUILD_RET_ATTR_DEFAULT), BuildArtifact(BUILD_RET_TYPE_PDB, self.pdb_path_public, BUILD_RET_ATTR_DEFAULT)]
@@ -753,7 +832,7 @@ class LinkActionMSVS(ToolsetActionBase):
             build_result += [BuildArtifact(BUILD_RET_TYPE_LIB, self.implib_path_public, BUILD_RET_ATTR_DEFAULT)]
         target_is_ready = False
         if not ctx.force:
-            target_is_ready, _ = is_target_up_to_date(self.bin_path_public, self.primary_deps, self.extra_deps, ctx.verbose)
+            target_is_ready = self.eval_rebuild_reason(output, ctx) is None
         mod_type = 'DLL' if self.is_dll else 'EXE'
         if target_is_ready:
             output.report_message("BUILDSYS: up-to-date: '{}', {}: {}".format(self.module_name, mod_type, self.bin_path_public))
@@ -866,8 +945,14 @@ class LinkActionMSVS(ToolsetActionBase):
         os.rename(link_stamp_file_tmp, self.link_stamp_file)
         os.utime(self.link_stamp_file, None)
         os.utime(self.bin_path_public, None)
+        rebuilt = is_target_output_changed(output, ctx, self.bin_path_public, keep_timestamp=True, stamp_file_path=self.link_stamp_file)
+        ctx.build_state.set_target_depends(self.bin_path_public, [], self.description_digest)
+        record_target_content(ctx, self.bin_path_public, eval_target_prerequisites(self.primary_deps, self.extra_deps), always=True)
+
+        return ToolsetActionResult(rebuilt=rebuilt, artifacts=build_result, executed=True)
 
-        return ToolsetActionResult(rebuilt=True, artifacts=build_result)
+    def eval_prerequisites(self, ctx):
+        return eval_target_prerequisites(self.primary_deps, self.extra_deps)
 
 
 def _winapi_level_to_compiler_defines(api_level):